@@ -0,0 +1,244 @@
+from . columnar import compile_rule, evaluate_condition
+from . rules import rule_category
+
+import re
+
+from collections import OrderedDict
+
+import numpy as np
+
+from bitarray import bitarray
+
+
+# Maximum number of literal bitsets kept by a literal cache
+CACHE_SIZE = 4096
+
+
+class LiteralCache:
+    """
+    An LRU cache of the row bitsets of the literals of a set of rules, used by the bitset
+    validator.
+
+    Rules learned by Popper share most of their literals (e.g., attr_relationship_husband(V2)
+    bound to relationship(V0,V2)), so each distinct literal is evaluated over a batch once, as
+    a bitset with a bit per row, and each rule is evaluated as the conjunction of the bitsets
+    of its literals. Literals are the conditions output by columnar.compile_rule(...) (a column
+    equal to a value, or operators over columns and integers), and the categories of the
+    protected attribute.
+
+    The cache holds the bitsets of a single batch: bitsets are keyed by literal only, and
+    dropped as soon as a literal of another batch (i.e., a table with another id) is looked
+    up, so that the cache never keeps a batch alive.
+
+    Attributes:
+        size (int): The maximum number of bitsets kept. The least recently used bitsets are
+                    dropped first.
+        batch (int): The id of the batch of the bitsets (see columnar.ColumnTable), or None.
+        bitsets (OrderedDict): The bitsets, keyed by literal (see literal_key(...)).
+        hits (int): The number of literals found in the cache.
+        misses (int): The number of literals evaluated.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.batch = None
+        self.bitsets = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def bitset(self, condition, table, grounded_ops):
+        """
+        Returns the bitset of the rows of a table that satisfy a condition.
+
+        Parameters:
+            condition (tuple): A condition output by columnar.compile_rule(...).
+            table (ColumnTable): The table.
+            grounded_ops (list of object): A list of grounded operators.
+
+        Returns:
+            bitarray: The bitset of the rows that satisfy the condition.
+        """
+
+        return self.lookup(table, literal_key(condition), lambda: evaluate_condition(condition, table, grounded_ops))
+
+    def category(self, table, category):
+        """
+        Returns the bitset of the rows of a table with the given protected value.
+
+        Parameters:
+            table (ColumnTable): The table.
+            category (str): The protected value.
+
+        Returns:
+            bitarray: The bitset of the rows with the protected value.
+        """
+
+        return self.lookup(table, ("category", category), lambda: table.protected == category)
+
+    def lookup(self, table, key, evaluate):
+        # Bitsets of the previous batch are no longer needed
+        if table.batch != self.batch:
+            self.bitsets.clear()
+            self.batch = table.batch
+
+        if key in self.bitsets:
+            self.bitsets.move_to_end(key)
+            self.hits += 1
+            return self.bitsets[key]
+
+        self.misses += 1
+        bits = to_bitset(evaluate())
+
+        self.bitsets[key] = bits
+        if len(self.bitsets) > self.size:
+            self.bitsets.popitem(last=False)
+
+        return bits
+
+
+def literal_key(condition):
+    """
+    Returns the key of a condition in a literal cache. Constants are keyed by their type too,
+    as integers and floats are kept apart by the validator (see columnar.ColumnTable.code(...)),
+    but compare (and hash) equal in Python (e.g., 39 == 39.0).
+
+    Parameters:
+        condition (tuple): A condition output by columnar.compile_rule(...).
+
+    Returns:
+        tuple: The key of the condition.
+    """
+
+    def operand_key(operand):
+        return operand + (type(operand[1]).__name__,) if operand[0] == "const" else operand
+
+    def ints_key(ints):
+        return tuple((type(n).__name__, n) for n in ints) if ints != None else None
+
+    if condition[0] == "eq":
+        return ("eq", operand_key(condition[1]), operand_key(condition[2]))
+
+    if condition[0] == "op":
+        return ("op", condition[1], tuple(map(operand_key, condition[2])), ints_key(condition[3]))
+
+    return ("exists", tuple((name, tuple(map(operand_key, operands))) for (name, operands) in condition[1]),
+            ints_key(condition[2]))
+
+
+def to_bitset(mask):
+    """
+    Converts a mask into a bitset.
+
+    Parameters:
+        mask (numpy array of bool): The mask.
+
+    Returns:
+        bitarray: A bitset with a bit set for each row set in the mask.
+    """
+
+    bits = bitarray()
+    bits.pack(np.ascontiguousarray(mask, dtype=bool).tobytes())
+
+    return bits
+
+
+def conjunction(conditions, table, grounded_ops, literals):
+    """
+    Evaluates a list of conditions over a table as the conjunction of their bitsets.
+
+    Parameters:
+        conditions (list of tuple): A list of conditions output by columnar.compile_rule(...).
+        table (ColumnTable): The table.
+        grounded_ops (list of object): A list of grounded operators.
+        literals (LiteralCache): The cache of the bitsets of the conditions.
+
+    Returns:
+        bitarray: The bitset of the rows that satisfy every condition.
+    """
+
+    bits = bitarray(len(table))
+    bits.setall(1)
+
+    for condition in conditions:
+        bits &= literals.bitset(condition, table, grounded_ops)
+
+        # No row left to match
+        if not bits.any():
+            break
+
+    return bits
+
+
+def validate_rules(head, rules, table, constants, grounded_ops, categorical, categories, categories_count,
+                   totals=False, literals=None):
+    """
+    Validates a set of rules against a batch of the dataset and calculates performance metrics.
+
+    Equivalent to columnar.validate_rules(...), but evaluates each distinct literal of the rules
+    once, as a bitset over the rows of the batch, and each rule as the conjunction of the
+    bitsets of its literals, so the cost grows with the number of distinct literals rather
+    than with the number of rules. Counts are the popcounts of the bitsets.
+
+    Parameters:
+        head (str): The head of the rules to be validated.
+        rules (list of str): A list of rules to be validated.
+        table (ColumnTable): The batch of the dataset.
+        constants (dict of str to (str or int or float)): The decision points of the run.
+        grounded_ops (list of object): A list of operators to be grounded.
+        categorical (bool): A flag indicating whether categorical mode is enabled.
+        categories (list of str): A list of categories.
+        categories_count (dict of str to int): A dictionary mapping categories to their counts.
+        totals (bool, optional): A flag indicating whether to also return the number of rows
+                                 matched by each rule on its non-protected attributes only (see
+                                 pipeline.validate_rules(...)). Defaults to False.
+        literals (LiteralCache, optional): The cache of literal bitsets of the batch, shared
+                                           with other calls over the same batch. Defaults to
+                                           a cache of its own.
+
+    Returns:
+        tuple: A tuple containing four lists (see columnar.validate_rules(...)), and the counts
+               of the rules on their non-protected attributes only if totals.
+    """
+
+    counts = []
+    coverages = []
+    recalls = []
+    precisions = []
+    counts_all = []
+
+    literals = literals if literals != None else LiteralCache()
+
+    head_formatted = re.sub(r"[\(].*?[\)]", "", head)
+
+    for rule in rules:
+        # Rule with matching non-protected attributes only (count_all), and with
+        # matching protected and non-protected attributes (count)
+        bits_all = conjunction(compile_rule(rule, table.cols, constants, grounded_ops, (), table.int_cols), table,
+                               grounded_ops, literals)
+
+        if categorical:
+            bits = bits_all & literals.category(table, head_formatted)
+        else:
+            bits = conjunction(compile_rule(rule, table.cols, constants, grounded_ops, ("V1",), table.int_cols), table,
+                               grounded_ops, literals)
+
+        count = bits.count()
+        count_all = bits_all.count()
+
+        # Batches (or shards) may have no rows of the category of the rule
+        category_count = categories_count.get(rule_category(head, rule, categorical, categories), 0)
+
+        coverage = count / len(table) * 100
+        recall = count / category_count * 100 if category_count != 0 else 0
+        precision = count / count_all * 100 if count_all != 0 else 0  # bad rule (functional test)
+
+        counts.append(count)
+        coverages.append(coverage)
+        recalls.append(recall)
+        precisions.append(precision)
+        counts_all.append(count_all)
+
+    if totals:
+        return counts, coverages, recalls, precisions, counts_all
+
+    return counts, coverages, recalls, precisions
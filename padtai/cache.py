@@ -0,0 +1,210 @@
+from . streams import open_table
+
+import os
+import json
+import shutil
+
+import numpy as np
+
+from pathlib import Path
+
+
+# Version of the cache format; caches with another version are rebuilt
+CACHE_VERSION = 1
+
+
+class TableCache:
+    """
+    A dictionary-encoded columnar cache of a dataset.
+
+    Each cell is stored as an integer code into a dictionary of distinct values. Values
+    are the cells as read by the table parser (stripped, lowercased and split on commas),
+    so reading a row from the cache is equivalent to tokenizing the corresponding line.
+
+    Attributes:
+        path (str): The path to the cache directory.
+        columns (list of str): The column names of the dataset (including the protected column).
+        values (list of str): The dictionary, mapping each code to its value.
+        codes (numpy array): The (memory-mapped) codes of the non-protected columns, one row
+                             per row of the dataset.
+        protected (numpy array): The (memory-mapped) codes of the protected column.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(os.path.join(path, "meta.json"), 'r') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, "values.json"), 'r') as f:
+            self.values = json.load(f)
+
+        self.columns = self.meta["columns"]
+        self.codes = np.load(os.path.join(path, "codes.npy"), mmap_mode='r')
+        self.protected = np.load(os.path.join(path, "protected.npy"), mmap_mode='r')
+
+    def __len__(self):
+        return len(self.protected)
+
+    def __getstate__(self):
+        # Pickle by path (e.g., when sent to a worker process), so that the arrays are
+        # memory-mapped again instead of being copied
+        return { "path": self.path }
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def row(self, i):
+        """
+        Decodes a row of the dataset.
+
+        Parameters:
+            i (int): The index of the row (excluding the column names).
+
+        Returns:
+            list of str: The values of the row, including the protected value.
+        """
+
+        return [self.values[code] for code in self.codes[i]] + [self.values[self.protected[i]]]
+
+    def category_counts(self, start=0, stop=None):
+        """
+        Counts the protected values in a range of rows without decoding them.
+
+        Parameters:
+            start (int, optional): The index of the first row. Defaults to 0.
+            stop (int, optional): The index after the last row. Defaults to the last row.
+
+        Returns:
+            dict of str to int: A dictionary mapping each protected value to its count.
+        """
+
+        counts = np.bincount(self.protected[start:stop], minlength=len(self.values))
+        return { self.values[code]: int(counts[code]) for code in np.flatnonzero(counts) }
+
+
+def cache_path(table_path):
+    """
+    Returns the path to the cache of a dataset, stored next to the dataset.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+
+    Returns:
+        str: The path to the cache directory.
+    """
+
+    return str(table_path) + ".cache"
+
+
+def is_fresh(table_path, path):
+    """
+    Determines whether the cache of a dataset is up to date, i.e., whether it exists and the
+    dataset hasn't changed (size and modification time) since it was built.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        path (str): The path to the cache directory.
+
+    Returns:
+        bool: True if the cache can be reused, False otherwise.
+    """
+
+    try:
+        with open(os.path.join(path, "meta.json"), 'r') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    stat = os.stat(table_path)
+    return meta.get("version") == CACHE_VERSION and meta.get("size") == stat.st_size and \
+           meta.get("mtime_ns") == stat.st_mtime_ns
+
+
+def build_cache(table_path, path=None):
+    """
+    Converts a dataset into a dictionary-encoded columnar cache.
+
+    The dataset is read twice (once to count rows, and once to encode them), and the
+    codes are written directly to disk, so datasets larger than memory can be converted.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        path (str, optional): The path to the cache directory. Defaults to cache_path(table_path).
+
+    Returns:
+        TableCache: The cache of the dataset.
+
+    Raises:
+        ValueError: If a row doesn't have the same number of values as there are columns.
+    """
+
+    path = path if path else cache_path(table_path)
+    stat = os.stat(table_path)
+
+    # Count rows (excluding column names and blank lines)
+    # Compressed datasets are decompressed as they are read, in both passes
+    with open_table(table_path, 'rb') as f:
+        next(f)
+        rows = sum(1 for line in f if line.strip())
+
+    # Build cache in a temporary directory, so that a cache is never left half-written
+    tmp_path = "{}.tmp-{}".format(path, os.getpid())
+    Path(tmp_path).mkdir(parents=True, exist_ok=True)
+
+    values = {}
+    with open_table(table_path) as f:
+        columns = next(f).strip().lower().split(',')
+
+        codes = np.lib.format.open_memmap(os.path.join(tmp_path, "codes.npy"), mode='w+',
+                                          dtype=np.int32, shape=(rows, len(columns) - 1))
+        protected = np.lib.format.open_memmap(os.path.join(tmp_path, "protected.npy"), mode='w+',
+                                              dtype=np.int32, shape=(rows,))
+
+        for (i, line) in enumerate(line for line in f if line.strip()):
+            row = line.strip().lower().split(',')
+            if len(row) != len(columns):
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                raise ValueError("row {} of {} has {} values, expected {}".format(i + 1, table_path, len(row), len(columns)))
+
+            encoded = [values.setdefault(value, len(values)) for value in row]
+            codes[i] = encoded[:-1]
+            protected[i] = encoded[-1]
+
+        codes.flush()
+        protected.flush()
+        del codes, protected
+
+    with open(os.path.join(tmp_path, "values.json"), 'w+') as f:
+        json.dump(list(values), f)
+
+    with open(os.path.join(tmp_path, "meta.json"), 'w+') as f:
+        json.dump({ "version": CACHE_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                    "columns": columns, "rows": rows }, f)
+
+    # Replace stale cache, if any
+    shutil.rmtree(path, ignore_errors=True)
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # Another process built the cache in the meantime
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+    return TableCache(path)
+
+
+def load_cache(table_path):
+    """
+    Loads the cache of a dataset, building it first if it doesn't exist or is stale.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+
+    Returns:
+        TableCache: The cache of the dataset.
+    """
+
+    path = cache_path(table_path)
+    if is_fresh(table_path, path):
+        return TableCache(path)
+
+    return build_cache(table_path, path)
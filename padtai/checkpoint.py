@@ -0,0 +1,110 @@
+import os
+import pickle
+import shutil
+
+
+class Checkpoint:
+    """
+    The progress of a run, saved to a directory so that an interrupted run (e.g., by a crash,
+    or by running out of memory) can resume where it stopped instead of starting over.
+
+    Each entry (e.g., the sample, the learned rules, or the state of validation after the last
+    batch) is pickled to a file of its own, and replaced atomically, so that a run interrupted
+    while saving an entry still finds the previous version of it. Parts of a run (e.g., each
+    category, or each run of a test) save their entries to a child checkpoint.
+
+    Attributes:
+        path (str): The path to the checkpoint directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def __contains__(self, name):
+        return os.path.exists(self.entry(name))
+
+    def entry(self, name):
+        """
+        Returns the path to the file of an entry.
+
+        Parameters:
+            name (str): The name of the entry.
+
+        Returns:
+            str: The path to the file.
+        """
+
+        return os.path.join(self.path, name + ".pkl")
+
+    def get(self, name, default=None):
+        """
+        Reads an entry.
+
+        Parameters:
+            name (str): The name of the entry.
+            default (object, optional): The value returned if the entry hasn't been saved.
+                                        Defaults to None.
+
+        Returns:
+            object: The value of the entry.
+        """
+
+        if name not in self:
+            return default
+
+        with open(self.entry(name), 'rb') as f:
+            return pickle.load(f)
+
+    def put(self, name, value):
+        """
+        Saves an entry, replacing its previous value.
+
+        Parameters:
+            name (str): The name of the entry.
+            value (object): The value of the entry (must be picklable).
+        """
+
+        with open(self.entry(name) + ".tmp", 'wb') as f:
+            pickle.dump(value, f)
+
+        os.replace(self.entry(name) + ".tmp", self.entry(name))
+
+    def child(self, name):
+        """
+        Returns the checkpoint of a part of the run, stored in a subdirectory.
+
+        Parameters:
+            name (str): The name of the part (example: Adult-sex-male).
+
+        Returns:
+            Checkpoint: The checkpoint of the part.
+        """
+
+        return Checkpoint(os.path.join(self.path, name))
+
+    def check(self, settings):
+        """
+        Saves the settings of the run or, if resuming, checks that they are the same as those
+        of the interrupted run, so that its progress isn't mixed with that of another run.
+
+        Parameters:
+            settings (dict): The settings of the run.
+
+        Raises:
+            ValueError: If the checkpoint was saved by a run with other settings.
+        """
+
+        saved = self.get("settings")
+        if saved != None and saved != settings:
+            changed = sorted(key for key in set(saved) | set(settings) if saved.get(key) != settings.get(key))
+            raise ValueError("checkpoint {} was saved with other settings ({})".format(self.path, ', '.join(changed)))
+
+        self.put("settings", settings)
+
+    def clear(self):
+        """
+        Removes the checkpoint (e.g., once the part of the run it belongs to has finished).
+        """
+
+        shutil.rmtree(self.path, ignore_errors=True)
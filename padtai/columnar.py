@@ -0,0 +1,552 @@
+from . parsetable import is_number
+from . rules import parse_literals, rule_category
+
+import re
+import itertools
+
+import numpy as np
+
+
+# Each table (i.e., batch) has an id of its own, so that results cached for a batch aren't
+# used for another one
+batch_ids = itertools.count()
+
+# Decision points of the integers in a rule (example: int_39, int__minus_1, int_39_5)
+INT_CONSTANT = re.compile(r'^int_(?:_minus_)?\d+_?\d*$')
+
+
+class ColumnTable:
+    """
+    A batch of the dataset stored column by column, used by the NumPy validator.
+
+    Values are dictionary-encoded: every distinct value (as it would be loaded into Prolog)
+    is mapped to an integer code, shared by all columns so that columns can be compared
+    with each other. Numeric values are also kept as floats to evaluate operators.
+
+    Attributes:
+        cols (list of str): The names of the non-protected columns.
+        int_cols (list of str): The names of the integer columns, whose numbers (with the 
+                                integers of a rule) are those operators are grounded on for 
+                                each row (see pipeline.validate_rules(...)).
+        codes (dict of str to numpy array): The codes of each non-protected column.
+        numbers (dict of str to numpy array): The numeric values of each non-protected column
+                                              (NaN if the value is not a number).
+        protected_codes (numpy array): The codes of the protected column.
+        protected_numbers (numpy array): The numeric values of the protected column.
+        protected (numpy array): The (string) protected values, used to match categories.
+        int_codes (numpy array): The codes of the numbers of the integer columns of each row
+                                 (-1 for non-numbers), with a column per integer column.
+        batch (int): The id of the table, unique within the process (see bitset.LiteralCache).
+    """
+
+    def __init__(self, cols, int_cols=None):
+        """
+        Parameters:
+            cols (list of str): The names of the non-protected columns.
+            int_cols (list of int, optional): The indices of the integer columns in the 
+                                              dataset. Defaults to None (all columns, as in
+                                              pipeline.load_table(...)).
+        """
+
+        self.cols = cols
+        self.int_cols = [cols[j] for j in int_cols] if int_cols else cols
+        self.batch = next(batch_ids)
+        self.symbols = {}
+
+        self._rows = []
+        self._protected = []
+
+    def code(self, value):
+        """
+        Returns the code of a value, or -1 if the value does not appear in the table.
+
+        Integers and floats are kept apart, as they do not unify in Prolog.
+
+        Parameters:
+            value (str or int or float): The value.
+
+        Returns:
+            int: The code of the value.
+        """
+
+        return self.symbols.get((type(value).__name__, value), -1)
+
+    def append(self, row, protected):
+        """
+        Adds a row to the table.
+
+        Parameters:
+            row (list of str or int or float): The non-protected values of the row, as
+                                               they would be loaded into Prolog.
+            protected (str): The protected value of the row.
+        """
+
+        self._rows.append([self._intern(value) for value in row])
+        self._protected.append(protected)
+
+    def finalize(self):
+        """
+        Builds the column arrays once all rows have been added.
+
+        Returns:
+            ColumnTable: The table itself.
+        """
+
+        # Protected values are bound as numbers if they represent numbers
+        protected_terms = [(int(value) if '.' not in value else float(value)) if is_number(value) else value
+                           for value in self._protected]
+        self.protected_codes = np.array([self._intern(value) for value in protected_terms], dtype=np.int64)
+        self.protected = np.array(self._protected, dtype=object)
+
+        # Numeric value of each code (NaN for non-numbers)
+        values = np.full(len(self.symbols), np.nan)
+        for (kind, value), code in self.symbols.items():
+            if kind != 'str':
+                values[code] = value
+
+        matrix = np.array(self._rows, dtype=np.int64).reshape(len(self._rows), len(self.cols))
+        self.codes = { col: matrix[:, j] for (j, col) in enumerate(self.cols) }
+        self.numbers = { col: values[matrix[:, j]] for (j, col) in enumerate(self.cols) }
+        self.protected_numbers = values[self.protected_codes]
+
+        ints = matrix[:, [self.cols.index(col) for col in self.int_cols]]
+        self.int_codes = np.where(np.isnan(values[ints]), -1, ints)
+
+        self._rows = []
+        self._protected = []
+
+        return self
+
+    def __len__(self):
+        return len(self.protected)
+
+    def _intern(self, value):
+        return self.symbols.setdefault((type(value).__name__, value), len(self.symbols))
+
+
+def read_constants(bk_path):
+    """
+    Reads the decision points (i.e., the constants "attr_*" and "int_*") from a background
+    knowledge file.
+
+    Parameters:
+        bk_path (str): The path to the background knowledge file.
+
+    Returns:
+        dict of str to (str or int or float): A dictionary mapping the name of each
+                                              constant to its value.
+    """
+
+    constants = {}
+
+    with open(bk_path, 'r') as f:
+        for line in f:
+            match = re.match(r'^((?:attr|int)_\w+)\(([^(),]+)\)\.$', line.strip())
+            if match:
+                value = match.group(2)
+                constants[match.group(1)] = (int(value) if '.' not in value else float(value)) \
+                                            if is_number(value) else value
+
+    return constants
+
+
+def rule_ints(rule):
+    """
+    Returns the integers of the decision points in a rule (e.g., 39 for int_39), which
+    operators are grounded on along with the integers of each row, as in
+    pipeline.validate_rules(...).
+
+    Parameters:
+        rule (str): The body of the rule.
+
+    Returns:
+        tuple of (int or float): The distinct integers of the rule.
+    """
+
+    ints = {}
+    for name, _ in parse_literals(rule):
+        if INT_CONSTANT.match(name):
+            value = name[4:].replace('_minus_', '-').replace('_', '.')
+            value = int(value) if '.' not in value else float(value)
+
+            # Integers and floats are kept apart, as they do not unify in Prolog
+            ints.setdefault((type(value).__name__, value), value)
+
+    return tuple(ints.values())
+
+
+def compile_rule(rule, cols, constants, grounded_ops, bound=(), int_cols=None):
+    """
+    Compiles the body of a rule into a list of conditions over the columns of a table.
+
+    Each variable is resolved to an operand: a column ("col", name), the protected column
+    ("protected",), or a constant ("const", value). A variable that is bound by more than
+    one operand yields an equality condition ("eq", operand, operand), and each operator
+    yields a condition ("op", name, operands, ints).
+
+    In Prolog, an operator is a set of facts grounded on the integers of each row (those of
+    its integer columns) and of the rule (see pipeline.validate_rules(...)), so it only holds
+    if its first two arguments are among those integers. ints is None if their operands always
+    are (integer columns and integers of the rule), and the integers of the rule otherwise.
+
+    Variables bound by no operand (e.g., V1 in lt(V1,V3) when counting the rows matched by
+    the non-protected attributes only) range over those integers. They are ("var", name)
+    operands, and the operators that share them yield a single condition ("exists", literals,
+    ints), with a (name, operands) pair per operator.
+
+    Parameters:
+        rule (str): The body of the rule.
+        cols (list of str): The names of the non-protected columns.
+        constants (dict of str to (str or int or float)): The decision points of the run.
+        grounded_ops (list of object): A list of grounded operators.
+        bound (tuple of str, optional): The variables bound to the protected column
+                                        (example: ("V1",)). Defaults to none.
+        int_cols (list of str, optional): The names of the integer columns (see 
+                                          ColumnTable). Defaults to None (all columns).
+
+    Returns:
+        list of tuple: A list of conditions, all of which must hold for the rule to apply.
+
+    Raises:
+        ValueError: If the rule uses a predicate that is not a column, constant or operator.
+    """
+
+    ops = { op.operator(): op for op in grounded_ops }
+    int_cols = cols if int_cols == None else int_cols
+    ints = rule_ints(rule)
+
+    operands = { var: [("protected",)] for var in bound }
+    op_literals = []
+
+    for name, args in parse_literals(rule):
+        if name in cols and len(args) == 2 and args[0] == "V0":
+            operands.setdefault(args[1], []).append(("col", name))
+        elif name in constants and len(args) == 1:
+            operands.setdefault(args[0], []).append(("const", constants[name]))
+        elif name in ops and len(args) == ops[name].arity():
+            op_literals.append((name, args))
+        else:
+            raise ValueError("unsupported literal {}({})".format(name, ','.join(args)))
+
+    conditions = []
+
+    # All operands of a variable must be equal to its first operand
+    for var in operands:
+        for operand in operands[var][1:]:
+            conditions.append(("eq", operands[var][0], operand))
+
+    # Operators that share unbound variables, as lists of (name, operands) pairs
+    groups = []
+
+    for name, args in op_literals:
+        literal = (name, tuple(operands[arg][0] if arg in operands else ("var", arg) for arg in args))
+        unbound = set(arg for arg in args if arg not in operands)
+
+        if not unbound:
+            grounded_ints = ints if not all(always_grounded(operand, ints, int_cols) for operand in literal[1][:2]) \
+                            else None
+            conditions.append(("op", name, literal[1], grounded_ints))
+            continue
+
+        # Merge the groups with variables in common
+        shared = [group for group in groups if group[0] & unbound]
+        for group in shared:
+            groups.remove(group)
+            unbound |= group[0]
+
+        groups.append((unbound, sum([group[1] for group in shared], []) + [literal]))
+
+    for _, literals in groups:
+        conditions.append(("exists", tuple(literals), ints))
+
+    return conditions
+
+
+def always_grounded(operand, ints, int_cols):
+    """
+    Determines whether an operand is always among the integers operators are grounded on:
+    an integer column, or an integer of the rule.
+    """
+
+    return (operand[0] == "col" and operand[1] in int_cols) or \
+           (operand[0] == "const" and in_ints(operand[1], ints))
+
+
+def in_ints(value, ints):
+    """
+    Determines whether a value is one of the given integers (integers and floats are kept
+    apart, as they do not unify in Prolog).
+    """
+
+    return (type(value).__name__, value) in [(type(n).__name__, n) for n in ints]
+
+
+def evaluate(conditions, table, grounded_ops):
+    """
+    Evaluates a list of conditions over a table.
+
+    Parameters:
+        conditions (list of tuple): A list of conditions output by compile_rule(...).
+        table (ColumnTable): The table.
+        grounded_ops (list of object): A list of grounded operators.
+
+    Returns:
+        numpy array of bool: A mask with the rows that satisfy every condition.
+    """
+
+    mask = np.ones(len(table), dtype=bool)
+    for condition in conditions:
+        mask &= evaluate_condition(condition, table, grounded_ops)
+
+    return mask
+
+
+def evaluate_condition(condition, table, grounded_ops):
+    """
+    Evaluates a single condition over a table.
+
+    Parameters:
+        condition (tuple): A condition output by compile_rule(...).
+        table (ColumnTable): The table.
+        grounded_ops (list of object): A list of grounded operators.
+
+    Returns:
+        numpy array of bool: A mask with the rows that satisfy the condition.
+    """
+
+    if condition[0] == "eq":
+        left, right = condition[1], condition[2]
+        if left[0] == "const" and right[0] == "const":
+            return np.full(len(table), (type(left[1]), left[1]) == (type(right[1]), right[1]))
+
+        return np.equal(operand_codes(left, table), operand_codes(right, table))
+
+    if condition[0] == "op":
+        mask = evaluate_operator(condition[1], condition[2], condition[3], table, grounded_ops, {})
+        return np.broadcast_to(mask, (len(table),))
+
+    # Unbound variables range over the integers of the row and of the rule
+    literals, ints = condition[1], condition[2]
+    candidates = [table.numbers[col] for col in table.int_cols] + [float(n) for n in ints]
+
+    # Variables that are only the result of an operator (e.g., V4 in sum(V2,V3,V4)) take the
+    # value of the fact grounded on the other arguments, so only the others range over them
+    variables = list(dict.fromkeys(operand[1] for (_, operands) in literals 
+                                   for operand in operands[:2] if operand[0] == "var"))
+
+    mask = np.zeros(len(table), dtype=bool)
+    for values in itertools.product(candidates, repeat=len(variables)):
+        values = dict(zip(variables, values))
+        holds = np.ones(len(table), dtype=bool)
+
+        for name, operands in literals:
+            for (i, operand) in enumerate(operands):
+                if operand[0] == "var" and operand[1] not in values:
+                    values[operand[1]] = fact_values(name, operands, i, table, grounded_ops, values)
+
+            holds &= evaluate_operator(name, operands, ints, table, grounded_ops, values)
+
+        mask |= holds
+
+    return mask
+
+
+def evaluate_operator(name, operands, ints, table, grounded_ops, values):
+    """
+    Evaluates an operator over a table. The operator only holds for a row if its grounded 
+    arguments (the first two) are among the integers of the row and of the rule (see 
+    compile_rule(...)).
+
+    Parameters:
+        name (str): The name of the operator.
+        operands (tuple): The operands of its arguments.
+        ints (tuple of (int or float)): The integers of the rule, or None if the arguments are
+                                        always grounded on (see compile_rule(...)).
+        table (ColumnTable): The table.
+        grounded_ops (list of object): A list of grounded operators.
+        values (dict of str to (numpy array or float)): The values of the unbound variables.
+
+    Returns:
+        numpy array of bool: A mask with the rows for which the operator holds.
+    """
+
+    op = next(op for op in grounded_ops if op.operator() == name)
+    mask = op.evaluate(*[values[operand[1]] if operand[0] == "var" else operand_numbers(operand, table)
+                         for operand in operands])
+
+    if ints == None:
+        return mask
+
+    # Unbound variables only take the integers grounded on
+    for operand in operands[:2]:
+        if operand[0] != "var":
+            mask = mask & operand_grounded(operand, ints, table)
+
+    return mask
+
+
+def operand_grounded(operand, ints, table):
+    """
+    Returns whether the value of an operand is among the integers of each row (i.e., those of
+    its integer columns) and of the rule.
+    """
+
+    if always_grounded(operand, ints, table.int_cols):
+        return True
+
+    codes = np.reshape(operand_codes(operand, table), (-1, 1))
+    ints_codes = [table.code(n) for n in ints]
+
+    return (table.int_codes == codes).any(axis=1) | np.isin(codes[:, 0], ints_codes)
+
+
+def fact_values(name, operands, position, table, grounded_ops, values):
+    """
+    Returns the value of an argument of the fact an operator is grounded on for each row,
+    given its grounded arguments (NaN if no fact is grounded on them). The fact is built
+    element by element via query(...), as in the Prolog validator.
+
+    Parameters:
+        name (str): The name of the operator.
+        operands (tuple): The operands of its arguments.
+        position (int): The position of the argument.
+        table (ColumnTable): The table.
+        grounded_ops (list of object): A list of grounded operators.
+        values (dict of str to (numpy array or float)): The values of the unbound variables.
+
+    Returns:
+        numpy array of float: The value of the argument for each row.
+    """
+
+    op = next(op for op in grounded_ops if op.operator() == name)
+    args = [np.broadcast_to(np.asarray(values[operand[1]] if operand[0] == "var" else operand_numbers(operand, table),
+                                       dtype=float), (len(table),)) for operand in operands[:2]]
+
+    facts = {}
+    result = np.full(len(table), np.nan)
+
+    for i in range(len(table)):
+        pair = tuple(arg[i] for arg in args)
+
+        # Non-numeric values are never grounded on
+        if any(np.isnan(el) for el in pair):
+            continue
+
+        if pair not in facts:
+            query = op.query(tuple(int(el) if el.is_integer() else el for el in pair))
+            facts[pair] = tuple(query[1].values())[position] if query[0] != "" else np.nan
+
+        result[i] = facts[pair]
+
+    return result
+
+
+def operand_codes(operand, table):
+    """
+    Returns the codes of an operand.
+
+    Constants that don't appear in the table are mapped to -2, so that they never
+    compare equal to a column.
+    """
+
+    if operand[0] == "col":
+        return table.codes[operand[1]]
+    elif operand[0] == "protected":
+        return table.protected_codes
+    else:
+        code = table.code(operand[1])
+        return code if code != -1 else -2
+
+
+def operand_numbers(operand, table):
+    """
+    Returns the numeric values of an operand (NaN for non-numbers).
+    """
+
+    if operand[0] == "col":
+        return table.numbers[operand[1]]
+    elif operand[0] == "protected":
+        return table.protected_numbers
+    else:
+        return float(operand[1]) if not isinstance(operand[1], str) else np.nan
+
+
+def validate_rules(head, rules, table, constants, grounded_ops, categorical, categories, categories_count, totals=False):
+    """
+    Validates a set of rules against a batch of the dataset and calculates performance metrics.
+
+    Counterpart of pipeline.validate_rules(...), which evaluates each rule as a vectorized
+    mask over the columns of the batch instead of querying Prolog row by row.
+
+    Operators are grounded on the integers of each row and of the rule (see compile_rule(...)).
+    The Prolog validators keep the facts grounded on other rows of the batch until the rule
+    has been validated (those of the previous rows, or those of every row with the aggregate
+    validator), so the metrics of rules with operators over unbound variables, the protected
+    attribute or non-integer columns may differ from theirs. Operators are also evaluated on
+    numeric values, so the result of an operator (e.g., the sum in sum(V2,V3,V4)) matches an
+    integer and a float of equal value, which Prolog keeps apart. The metrics of other rules
+    are the same.
+
+    Parameters:
+        head (str): The head of the rules to be validated.
+        rules (list of str): A list of rules to be validated.
+        table (ColumnTable): The batch of the dataset.
+        constants (dict of str to (str or int or float)): The decision points of the run.
+        grounded_ops (list of object): A list of operators to be grounded.
+        categorical (bool): A flag indicating whether categorical mode is enabled.
+        categories (list of str): A list of categories.
+        categories_count (dict of str to int): A dictionary mapping categories to their counts.
+        totals (bool, optional): A flag indicating whether to also return the number of rows
+                                 matched by each rule on its non-protected attributes only (see 
+                                 pipeline.validate_rules(...)). Defaults to False.
+
+    Returns:
+        tuple: A tuple containing four lists:
+            - counts (list of int): The number of rows matched by each rule.
+            - coverages (list of float): The coverage percentage for each rule.
+            - recalls (list of float): The recall percentage for each rule.
+            - precisions (list of float): The precision percentage for each rule.
+            - counts_all (list of int): The number of rows matched by each rule on its
+                                        non-protected attributes only (only if totals).
+    """
+
+    counts = []
+    coverages = []
+    recalls = []
+    precisions = []
+    counts_all = []
+
+    head_formatted = re.sub(r"[\(].*?[\)]", "", head)
+
+    for rule in rules:
+        # Rule with matching non-protected attributes only (count_all), and with
+        # matching protected and non-protected attributes (count)
+        mask_all = evaluate(compile_rule(rule, table.cols, constants, grounded_ops, (), table.int_cols), table,
+                            grounded_ops)
+
+        if categorical:
+            mask = mask_all & (table.protected == head_formatted)
+        else:
+            mask = evaluate(compile_rule(rule, table.cols, constants, grounded_ops, ("V1",), table.int_cols), table,
+                            grounded_ops)
+
+        count = int(np.count_nonzero(mask))
+        count_all = int(np.count_nonzero(mask_all))
+
+        # Batches (or shards) may have no rows of the category of the rule
+        category_count = categories_count.get(rule_category(head, rule, categorical, categories), 0)
+
+        coverage = count / len(table) * 100
+        recall = count / category_count * 100 if category_count != 0 else 0
+        precision = count / count_all * 100 if count_all != 0 else 0  # bad rule (functional test)
+
+        counts.append(count)
+        coverages.append(coverage)
+        recalls.append(recall)
+        precisions.append(precision)
+        counts_all.append(count_all)
+
+    if totals:
+        return counts, coverages, recalls, precisions, counts_all
+
+    return counts, coverages, recalls, precisions
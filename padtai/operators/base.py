@@ -10,6 +10,8 @@ class GroundedOperator:
         arity(): Returns the arity of the operator.
         ground(int_list): Grounds the operator on sorted list of integers/floats.
         query(int_pair): Defines Janus query on arbitrary pair of integers/floats.
+        define(): Defines the operator as a Prolog rule, instead of grounding it.
+        evaluate(*columns): Evaluates the operator over columns of integers/floats.
     """
 
     def operator(self) -> str:
@@ -62,3 +64,57 @@ class GroundedOperator:
         """
 
         pass
+
+
+    def define(self) -> List[str]:
+        """
+        Allows the developer to define the operator as a Prolog rule, used with lazy 
+        grounding instead of ground(int_list).
+
+        The rule should check the relation arithmetically when its arguments are bound. 
+        Unbound arguments can be enumerated via numeric/1, which holds for every 
+        integer/float in the sample.
+
+        Returns:
+            list of str: A list of Prolog clauses defining the operator, or None if the 
+                         operator can only be grounded.
+        """
+
+        pass
+
+
+    def evaluate(self, *columns: Union['numpy.ndarray', int, float]) -> 'numpy.ndarray':
+        """
+        Allows the developer to define a vectorized evaluation of the operator, used by
+        the NumPy validator.
+
+        By default, the operator is evaluated element by element via query(...): the
+        relation holds for a row if the fact asserted for the first two arguments is
+        the same as the arguments of the row.
+
+        Parameters:
+            columns (numpy array or int or float): One column (or scalar) per argument of
+                                                   the operator. Non-numeric values are NaN.
+
+        Returns:
+            numpy array of bool: A mask with the rows for which the relation holds.
+        """
+
+        # NumPy is only needed by the NumPy (and bitset) validators, so operators can be
+        # loaded (e.g., to be grounded) without it
+        import numpy as np
+
+        args = np.broadcast_arrays(*[np.asarray(column, dtype=float) for column in columns])
+        mask = np.zeros(args[0].shape, dtype=bool)
+
+        for idx in np.ndindex(mask.shape):
+            row = tuple(arg[idx] for arg in args)
+
+            # Non-numeric values never satisfy an operator
+            if any(np.isnan(el) for el in row):
+                continue
+
+            query = self.query(tuple(int(el) if el.is_integer() else el for el in row[:2]))
+            mask[idx] = query[0] != "" and tuple(query[1].values()) == row
+
+        return mask
@@ -13,6 +13,8 @@ class LTOperator(GroundedOperator):
         ground(int_list): Grounds the less-than operator on sorted list of integers/floats.
         query(int_pair): Defines Janus query for the less-than operator on arbitrary pair 
                          of integers/floats.
+        define(): Defines the less-than operator as a Prolog rule.
+        evaluate(*columns): Evaluates the less-than operator over columns of integers/floats.
     """
 
     def operator(self):
@@ -79,3 +81,32 @@ class LTOperator(GroundedOperator):
             return "assert(lt(Vi,Vj))", { "Vi": int_pair[0], "Vj": int_pair[1] }
         else:
             return "", {}
+
+
+    def define(self):
+        """
+        Defines the less-than relation as a Prolog rule that compares its arguments
+        arithmetically, so that no pair relations need to be generated.
+
+        Returns:
+            list of str: A list with the clause defining "lt".
+        """
+
+        return ["lt(I,J):- (number(I) -> true ; numeric(I)), (number(J) -> true ; numeric(J)), I < J."]
+
+
+    def evaluate(self, *columns):
+        """
+        Evaluates the less-than relation i < j over columns of integers/floats.
+
+        Parameters:
+            columns (numpy array or int or float): The columns (or scalars) i and j. 
+                                                   Non-numeric values are NaN.
+
+        Returns:
+            numpy array of bool: A mask with the rows for which i < j.
+        """
+
+        import numpy as np
+
+        return np.less(columns[0], columns[1])
@@ -13,6 +13,8 @@ class SumOperator(GroundedOperator):
         ground(int_list): Grounds the sum operator on sorted list of integers/floats.
         query(int_pair): Defines Janus query for the sum operator on arbitrary pair 
                          of integers/floats.
+        define(): Defines the sum operator as a Prolog rule.
+        evaluate(*columns): Evaluates the sum operator over columns of integers/floats.
     """
 
     def operator(self):
@@ -73,4 +75,31 @@ class SumOperator(GroundedOperator):
         """
 
         return "assert(sum(Vi,Vj,Vk))", { "Vi": int_pair[0], "Vj": int_pair[1], \
-                                          "Vk": int_pair[0] + int_pair[1] }
\ No newline at end of file
+                                          "Vk": int_pair[0] + int_pair[1] }
+
+    def define(self):
+        """
+        Defines the sum relation as a Prolog rule that adds its arguments arithmetically,
+        so that no pair relations need to be generated.
+
+        Returns:
+            list of str: A list with the clause defining "sum".
+        """
+
+        return ["sum(I,J,K):- (number(I) -> true ; numeric(I)), (number(J) -> true ; numeric(J)), K is I + J."]
+
+    def evaluate(self, *columns):
+        """
+        Evaluates the sum relation k = i + j over columns of integers/floats.
+
+        Parameters:
+            columns (numpy array or int or float): The columns (or scalars) i, j and k. 
+                                                   Non-numeric values are NaN.
+
+        Returns:
+            numpy array of bool: A mask with the rows for which k = i + j.
+        """
+
+        import numpy as np
+
+        return np.equal(np.add(columns[0], columns[1]), columns[2])
@@ -3,13 +3,24 @@
 import sys
 import importlib
 import argparse
+import os
 import re
 import random
 import itertools
+import math
+import json
+import bisect
+import heapq
 
 from pathlib import Path
 from collections import Counter
 
+# Also run as a script, from the package directory
+try:
+    from . streams import open_table, table_stem
+except ImportError:
+    from streams import open_table, table_stem
+
 
 def generate_unique():
     """
@@ -39,6 +50,276 @@ def is_number(str):
     return str.replace('.', '', 1).isdigit() or (str[0] == '-' and str[1:].replace('.', '', 1).isdigit())
 
 
+def sample_records(records, sample_size, seed=None):
+    """
+    Selects a uniform random sample of records in a single pass (reservoir sampling).
+
+    Implements Algorithm L (Li, 1994): after the reservoir is filled, the number of
+    records to skip before the next replacement is drawn directly, so only the
+    records in the reservoir are kept in memory.
+
+    Parameters:
+        records (iterable of str): The records to sample from (e.g., the lines of a file).
+        sample_size (int): The sample size to consider.
+        seed (int, optional): The seed of the random number generator. Defaults to None.
+
+    Returns:
+        list of str: The sampled records. If there are no more records than the sample
+                     size, all records are returned in their original order.
+    """
+
+    rng = random.Random(seed)
+    records = iter(records)
+
+    # Uniform random number in the open interval (0, 1)
+    def uniform():
+        u = rng.random()
+        while u == 0.0:
+            u = rng.random()
+        return u
+
+    reservoir = list(itertools.islice(records, max(sample_size, 0)))
+    if len(reservoir) < sample_size or sample_size <= 0:
+        return reservoir
+
+    w = math.exp(math.log(uniform()) / sample_size)
+    while True:
+        # Skip records that would not enter the reservoir
+        skip = math.floor(math.log(uniform()) / math.log1p(-w)) if w < 1.0 else 0
+        record = next(itertools.islice(records, skip, None), None)
+        if record is None:
+            return reservoir
+
+        reservoir[rng.randrange(sample_size)] = record
+        w *= math.exp(math.log(uniform()) / sample_size)
+
+
+def sample_records_multi(records, sample_size, k, seed=None):
+    """
+    Selects k independent uniform random samples of records in a single pass.
+
+    Each sample is selected as by sample_records(...), with its own random number generator,
+    so sample i is the sample selected by sample_records(..., seed + i). Records that no 
+    sample replaces are skipped as in sample_records(...).
+
+    Parameters:
+        records (iterable of str): The records to sample from (e.g., the lines of a file).
+        sample_size (int): The sample size to consider.
+        k (int): The number of samples.
+        seed (int, optional): The seed of the random number generator of the first sample.
+                              Defaults to None.
+
+    Returns:
+        list of list of str: The sampled records of each sample.
+    """
+
+    rngs = [random.Random(seed + i if seed != None else None) for i in range(k)]
+    records = iter(records)
+
+    # Uniform random number in the open interval (0, 1)
+    def uniform(rng):
+        u = rng.random()
+        while u == 0.0:
+            u = rng.random()
+        return u
+
+    # Number of records to skip before the next replacement of a sample
+    def skip(rng, w):
+        return math.floor(math.log(uniform(rng)) / math.log1p(-w)) if w < 1.0 else 0
+
+    reservoir = list(itertools.islice(records, max(sample_size, 0)))
+    if len(reservoir) < sample_size or sample_size <= 0:
+        return [list(reservoir) for _ in range(k)]
+
+    reservoirs = [list(reservoir) for _ in range(k)]
+    ws = [math.exp(math.log(uniform(rng)) / sample_size) for rng in rngs]
+
+    # Position of the next record replaced by each sample, smallest first
+    position = sample_size
+    heap = [(position + skip(rngs[i], ws[i]), i) for i in range(k)]
+    heapq.heapify(heap)
+
+    while True:
+        target = heap[0][0]
+        record = next(itertools.islice(records, target - position, None), None)
+        if record is None:
+            return reservoirs
+
+        position = target + 1
+
+        # Replace the record in every sample that selected it
+        while heap[0][0] == target:
+            _, i = heapq.heappop(heap)
+            reservoirs[i][rngs[i].randrange(sample_size)] = record
+            ws[i] *= math.exp(math.log(uniform(rngs[i])) / sample_size)
+            heapq.heappush(heap, (position + skip(rngs[i], ws[i]), i))
+
+
+def sample_records_stratified(records, sample_size, key, min_share, seed=None):
+    """
+    Selects a random sample of records, stratified by category, in a single pass (see
+    sample_records_stratified_multi(...)).
+
+    Parameters:
+        records (iterable of str): The records to sample from (e.g., the lines of a file).
+        sample_size (int): The sample size to consider.
+        key (callable): A function returning the category of a record (e.g., its protected 
+                        value).
+        min_share (float): The minimum share of the sample of each category (example: 0.1).
+        seed (int, optional): The seed of the random number generator. Defaults to None.
+
+    Returns:
+        list of str: The sampled records, grouped by category (in order of first appearance).
+    """
+
+    return sample_records_stratified_multi(records, sample_size, key, min_share, 1, seed)[0]
+
+
+def sample_records_stratified_multi(records, sample_size, key, min_share, k, seed=None):
+    """
+    Selects k independent random samples of records, stratified by category, in a single pass.
+
+    Each category keeps a uniform random sample of its own records (reservoir sampling, 
+    Algorithm R), of up to sample_size records. Once all records are seen, each category 
+    gets at least min_share of the sample (or all of its records, if it has fewer), and 
+    the rest of the sample is allocated proportionally to the size of each category.
+
+    Parameters:
+        records (iterable of str): The records to sample from (e.g., the lines of a file).
+        sample_size (int): The sample size to consider.
+        key (callable): A function returning the category of a record (e.g., its protected 
+                        value).
+        min_share (float): The minimum share of the sample of each category (example: 0.1).
+                           If the minimum shares add up to more than the sample size, every
+                           category gets its minimum share.
+        k (int): The number of samples.
+        seed (int, optional): The seed of the random number generator of the first sample
+                              (sample i uses seed + i). Defaults to None.
+
+    Returns:
+        list of list of str: The sampled records of each sample, grouped by category (in 
+                             order of first appearance).
+    """
+
+    rngs = [random.Random(seed + i if seed != None else None) for i in range(k)]
+
+    # Uniform random sample (of each sample) and number of records of each category
+    reservoirs = {}
+    counts = {}
+
+    for record in records:
+        category = key(record)
+        counts[category] = counts.get(category, 0) + 1
+
+        if category not in reservoirs:
+            reservoirs[category] = [[] for _ in range(k)]
+
+        if counts[category] <= sample_size:
+            for reservoir in reservoirs[category]:
+                reservoir.append(record)
+        else:
+            for (rng, reservoir) in zip(rngs, reservoirs[category]):
+                i = rng.randrange(counts[category])
+                if i < sample_size:
+                    reservoir[i] = record
+
+    # Minimum share of each category, then one record at a time to the category
+    # with the smallest share of its records in the sample
+    allocation = { category: min(counts[category], math.ceil(min_share * sample_size)) for category in counts }
+    while sum(allocation.values()) < sample_size:
+        candidates = [category for category in counts if allocation[category] < counts[category]]
+        if candidates == []:
+            break
+
+        category = min(candidates, key=lambda category: allocation[category] / counts[category])
+        allocation[category] += 1
+
+    # Reservoirs are uniform samples, but in order of replacement, so they are shuffled 
+    # before they are cut
+    samples = [[] for _ in range(k)]
+    for category in reservoirs:
+        for (rng, reservoir, sample) in zip(rngs, reservoirs[category], samples):
+            rng.shuffle(reservoir)
+            sample += reservoir[:allocation[category]]
+
+    return samples
+
+
+def read_columns(table_path, cache=None):
+    """
+    Reads the column names of a dataset.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        cache (TableCache, optional): The columnar cache of the dataset. Defaults to None.
+
+    Returns:
+        list of str: The column names (including the protected column), as read by the 
+                     table parser.
+    """
+
+    if cache:
+        return list(cache.columns)
+
+    # First line of dataset is column names
+    with open_table(table_path) as f:
+        return next(f).strip().lower().split(',')
+
+
+def draw_samples(table_path, sample_size, k, seed=None, cache=None, stratify=None):
+    """
+    Reads a dataset and selects k independent random samples in a single pass, so that 
+    several runs over the same dataset (see main(..., sample=...)) read it only once.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        sample_size (int): The sample size to consider (-1 for 3400 / #columns).
+        k (int): The number of samples.
+        seed (int, optional): The seed used to select the first sample (sample i uses
+                              seed + i). Defaults to None.
+        cache (TableCache, optional): The columnar cache of the dataset. If provided, row 
+                                      indices are sampled, and only the sampled rows are
+                                      decoded. Defaults to None.
+        stratify (float, optional): The minimum share of each sample of each protected 
+                                    value, if stratified (see sample_records_stratified_multi(...)).
+                                    Defaults to None (uniform samples).
+
+    Returns:
+        list of list of list of str: The rows of each sample (stripped, lowercased and split
+                                     on commas).
+    """
+
+    column_names = read_columns(table_path, cache)
+
+    # Calculate sample size dynamically in order to mantain
+    # total number of cells approx. constant
+    if sample_size == -1:
+        sample_size = 3400 // len(column_names)
+
+    # If the dataset is cached, sample row indices and decode only the sampled rows
+    if cache:
+        if stratify != None:
+            samples = sample_records_stratified_multi(range(len(cache)), sample_size, lambda i: cache.protected[i], 
+                                                      stratify, k, seed)
+        else:
+            samples = sample_records_multi(range(len(cache)), sample_size, k, seed)
+
+        return [[cache.row(i) for i in indices] for indices in samples]
+
+    # Compressed datasets are decompressed as they are read
+    with open_table(table_path) as f:
+        next(f)
+
+        # Only the sampled rows are kept in memory
+        if stratify != None:
+            samples = sample_records_stratified_multi(f, sample_size, lambda line: line.strip().split(',')[-1].lower(),
+                                                      stratify, k, seed)
+        else:
+            samples = sample_records_multi(f, sample_size, k, seed)
+
+    return [[line.strip().lower().split(',') for line in records] for records in samples]
+
+
 def filter_duplicates(rows, protected):
     """
     Applies the conflict removal algorithm described in S4.2 of the paper.
@@ -85,16 +366,342 @@ def filter_duplicates(rows, protected):
     return rowsP, protectedP
 
 
-# Iterator to generate unique strings
-strgen = generate_unique()
-
 # List of string replacements from dataset to Popper syntax
 repls = ('-', '_'), ('/', '_'), ('&', '_and_'), (' ', '_'), ('+', '_plus_'), ('<', '_lt_'), ('>', '_gt_'), \
         ('<=', '_lte_'), ('>=', '_gte_'), ('==', '_eq_'), ('=', '_eq_'), ('!=', '_neq_'), \
         ('[', ''), (']', ''), ('(', ''), (')', ''), ('.', '_'), (',', '_'), ('\'', ''), ('%', '')
 
 
-def generate_bias(cols, rows, int_cols, grounded_ops, categorical=False, category=None):
+class SymbolTable:
+    """
+    Maps the values of a dataset to the values loaded into Popper/Prolog.
+
+    Each value is converted once (replacement of illegal Popper syntax, parsing of numbers
+    and rebinding), and later conversions of the same value are dictionary lookups. The
+    same table is used to generate the Popper files and to load the dataset for validation,
+    so that both agree on every value. The table can be saved and loaded, so that later
+    runs over the same dataset reuse it.
+
+    Attributes:
+        atoms (dict of str to str): The values with illegal Popper syntax replaced.
+        terms (dict of str to (str or int or float)): The normalized values (numbers parsed).
+        rebinds (dict of str to str): The rebindings of values that have both alpha and 
+                                      numeric characters.
+        bins (dict of int to list): The bin boundaries of each binned column, by index (see
+                                    quantile_bins(...)). Set for each run from its sample, so
+                                    they aren't saved.
+    """
+
+    def __init__(self, atoms=None, terms=None, rebinds=None, bins=None):
+        self.atoms = atoms if atoms else {}
+        self.terms = terms if terms else {}
+        self.rebinds = rebinds if rebinds else {}
+        self.bins = bins if bins else {}
+
+        # Unique strings used for rebindings, skipping those already in use
+        self.names = itertools.islice(generate_unique(), len(self.rebinds), None)
+
+    def __getstate__(self):
+        # Pickle without the generator (e.g., when sent to a worker process)
+        return { "atoms": self.atoms, "terms": self.terms, "rebinds": self.rebinds, "bins": self.bins }
+
+    def __setstate__(self, state):
+        self.__init__(state["atoms"], state["terms"], state["rebinds"], state["bins"])
+
+    def atom(self, value):
+        """
+        Converts a value to lowercase and replaces the substrings corresponding to illegal 
+        syntax in Popper (numbers are kept as they are).
+
+        Parameters:
+            value (str): The value.
+
+        Returns:
+            str: The value as it appears in the Popper files.
+        """
+
+        if value not in self.atoms:
+            atom = value.lower()
+            for repl in repls:
+                atom = atom.replace(*repl) if not is_number(atom) else atom
+
+            self.atoms[value] = atom
+
+        return self.atoms[value]
+
+    def term(self, value):
+        """
+        Normalizes a value: numbers are parsed, and other values are converted into atoms 
+        (and rebound, if they have both alpha and numeric characters).
+
+        Parameters:
+            value (str): The value.
+
+        Returns:
+            str or int or float: The normalized value.
+        """
+
+        if value not in self.terms:
+            atom = self.atom(value)
+
+            if is_number(atom):
+                self.terms[value] = int(atom) if '.' not in atom else float(atom)
+            else:
+                self.terms[value] = atom
+                self.rebind(atom)
+
+        return self.terms[value]
+
+    def rebind(self, term):
+        """
+        Returns the value a normalized value is loaded as into Prolog. Values that have
+        both alpha and numeric characters are renamed as unique strings.
+
+        Parameters:
+            term (str or int or float): The normalized value.
+
+        Returns:
+            str or int or float: The value as loaded into Prolog.
+        """
+
+        if term in self.rebinds:
+            return self.rebinds[term]
+
+        if isinstance(term, str) and not is_number(term) and bool(re.search(r'\d', term)):
+            self.rebinds[term] = next(self.names)
+            return self.rebinds[term]
+
+        return term
+
+    def normalize(self, values):
+        """
+        Normalizes a list of values (see term(...)).
+
+        Parameters:
+            values (list of str): The values.
+
+        Returns:
+            list of (str or int or float): The normalized values.
+        """
+
+        return [self.term(value) for value in values]
+
+    def bin(self, j, value):
+        """
+        Replaces a number of a binned column by the atom of its bin (see bin_atom(...)).
+
+        Parameters:
+            j (int): The index of the column.
+            value (str or int or float): The value (non-numeric values, such as missing
+                                         values, are kept as they are).
+
+        Returns:
+            str or int or float: The atom of the bin, or the value if the column isn't
+                                 binned or the value isn't a number.
+        """
+
+        if j not in self.bins or not is_number(str(value)):
+            return value
+
+        number = int(value) if '.' not in str(value) else float(value)
+
+        return bin_atom(self.bins[j], bisect.bisect_right(self.bins[j], number))
+
+    def discretize(self, values):
+        """
+        Replaces the numbers of the binned columns of a row by the atoms of their bins
+        (see bin(...)).
+
+        Parameters:
+            values (list of (str or int or float)): The values of the row.
+
+        Returns:
+            list of (str or int or float): The values, with the numbers of the binned columns
+                                           replaced.
+        """
+
+        return [self.bin(j, values[j]) for j in range(len(values))]
+
+    def save(self, path):
+        """
+        Saves the table as a JSON file.
+
+        Parameters:
+            path (str): The path to the file.
+        """
+
+        # Write to a temporary file first, so that the table is never left half-written
+        tmp_path = "{}.tmp-{}".format(path, os.getpid())
+        with open(tmp_path, 'w+') as f:
+            json.dump({ "atoms": self.atoms, "terms": self.terms, "rebinds": self.rebinds }, f)
+
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        """
+        Loads a table saved by save(...).
+
+        Parameters:
+            path (str): The path to the file.
+
+        Returns:
+            SymbolTable: The table, or an empty table if the file doesn't exist or is invalid.
+        """
+
+        try:
+            with open(path, 'r') as f:
+                table = json.load(f)
+
+            return SymbolTable(table["atoms"], table["terms"], table["rebinds"])
+        except (OSError, ValueError, KeyError):
+            return SymbolTable()
+
+
+def quantile_bins(values, n):
+    """
+    Computes the boundaries of (at most) n quantile (i.e., equal-frequency) bins of the 
+    numbers of a column.
+
+    Each boundary is the first number of a bin, so bin k holds the numbers between boundaries
+    k-1 (inclusive) and k (exclusive). Repeated numbers can't be split between bins, so a bin
+    may hold more numbers than the others (e.g., the zeros of a column of capital gains), in
+    which case the numbers left are split evenly between the bins left. Columns with few
+    distinct numbers have fewer bins.
+
+    Parameters:
+        values (list of str): The values of the column (non-numeric values are ignored).
+        n (int): The number of bins.
+
+    Returns:
+        list of int and float: The sorted boundaries between consecutive bins.
+    """
+
+    numbers = sorted(int(value) if '.' not in value else float(value) for value in values if is_number(value))
+
+    bounds = []
+    start = 0
+
+    while len(bounds) < n - 1 and start < len(numbers):
+        # Last number of the bin, if the numbers left were split evenly
+        last = numbers[max(start + (len(numbers) - start) // (n - len(bounds)), start + 1) - 1]
+
+        # Next bin starts at the first greater number
+        start = bisect.bisect_right(numbers, last, start)
+        if start >= len(numbers):
+            break
+
+        bounds.append(numbers[start])
+
+    return bounds
+
+
+def bin_atom(bounds, k):
+    """
+    Returns the atom of a bin, which keeps its boundaries (example: "ge_0_lt_3103", for the
+    numbers between 0 and 3103, or "lt_0" and "ge_7688" for the first and last bins).
+
+    Parameters:
+        bounds (list of int and float): The boundaries of the bins (see quantile_bins(...)).
+        k (int): The index of the bin.
+
+    Returns:
+        str: The atom of the bin.
+    """
+
+    names = [str(bound).replace('-', '_minus_').replace('.', '_') for bound in bounds]
+
+    if k == 0:
+        return "lt_{}".format(names[0])
+    if k == len(bounds):
+        return "ge_{}".format(names[-1])
+
+    return "ge_{}_lt_{}".format(names[k - 1], names[k])
+
+
+def int_type(col, typed=True):
+    """
+    Returns the type of the integer attributes of a column.
+
+    Parameters:
+        col (str): The name of the column.
+        typed (bool, optional): A flag indicating whether each integer column has its own 
+                                type. Defaults to True.
+
+    Returns:
+        str: "int_{col}" if typed, or "int" (shared by all integer columns) otherwise.
+    """
+
+    return "int_{}".format(col) if typed else "int"
+
+
+def int_constant(col, value, typed=True):
+    """
+    Returns the name of the decision point of an integer value of a column.
+
+    Parameters:
+        col (str): The name of the column.
+        value (str): The integer value.
+        typed (bool, optional): A flag indicating whether each integer column has its own 
+                                type. Defaults to True.
+
+    Returns:
+        str: "int_{col}_{value}" if typed, or "int_{value}" otherwise (with '-' and '.'
+             replaced by "_minus_" and '_').
+    """
+
+    name = value.replace('-', '_minus_').replace('.', '_')
+
+    return "int_{}_{}".format(col, name) if typed else "int_{}".format(name)
+
+
+def typed_operator(op, col):
+    """
+    Returns the name of a grounded operator over the integer attributes of a column only.
+
+    Parameters:
+        op (object): The grounded operator.
+        col (str): The name of the column.
+
+    Returns:
+        str: "{operator}_{col}" (example: "lt_age").
+    """
+
+    return "{}_{}".format(op.operator(), col)
+
+
+def untyped_names(bias_path):
+    """
+    Maps the typed decision points and operators declared in a bias file back to their 
+    untyped names (example: "int_age_39" to "int_39", "lt_age" to "lt"), so that the rules
+    learned with typed integer columns can be validated as any other rule.
+
+    Parameters:
+        bias_path (str): The path to the bias file.
+
+    Returns:
+        dict of str to str: A dictionary mapping each typed name to its untyped name (empty
+                            if the integer columns aren't typed).
+    """
+
+    names = {}
+
+    with open(bias_path, 'r') as f:
+        for line in f:
+            # Decision points: constant(int_{col}_{value},int_{col}).
+            constant = re.match(r'^constant\((int_\w+),int_(\w+)\)\.$', line.strip())
+            if constant and constant.group(1).startswith("int_{}_".format(constant.group(2))):
+                names[constant.group(1)] = "int_" + constant.group(1)[len("int_{}_".format(constant.group(2))):]
+
+            # Operators: type({operator}_{col},(int_{col},...,int_{col})).
+            operator = re.match(r'^type\((\w+),\(int_(\w+)(?:,int_\w+)*\)\)\.$', line.strip())
+            if operator and operator.group(1).endswith("_" + operator.group(2)):
+                names[operator.group(1)] = operator.group(1)[:-len("_" + operator.group(2))]
+
+    return names
+
+
+def generate_bias(cols, rows, int_cols, grounded_ops, categorical=False, category=None, typed=False):
     """
     Generates bias file for a given dataset and configuration.
 
@@ -109,6 +716,8 @@ def generate_bias(cols, rows, int_cols, grounded_ops, categorical=False, categor
         categorical (bool, optional): A flag indicating whether the bias is for a 
                                       run in categorical mode. Defaults to False.
         category (str, optional): The category for a categorical run. Defaults to None.
+        typed (bool, optional): A flag indicating whether each integer column has its own 
+                                type (see int_type(...)). Defaults to False.
 
     Returns:
         list of str: A list with bias information.
@@ -118,22 +727,29 @@ def generate_bias(cols, rows, int_cols, grounded_ops, categorical=False, categor
     colsP = cols[:-1] if categorical else cols
 
     # Type information of non-protected/protected attributes
-    # Integer attributes have single type "int", unless otherwise specified in int_cols
+    # Integer attributes have single type "int" (or, if typed, a type per column), unless 
+    # otherwise specified in int_cols
     # Non-integer attributes have type corresponding to column
-    attr_classes = ["attr_{}".format(colsP[j]) if not int_cols[j] else "int" for j in range(len(colsP))]
+    attr_classes = ["attr_{}".format(colsP[j]) if not int_cols[j] else int_type(colsP[j], typed) for j in range(len(colsP))]
     for row in rows:
         attr_names = ["attr_{}_{}".format(colsP[j], row[j].replace('-', '_minus_').replace('.', '_')) if not int_cols[j] else \
-                      "int_{}".format(row[j].replace('-', '_minus_').replace('.', '_')) for j in range(len(colsP))]
+                      int_constant(colsP[j], row[j], typed) for j in range(len(colsP))]
         bias += ["constant({},{}).".format(attr_names[j], attr_classes[j]) for j in range(len(colsP))]
 
+    # Grounded operators and the types they apply to (a single operator over type "int", or,
+    # if typed, one operator per integer column)
+    typed_ops = [(typed_operator(op, colsP[j]), int_type(colsP[j], typed), op.arity())
+                 for op in grounded_ops for j in range(len(colsP)) if int_cols[j]] if typed else \
+                [(op.operator(), "int", op.arity()) for op in grounded_ops]
+
     # Arity of head (protected) predicate
     arity = 1 if categorical else 2
     head_name = category if categorical else cols[-1]
     bias += ["head_pred({},{}).".format(head_name, arity)]
 
     # Arity of grounded operators
-    for op in grounded_ops:
-        bias += ["body_pred({},{}).".format(op.operator(), op.arity())]
+    for (op, _, arity) in typed_ops:
+        bias += ["body_pred({},{}).".format(op, arity)]
 
     # Arity of body (non-protected) predicates
     for col in cols[:-1]:
@@ -143,16 +759,18 @@ def generate_bias(cols, rows, int_cols, grounded_ops, categorical=False, categor
     if categorical:
         bias += ["type({},(ex,)).".format(category)]
     else:
-        bias += ["type({},(ex,attr_{})).".format(cols[-1], cols[-1]) if not int_cols[-1] else "type({},(ex,int)).".format(cols[-1])]
+        bias += ["type({},(ex,attr_{})).".format(cols[-1], cols[-1]) if not int_cols[-1] else \
+                 "type({},(ex,{})).".format(cols[-1], int_type(cols[-1], typed))]
 
     # Type information of grounded operators
     # Grounded operators can only be applied to integer attributes
-    for op in grounded_ops:
-        bias += ["type({},({})).".format(op.operator(), ("int," * op.arity())[:-1])]
+    for (op, int_class, arity) in typed_ops:
+        bias += ["type({},({})).".format(op, ((int_class + ",") * arity)[:-1])]
 
     # Type information of body (non-protected) predicates
     for i in range(len(cols) - 1):
-        bias += ["type({},(ex,attr_{})).".format(cols[i], cols[i]) if not int_cols[i] else "type({},(ex,int)).".format(cols[i])]
+        bias += ["type({},(ex,attr_{})).".format(cols[i], cols[i]) if not int_cols[i] else \
+                 "type({},(ex,{})).".format(cols[i], int_type(cols[i], typed))]
 
     # Boilerplate facts
     bias += [":- clause(C), #count{V : var_type(C,V,ex)} != 1."]
@@ -162,7 +780,7 @@ def generate_bias(cols, rows, int_cols, grounded_ops, categorical=False, categor
     return list(dict.fromkeys(bias))
 
 
-def generate_constants(cols, rows, rebinds, int_cols):
+def generate_constants(cols, rows, rebinds, int_cols, typed=False):
     """
     Generates decision points (DP) for each attribute in the dataset, based on their 
     type (integer or non-integer). Non-integer attributes containing both
@@ -179,6 +797,10 @@ def generate_constants(cols, rows, rebinds, int_cols):
                                       alpha and numeric characters.
         int_cols (list of bool): A list of booleans indicating whether each column is 
                                  an integer.
+        typed (bool, optional): A flag indicating whether each integer column has its own 
+                                type. If so, integer attributes also have a typed decision
+                                point "int_{col}_{value}({value}).", used by Popper (the
+                                untyped one is used by validation). Defaults to False.
 
     Returns:
         list of str: A list of decision points in the format "attr_name_{value}({value|rebind})." 
@@ -189,11 +811,14 @@ def generate_constants(cols, rows, rebinds, int_cols):
     for row in rows:
         consts += ["attr_{}_{}({}).".format(cols[j], row[j].replace('-', '_minus_').replace('.', '_'), rebinds[row[j]] if row[j] in rebinds else row[j]) \
                    if not int_cols[j] else "int_{}({}).".format(row[j].replace('-', '_minus_').replace('.', '_'), row[j]) for j in range(len(row))]
+        if typed:
+            consts += ["{}({}).".format(int_constant(cols[j], row[j]), row[j]) for j in range(len(row)) if int_cols[j]]
 
     return list(dict.fromkeys(consts))
 
 
-def generate_background(cols, rows, protected, rebinds, int_cols, sample_size, grounded_ops):
+def generate_background(cols, rows, protected, rebinds, int_cols, sample_size, grounded_ops, lazy=False,
+                        typed=False, protected_col=None):
     """
     Generates column relations (CR) and pair relations (PR) for a given dataset 
     and configuration.
@@ -210,6 +835,16 @@ def generate_background(cols, rows, protected, rebinds, int_cols, sample_size, g
                                  is an integer.
         sample_size (int): The sample size to consider.
         grounded_ops (list of object): A list of operators to be grounded.
+        lazy (bool, optional): A flag indicating whether operators that provide a Prolog 
+                               definition should be defined by it instead of grounded. 
+                               Defaults to False.
+        typed (bool, optional): A flag indicating whether each integer column has its own 
+                                type. If so, each operator is grounded over the integer 
+                                attributes of each column separately, as a typed operator
+                                (see typed_operator(...)). Defaults to False.
+        protected_col (str, optional): The name of the protected column. If typed, operators
+                                       are only grounded over the protected column if it is
+                                       provided (i.e., it appears in the rules). Defaults to None.
 
     Returns:
         list of str: A list of column and pair relations.
@@ -217,29 +852,65 @@ def generate_background(cols, rows, protected, rebinds, int_cols, sample_size, g
 
     facts = []
     int_attrs = []
+    col_int_attrs = {}
 
     # Column relations for non-protected attributes
     # In the meantime, capture any integer attributes that the tool sees
     for (i, row) in zip(range(max(sample_size, len(rows))), rows):
         facts += ["{}({},{}).".format(cols[j], i, rebinds[row[j]] if row[j] in rebinds else row[j]) for j in range(len(row))]
         int_attrs += [row[i] for i in range(len(row)) if int_cols[i]]
+        for j in range(len(row)):
+            if int_cols[j]:
+                col_int_attrs.setdefault(cols[j], []).append(row[j])
 
     # Capture integer attributes in protected column
     for row in protected:
         if int_cols[-1]:
             int_attrs += row
+            if protected_col:
+                col_int_attrs.setdefault(protected_col, []).extend(row)
 
-    int_attrs = list(dict.fromkeys(int_attrs))
-    int_attrs = list(map(lambda n: int(n) if '.' not in n else float(n), int_attrs))
-    int_attrs.sort()
+    int_attrs = sorted_numbers(int_attrs)
 
     # Pair relations for grounded operations over integer attributes
+    # If typed, pair relations only relate integer attributes of the same column
+    # With lazy grounding, operators are instead defined by rules over the integer attributes
     for op in grounded_ops:
-        facts += op.ground(int_attrs)
+        if lazy and op.define():
+            facts += op.define()
+            if typed:
+                args = ','.join("I{}".format(k) for k in range(op.arity()))
+                facts += ["{}({}):- {}({}).".format(typed_operator(op, col), args, op.operator(), args) for col in col_int_attrs]
+        elif typed:
+            for (col, attrs) in col_int_attrs.items():
+                facts += [typed_operator(op, col) + fact[len(op.operator()):] for fact in op.ground(sorted_numbers(attrs))]
+        else:
+            facts += op.ground(int_attrs)
+
+    if lazy and any(op.define() for op in grounded_ops):
+        facts += ["numeric({}).".format(n) for n in int_attrs]
 
     return list(dict.fromkeys(facts))
 
 
+def sorted_numbers(attrs):
+    """
+    Converts a list of integer attributes into a sorted list of numbers, without duplicates.
+
+    Parameters:
+        attrs (list of str): A list of integer attributes.
+
+    Returns:
+        list of int and float: The sorted list of integers/floats.
+    """
+
+    attrs = list(dict.fromkeys(attrs))
+    attrs = list(map(lambda n: int(n) if '.' not in n else float(n), attrs))
+    attrs.sort()
+
+    return attrs
+
+
 def generate_functest(col):
     """
     Generates functional test for protected column. Functional test ensures that output is
@@ -329,7 +1000,8 @@ def generate_popper_files(path, bias, consts, facts, exs, functest=[]):
         f.writelines(line + "\n" for line in sorted(exs))
 
 
-def main(table_path, int_cols, grounded_ops, sample_size, categorical, path):
+def main(table_path, int_cols, grounded_ops, sample_size, categorical, path, lazy=False, seed=None, cache=None,
+         symbols=None, typed=False, bins=None, stratify=None, sample=None):
     """
     Main function to generate Popper files for a given dataset and configuration.
 
@@ -339,32 +1011,65 @@ def main(table_path, int_cols, grounded_ops, sample_size, categorical, path):
         grounded_ops (list of object): A list of operators to be grounded.
         sample_size (int): The sample size to consider.
         categorical (bool): A flag indicating whether the run is in categorical mode.
+        path (str): The path where the Popper files will be generated.
+        lazy (bool, optional): A flag indicating whether operators should be defined by 
+                               Prolog rules instead of grounded. Defaults to False.
+        seed (int, optional): The seed used to select the sample. Defaults to None.
+        cache (TableCache, optional): The columnar cache of the dataset. If provided, the
+                                      sample is read from the cache instead of the dataset.
+                                      Defaults to None.
+        symbols (SymbolTable, optional): The symbol table of the dataset. Defaults to a new
+                                         (empty) table.
+        typed (bool, optional): A flag indicating whether each integer column has its own type,
+                                so that operators only relate integer attributes of the same
+                                column. Defaults to False.
+        bins (dict of int to int, optional): The number of quantile bins of each non-protected
+                                             integer column to be binned, by index. The numbers
+                                             of a binned column are replaced by the atoms of
+                                             their bins (computed from the sample, and kept
+                                             in the symbol table for validation). Defaults to 
+                                             None (no binning).
+        stratify (float, optional): The minimum share of the sample of each protected value.
+                                    If provided, the sample is stratified by protected value
+                                    (see sample_records_stratified(...)). Defaults to None 
+                                    (uniform sample).
+        sample (list of list of str, optional): The rows of a sample selected beforehand 
+                                                (e.g., one of several samples selected in a
+                                                single pass by draw_samples(...)). If provided,
+                                                the dataset isn't read again, and seed and
+                                                stratify are ignored. Defaults to None.
 
     Returns:
         random_n (list of list of str): The random sample of the dataset.
-        rebinds (dict of str to str): The rebindings of values that have both alpha 
-                                      and numeric characters.
+        symbols (SymbolTable): The symbol table of the dataset, with the rebindings of 
+                               values that have both alpha and numeric characters.
     """
 
-    with open(table_path, 'r') as f:
-        # First line of dataset is column names
-        column_names = next(f).strip().lower().split(',')
+    symbols = symbols if symbols else SymbolTable()
+
+    column_names = read_columns(table_path, cache)
 
-        # Calculate sample size dynamically in order to mantain
-        # total number of cells approx. constant
-        if sample_size == -1:
-            sample_size = 3400 // len(column_names)
+    # Calculate sample size dynamically in order to mantain
+    # total number of cells approx. constant
+    if sample_size == -1:
+        sample_size = 3400 // len(column_names)
 
-        # Read dataset and select random sample
-        # No observed impact in memory usage, even in large datasets (e.g., KDD)
-        records = f.readlines()
-        records_sample = records if len(records) <= sample_size else random.sample(records, sample_size)
-        random_n = [line.strip().lower().split(',') for line in records_sample]
+    # Read dataset and select random sample in a single pass (unless selected beforehand)
+    random_n = sample if sample != None else draw_samples(table_path, sample_size, 1, seed, cache, stratify)[0]
 
-        # Replace all substrings corresponding to illegal syntax in Popper 
-        for repl in repls:
-            column_names = list(map(lambda col: col.replace(*repl) if not is_number(col) else col, column_names))
-            random_n = list(map(lambda row: list(map(lambda el: el.replace(*repl) if not is_number(el) else el, row)), random_n))
+    # Replace all substrings corresponding to illegal syntax in Popper 
+    column_names = [symbols.atom(col) for col in column_names]
+    random_n = [[symbols.atom(el) for el in row] for row in random_n]
+
+    # Replace the numbers of binned columns by their bins
+    # Bin boundaries are computed from the sample, and later used to load the dataset
+    bins = bins if bins else {}
+    if any(j >= len(column_names) - 1 for j in bins):
+        sys.exit("[ERROR] Only non-protected columns can be binned")
+
+    symbols.bins = { j: bounds for (j, bounds) in ((j, quantile_bins([row[j] for row in random_n], n)) for (j, n) in bins.items()) 
+                     if bounds != [] }
+    random_n = [symbols.discretize(row) for row in random_n]
 
     # Did the user specify which columns are integer columns?
     if int_cols == None:
@@ -374,13 +1079,15 @@ def main(table_path, int_cols, grounded_ops, sample_size, categorical, path):
     else:
         int_cols = [True if i in int_cols else False for i in range(len(random_n[0]))]
 
+    # Binned columns are no longer integer columns
+    int_cols = [int_cols[j] and j not in symbols.bins for j in range(len(int_cols))]
+
     # Rename values that have both alpha and numeric characters as unique string
-    rebinds = {}
     for row in random_n:
         for attr in row:
-            if not is_number(attr) and bool(re.search(r'\d', attr)) and \
-               not attr in rebinds.keys():
-                rebinds[attr] = next(strgen)
+            symbols.rebind(attr)
+
+    rebinds = symbols.rebinds
 
     # Extract non-protected/protected attributes
     non_protected_columns = column_names[:-1]
@@ -392,16 +1099,18 @@ def main(table_path, int_cols, grounded_ops, sample_size, categorical, path):
     non_protected_random_n, protected_random_n = filter_duplicates(non_protected_random_n, protected_random_n)
 
     # Facts are independent of whether in categorical mode or not
-    facts = generate_background(non_protected_columns, non_protected_random_n, protected_random_n, rebinds, int_cols, sample_size, grounded_ops)
+    # The protected column only appears in the rules outside categorical mode
+    facts = generate_background(non_protected_columns, non_protected_random_n, protected_random_n, rebinds, int_cols, sample_size, grounded_ops, lazy,
+                                typed, protected_columns[0] if not categorical else None)
 
     # If running in categorical mode, generate bias/background/examples 
     # for each protected value/category at a time
     if categorical:
         for category in map(lambda l: l[-1], random_n):
-            bias = generate_bias(column_names, random_n, int_cols, grounded_ops, categorical, category)
+            bias = generate_bias(column_names, random_n, int_cols, grounded_ops, categorical, category, typed)
 
             # Don't generate constants for protected column
-            consts = generate_constants(non_protected_columns, non_protected_random_n, rebinds, int_cols[:-1])  
+            consts = generate_constants(non_protected_columns, non_protected_random_n, rebinds, int_cols[:-1], typed)
             exs = generate_exs(protected_columns[0], protected_random_n, rebinds, sample_size, categorical, category)
 
             out_path = path + "-" + category
@@ -411,8 +1120,8 @@ def main(table_path, int_cols, grounded_ops, sample_size, categorical, path):
     # If running in non-categorical mode, generate single instance of
     # bias/background/examples and add functional test to ensure output is functional
     else:
-        bias = generate_bias(column_names, random_n, int_cols, grounded_ops)
-        consts = generate_constants(column_names, random_n, rebinds, int_cols)
+        bias = generate_bias(column_names, random_n, int_cols, grounded_ops, typed=typed)
+        consts = generate_constants(column_names, random_n, rebinds, int_cols, typed)
         functest = generate_functest(protected_columns[0])
         exs = generate_exs(protected_columns[0], protected_random_n, rebinds, sample_size)
 
@@ -420,8 +1129,8 @@ def main(table_path, int_cols, grounded_ops, sample_size, categorical, path):
 
         generate_popper_files(out_path, bias, consts, facts, exs, functest)
 
-    # Need to return sample and rebindings to be used by the pipeline 
-    return random_n, rebinds
+    # Need to return sample and symbol table to be used by the pipeline 
+    return random_n, symbols
 
 
 # Not called by padtai.py
@@ -437,6 +1146,8 @@ if __name__ == '__main__':
                         help='set output directory for generated files (default: dataset name)')
     parser.add_argument('--sample-size', type=int, default=-1,
                         help='set sample size (default: 3400 / #columns)')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='set seed used to select the sample (default: random)')
     parser.add_argument('--intcols', type=str, default=None,
                         help='set integer columns; expects comma-separated list of integers \
                               (or \'none\') (example: 1,4,5) (default: all integer columns)')
@@ -446,6 +1157,24 @@ if __name__ == '__main__':
                               list with entries of the form <file>:<class> (or \'none\'), where \
                               <file> is the path to a file under the operators directory and <class> \
                               is the name of the class (default: lt:LTOperator)')
+    parser.add_argument('--grounding', choices=['eager', 'lazy'],
+                        type=str, default='eager',
+                        help='set grounding mode: eager (generate all pair relations), lazy (define \
+                              operators by Prolog rules over the integer attributes) (default: eager)')
+    parser.add_argument('--typed-ints', action='store_true',
+                        help='give each integer column its own type, so that operators only relate \
+                              integers of the same column (default: false)')
+    parser.add_argument('--stratify', type=float, metavar="share", default=None,
+                        help='stratify the sample by protected value, so that each value has at \
+                              least the given share of the sample (example: 0.1) (default: uniform \
+                              sample)')
+    parser.add_argument('--bins', type=str, default=None,
+                        help='replace the integers of some columns by quantile bins; expects \
+                              comma-separated list with entries of the form <column>:<bins> \
+                              (example: 10:4,11:4) (default: none)')
+    parser.add_argument('--samples', type=int, metavar="k", default=1,
+                        help='select k independent samples in a single pass and write k sets of \
+                              files, with suffixes -0 to -(k-1) (sample i uses seed + i) (default: 1)')
     
     args = parser.parse_args()
 
@@ -456,7 +1185,7 @@ if __name__ == '__main__':
                      args.grounded != "none" else [] if args.grounded else None
     sample_size = args.sample_size
     categorical = args.categorical
-    path = args.out if args.out else Path(table_path).stem
+    path = args.out if args.out else table_stem(table_path)
 
     # By default, load only less-than operator
     grounded_ops = []
@@ -471,4 +1200,15 @@ if __name__ == '__main__':
             OpClass = getattr(importlib.import_module('operators.' + file), op)
             grounded_ops.append(OpClass())
 
-    main(table_path, int_cols, grounded_ops, sample_size, categorical, path)
+    bins = dict(map(lambda entry: tuple(map(int, entry.split(':'))), args.bins.split(','))) if args.bins else None
+
+    if args.samples == 1:
+        main(table_path, int_cols, grounded_ops, sample_size, categorical, path, args.grounding == 'lazy', args.seed,
+             typed=args.typed_ints, bins=bins, stratify=args.stratify)
+
+    # Read the dataset only once for all samples
+    else:
+        samples = draw_samples(table_path, sample_size, args.samples, args.seed, stratify=args.stratify)
+        for (i, sample) in enumerate(samples):
+            main(table_path, int_cols, grounded_ops, sample_size, categorical, "{}-{}".format(path, i), 
+                 args.grounding == 'lazy', typed=args.typed_ints, bins=bins, sample=sample)
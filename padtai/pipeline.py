@@ -1,14 +1,30 @@
-from . parsetable import main as parse_table, is_number, strgen, repls
-
+from . parsetable import main as parse_table, draw_samples, is_number, untyped_names, SymbolTable
+from . rules import rule_category, order_operators_last, rename_predicates
+from . columnar import ColumnTable, read_constants, validate_rules as validate_rules_columnar
+from . bitset import validate_rules as validate_rules_bitset
+from . cache import load_cache
+from . results import ResultCache, IncrementalResults
+from . checkpoint import Checkpoint
+from . profiling import Profiler, run_profiled
+from . streams import is_compressed, open_table, table_cursor, cursor_scope, table_stem
+from . import profiling
+
+import os
 import sys
 import argparse
 import shutil
 import importlib
 import re
+import copy
+import json
+import time
+import multiprocessing
 
 import janus_swi as janus
 
 from pathlib import Path
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 
 from popper.util import Settings, order_prog, format_rule
 from popper.loop import learn_solution
@@ -45,42 +61,15 @@ def format_prog(prog, settings):
     return formatted, head
 
 
-def normalize(strlist, rebinds):
-    """
-    Normalizes a list of strings. 
-    
-    The function converts strings to lowercase, parses numbers, and reverts the 
-    replacement and rebinding operations done by the table parser.
-
-    Parameters:
-        strlist (list of str): A list of strings to be normalized.
-        rebinds (dict of str to str): The rebindings of non-integer values that have both 
-                                      alpha and numeric characters.
-
-    Returns:
-        list of str: The normalized list of strings.
-    """
-
-    for i in range(len(strlist)):
-        # Convert to lowercase
-        strlist[i] = strlist[i].lower()
-
-        # Parse numbers
-        if is_number(strlist[i]):
-            strlist[i] = int(strlist[i]) if '.' not in strlist[i] else float(strlist[i])
-            continue
-
-        # Revert replacement of illegal Popper syntax
-        for repl in repls:
-            strlist[i] = strlist[i].replace(*repl) if not is_number(strlist[i]) else strlist[i]
-
-        # Revert rebinding of non-integer attributes containing both alpha 
-        # and numeric characters
-        if not is_number(strlist[i]) and bool(re.search(r'\d', strlist[i])) and \
-           not strlist[i] in rebinds.keys():
-            rebinds[strlist[i]] = next(strgen)
-
-    return strlist
+# Batch sizes, in rows
+# With adaptive sizing, batches start at the default size, and grow or shrink (at most by
+# half or twice the size, each batch) so that each batch takes about BATCH_TIME seconds and
+# the Prolog heap used by validation stays under BATCH_MEMORY bytes
+BATCH_SIZE = 2000
+MIN_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 128000
+BATCH_TIME = 10
+BATCH_MEMORY = 1 << 30
 
 
 def parse():
@@ -94,12 +83,27 @@ def parse():
                            and 'all').
             - categorical (bool): A flag indicating whether categorical mode is enabled.
             - sample_size (int): The sample size.
+            - seed (int): The seed used to select the sample.
             - max_timeout (int): The maximum timeout.
             - min_coverage (float): The minimum coverage threshold.
             - min_recall (float): The minimum recall threshold.
             - min_precision (float): The minimum precision threshold.
             - intcols (str): A list of the integer columns in string form.
             - grounded (str): A list of the operators to be grounded in string form.
+            - grounding (str): The grounding mode (choice between 'eager' and 'lazy').
+            - cache (bool): A flag indicating whether to use the columnar cache of the dataset.
+            - validator (str): The validation backend (choice between 'prolog', 'aggregate',
+                               'numpy', and 'bitset').
+            - jobs (int): The number of categories learned and validated in parallel.
+            - shards (int): The number of shards of the dataset validated in parallel.
+            - prune (bool): A flag indicating whether to drop rules that can no longer reach
+                            the thresholds during validation.
+            - checkpoint (str): The path to the checkpoint directory of the run.
+            - anytime (bool): A flag indicating whether to validate rules while Popper is still
+                              searching, and print those that reach the thresholds right away.
+            - result_cache (str): The path to the cache of validation results.
+            - incremental (str): The path to the store of validation progress.
+            - profile (str): The path to save the profile of the run to.
     """
 
     parser = argparse.ArgumentParser(formatter_class=argparse.MetavarTypeHelpFormatter)
@@ -119,6 +123,12 @@ def parse():
                               (default: nuwls)')
     parser.add_argument('--sample-size', type=int, default=-1,
                         help='set sample size (default: 3400 / #columns)')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='set seed used to select the sample (default: random)')
+    parser.add_argument('--stratify', type=float, metavar="share", default=None,
+                        help='stratify the sample by protected value, so that each value (e.g., a \
+                              minority race) has at least the given share of the sample, or all of \
+                              its rows if it has fewer (example: 0.1) (default: uniform sample)')
     parser.add_argument('--max-timeout', type=int, default=1200,
                         help='set maximum timeout in seconds (default: 1200 seconds)')
     parser.add_argument('--min-coverage', type=float, default=10,
@@ -136,12 +146,335 @@ def parse():
                               list with entries of the form <file>:<class> (or \'none\'), where \
                               <file> is the path to a file under the operators directory and <class> \
                               is the name of the class (default: lt:LTOperator)')
+    parser.add_argument('--cache', action='store_true',
+                        help='convert dataset into a columnar cache stored next to it, and reuse it \
+                              in later runs (default: false)')
+    parser.add_argument('--grounding', choices=['eager', 'lazy'],
+                        type=str, default='eager',
+                        help='set grounding mode: eager (generate all pair relations), lazy (define \
+                              operators by Prolog rules over the integer attributes) (default: eager)')
+    parser.add_argument('--typed-ints', action='store_true',
+                        help='give each integer column its own type, so that grounded operators only \
+                              relate integers of the same column (e.g., ages with ages, but not with \
+                              amounts), which shrinks the background knowledge and the search space \
+                              (default: false)')
+    parser.add_argument('--bins', type=parse_bins, metavar="str", default={},
+                        help='replace the integers of some columns by quantile (equal-frequency) \
+                              bins, computed from the sample; expects comma-separated list with \
+                              entries of the form <column>:<bins> (example: 10:4,11:4); cuts the \
+                              decision points and pair relations of columns with many distinct \
+                              integers (default: none)')
+    parser.add_argument('--validator', choices=['prolog', 'aggregate', 'numpy', 'bitset'],
+                        type=str, default='prolog',
+                        help='choose validation backend: prolog (query each row in SWI-Prolog), \
+                              aggregate (count each rule with a single SWI-Prolog query per batch), \
+                              numpy (evaluate rules as vectorized masks over the columns of each batch), \
+                              bitset (evaluate each distinct literal once per batch as a bitset of rows, \
+                              shared by the rules that use it, and each rule as the AND of its bitsets) \
+                              (default: prolog)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='set number of worker processes used to learn and validate the rules of \
+                              each category in parallel (categorical mode only) (default: 1)')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='split the dataset into the given number of shards (aligned on rows), \
+                              validated in parallel by as many worker processes, each with its own \
+                              SWI-Prolog engine; the counts of every shard are merged, so metrics are \
+                              exact over the entire dataset instead of averaged over batches, and may \
+                              differ slightly from those of a single process (--prune and the batches \
+                              saved by --checkpoint are ignored) (default: 1)')
+    parser.add_argument('--prune', action='store_true',
+                        help='drop rules from validation as soon as they can no longer reach the \
+                              coverage/recall/precision thresholds; dropped rules are left out of \
+                              the top metrics rules (default: false)')
+    parser.add_argument('--anytime', action='store_true',
+                        help='validate the rules of every new best solution in a background process \
+                              while Popper is still searching, and print those that reach the \
+                              coverage/recall/precision thresholds as soon as they are validated; \
+                              the final solution is reported as usual (default: false)')
+    parser.add_argument('--checkpoint', type=str, metavar="path", default=None,
+                        help='save the progress of the run (sample, learned rules, and metrics and \
+                              offset reached after every validation batch) to a directory (created if \
+                              it doesn\'t exist), and resume from it if the run was interrupted; the \
+                              settings must be the same as those of the interrupted run (default: none)')
+    parser.add_argument('--result-cache', type=str, metavar="path", default=None,
+                        help='set path to a cache of validation results (created if it doesn\'t exist); \
+                              rules already validated against the same dataset and settings are \
+                              looked up instead of validated again (default: none)')
+    parser.add_argument('--incremental', type=str, metavar="path", default=None,
+                        help='set path to a store of validation progress (created if it doesn\'t exist); \
+                              rules validated before against the same dataset and settings are only \
+                              validated against the rows appended to the dataset since, as long as the \
+                              rows validated before are unchanged (thresholds aren\'t used to drop \
+                              rules) (default: none)')
+    parser.add_argument('--batch-size', type=parse_batch_size, metavar="{int,auto}", default=BATCH_SIZE,
+                        help='set number of rows loaded into Prolog per validation batch, or \'auto\' to \
+                              grow or shrink batches based on the time and Prolog memory used by each \
+                              batch (default: 2000)')
+    parser.add_argument('--profile', type=str, metavar="path", default=None,
+                        help='record wall/CPU time and peak memory per stage and per batch, Janus \
+                              calls by kind, and facts asserted per predicate, and save them to a \
+                              JSON file (default: none)')
 
     return parser.parse_args()
 
 
+def parse_batch_size(value):
+    """
+    Parses the batch size set by the user.
+
+    Parameters:
+        value (str): A positive integer, or 'auto'.
+
+    Returns:
+        int or str: The batch size, or 'auto'.
+    """
+
+    if value == "auto":
+        return value
+
+    if not value.isdigit() or int(value) == 0:
+        raise argparse.ArgumentTypeError("invalid batch size: '{}' (expected a positive integer or 'auto')".format(value))
+
+    return int(value)
+
+
+def parse_bins(bins):
+    """
+    Parses the binned columns set by the user.
+
+    Parameters:
+        bins (str): A comma-separated list with entries of the form <column>:<bins>, or None
+                    (if not set).
+
+    Returns:
+        dict of int to int: The number of bins of each binned column, by index (empty if
+                            not set).
+    """
+
+    if not bins:
+        return {}
+
+    try:
+        bins = dict((int(column), int(n)) for (column, n) in (entry.split(':') for entry in bins.split(',')))
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid bins: '{}' (expected entries of the form <column>:<bins>)".format(bins))
+
+    if any(n < 2 for n in bins.values()):
+        raise argparse.ArgumentTypeError("invalid bins: each column needs at least 2 bins")
+
+    return bins
+
+
+def parse_int_cols(intcols):
+    """
+    Parses the integer columns set by the user.
+
+    Parameters:
+        intcols (str): A comma-separated list of integers, 'none', or None (if not set).
+
+    Returns:
+        list of int: The indices of the integer columns ([] if 'none'), or None if not set
+                     (all integer columns).
+    """
+
+    return list(map(int, intcols.split(','))) if intcols and \
+           intcols != "none" else [] if intcols else None
+
+
+def load_operators(grounded):
+    """
+    Loads the operators to be grounded.
+
+    Parameters:
+        grounded (str): A comma-separated list with entries of the form <file>:<class>, 
+                        'none', or None (if not set).
+
+    Returns:
+        list of object: The operators to be grounded (by default, only the less-than operator).
+    """
+
+    # By default, load only less-than operator
+    grounded_ops = []
+    if grounded == None:
+        from . operators.lt import LTOperator
+        grounded_ops += [ LTOperator() ]
+
+    # If specified, load operators to be grounded
+    elif grounded != "none":
+        for path in grounded.split(','):
+            file, op = path.split(':')
+            OpClass = getattr(importlib.import_module('.operators.' + file, 'padtai'), op)
+            grounded_ops.append(OpClass())
+
+    return grounded_ops
+
+
+def normalized_values(cache, symbols):
+    """
+    Normalizes every value in the dictionary of a cached dataset once, so that rows read 
+    from the cache don't need to be normalized cell by cell.
+
+    The result is kept in the cache for as long as the same symbol table is used.
+
+    Parameters:
+        cache (TableCache): The columnar cache of the dataset.
+        symbols (SymbolTable): The symbol table of the dataset.
+
+    Returns:
+        tuple: A tuple containing two lists, indexed by code:
+            - terms (list of str or int or float): The normalized values.
+            - atoms (list of str): The values as protected values (see SymbolTable.atom(...)).
+    """
+
+    if getattr(cache, 'normalized', (None,))[0] is not symbols:
+        terms = symbols.normalize(cache.values)
+        atoms = [symbols.atom(value) for value in cache.values]
+        cache.normalized = (symbols, terms, atoms)
+
+    return cache.normalized[1], cache.normalized[2]
+
+
+def read_batch(table_path, batch_size, offset, symbols, cache=None, end=None):
+    """
+    Reads a batch of rows from the given dataset.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        batch_size (int): The number of rows to read.
+        offset (int): The byte offset to start reading from (of the uncompressed dataset, if
+                      compressed), 0 for the first row (or, if the dataset is cached, the 
+                      index of the first row to read). Batches are read through the cursor of
+                      the dataset (see streams.TableCursor), which stays at the offset the 
+                      previous batch stopped at.
+        symbols (SymbolTable): The symbol table of the dataset.
+        cache (TableCache, optional): The columnar cache of the dataset. Defaults to None.
+        end (int, optional): The offset to stop reading at (e.g., the end of a shard, see 
+                             shard_offsets(...)), even if fewer rows have been read. Defaults 
+                             to None (the end of the dataset).
+
+    Returns:
+        cols (list of str): The names of the non-protected columns.
+        rows (list of tuple): A list of tuples containing the normalized non-protected 
+                              values (with the numbers of binned columns replaced by their
+                              bins) and the protected value of each row.
+        offset (int): The offset to continue reading from.
+    """
+
+    # Cached rows are decoded from the normalized dictionary, without tokenizing
+    if cache:
+        cols = symbols.normalize(cache.columns[:-1])
+        terms, atoms = normalized_values(cache, symbols)
+
+        stop = min(offset + batch_size, len(cache) if end == None else end)
+        codes = cache.codes[offset:stop].tolist()
+        protected = cache.protected[offset:stop].tolist()
+        rows = [([terms[code] for code in row], atoms[code]) for (row, code) in zip(codes, protected)]
+
+        if symbols.bins:
+            rows = [(symbols.discretize(row), protected) for (row, protected) in rows]
+
+        return cols, rows, stop
+
+    rows = []
+
+    # Continue reading from where the previous batch stopped (if first iteration, from the 
+    # first row, after the column names)
+    with table_cursor(table_path, offset) as cursor:
+        cols = symbols.normalize(cursor.header.split(',')[:-1])
+
+        # Stop iterating once we've read the entire batch (or reached the end of the shard)
+        while len(rows) < batch_size and (end == None or cursor.offset < end):
+            row = cursor.readline()
+            if row == '':
+                break
+
+            # Extract protected attribute
+            protected = symbols.atom(row.strip().split(',')[-1])
+
+            rows.append((symbols.normalize(row.split(',')[:-1]), protected))
+
+        offset = cursor.offset
+
+    if symbols.bins:
+        rows = [(symbols.discretize(row), protected) for (row, protected) in rows]
+
+    return cols, rows, offset
+
+
+def count_rows(table_path, cache=None):
+    """
+    Counts the rows of the given dataset (excluding the column names).
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        cache (TableCache, optional): The columnar cache of the dataset. Defaults to None.
+
+    Returns:
+        int: The number of rows.
+    """
+
+    if cache:
+        return len(cache)
+
+    with open_table(table_path) as f:
+        return sum(1 for _ in f) - 1
+
+
+def shard_offsets(table_path, shards, cache=None):
+    """
+    Splits the given dataset into shards of about the same size, aligned on row boundaries.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        shards (int): The number of shards.
+        cache (TableCache, optional): The columnar cache of the dataset. If provided, the rows
+                                      of the cache are split instead. Defaults to None.
+
+    Returns:
+        list of tuple: The start and end offset of each non-empty shard (byte offsets or, if
+                       the dataset is cached, row indices), as read by read_batch(...).
+    """
+
+    if cache:
+        bounds = [len(cache) * k // shards for k in range(shards + 1)]
+
+    # Compressed datasets can't seek, so they are split into shards of the same number of
+    # rows, whose offsets are counted while reading them
+    elif is_compressed(table_path):
+        rows = count_rows(table_path)
+
+        with open_table(table_path, 'rb') as f:
+            offset = len(f.readline())
+            bounds = [offset]
+
+            for (i, row) in enumerate(f):
+                offset += len(row)
+                while len(bounds) < shards and i + 1 >= rows * len(bounds) // shards:
+                    bounds.append(offset)
+
+        bounds.append(offset)
+
+    else:
+        size = os.path.getsize(table_path)
+
+        with open(table_path, 'rb') as f:
+            # Skip column names
+            bounds = [len(f.readline())]
+
+            # Move each boundary to the start of the next row
+            for k in range(1, shards):
+                f.seek(bounds[0] + (size - bounds[0]) * k // shards)
+                f.readline()
+                bounds.append(max(f.tell(), bounds[-1]))
+
+        bounds.append(size)
+
+    return [(start, end) for (start, end) in zip(bounds, bounds[1:]) if start < end]
+
+
 def load_table(table_path, batch_size, offset, line_offset,
-               out_path, rebinds, int_cols, grounded_ops, categories):
+               out_path, symbols, int_cols, grounded_ops, categories, aggregate=False, cache=None,
+               reload=False, end=None):
     """
     Load a batch from the given dataset into Prolog.
 
@@ -149,13 +482,24 @@ def load_table(table_path, batch_size, offset, line_offset,
         table_path (str): The path to the dataset.
         batch_size (int): The number of rows to load per batch.
         offset (int): The byte offset to start loading from.
-        line_offset (int): The line offset to start loading from.
+        line_offset (int): The line offset to start loading from. The background knowledge
+                           is (re)loaded only for the first batch (line offset 0).
         out_path (str): The path to the directory containing the Popper files.
-        rebinds (dict of str to str): The rebindings of non-integer values that have both 
-                                      alpha and numeric characters.
+        symbols (SymbolTable): The symbol table of the dataset.
         int_cols (list of int): The indices of the integer columns in the dataset.
         grounded_ops (list of object): A list of operators to be grounded.
         categories (list of str): A list of categories.
+        aggregate (bool, optional): A flag indicating whether to also load the protected value
+                                    of each row as a fact protected_of(Id, Val), needed by 
+                                    validate_rules_aggregate(...). Defaults to False.
+        cache (TableCache, optional): The columnar cache of the dataset. If provided, rows
+                                      are read from the cache and offsets are row indices.
+                                      Defaults to None.
+        reload (bool, optional): A flag indicating whether to (re)load the background knowledge
+                                 even if this isn't the first batch (e.g., when validation is
+                                 resumed from a checkpoint). Defaults to False.
+        end (int, optional): The offset to stop loading at (see read_batch(...)). Defaults to
+                             None (the end of the dataset).
 
     Returns:
         table_pairs (list of tuple): A list of table pairs containing the row id, protected 
@@ -167,97 +511,193 @@ def load_table(table_path, batch_size, offset, line_offset,
 
     # No observed impact in memory usage, even in large datasets (e.g., KDD)
     table_pairs = []
-    cols = []
 
-    with open(table_path, 'r') as f:
-        column_names = next(f)
-        cols = normalize(column_names.split(',')[:-1], rebinds)
-
-        # If first iteration, add offset of column names
-        if offset == 0:
-            offset += len(column_names) + 1
+    # Read one row more than the batch size
+    cols, rows, offset = read_batch(table_path, batch_size + 1, offset, symbols, cache, end)
 
+    # Background knowledge (decision points and, with lazy grounding, operator definitions)
+    # doesn't change between batches, so it is loaded only once, with the first batch, and
+    # stays resident; later batches only swap the column and operator facts below
+    if line_offset == 0 or reload:
         # Mark operators and columns as dynamic because definitions
         # will be updated during validation 
-        with open(out_path + "/dynamic.pl", 'w+') as fP:
+        # (written to a file of its own first, as shards may be loaded by several processes)
+        dyn_path = out_path + "/dynamic.pl"
+        with open("{}.{}".format(dyn_path, os.getpid()), 'w+') as fP:
             for op in grounded_ops:
                 fP.write(":- dynamic {}/{}.\n".format(op.operator(), op.arity()))
             for col in cols:
                 fP.write(":- dynamic {}/2.\n".format(col))
+            if aggregate:
+                fP.write(":- dynamic protected_of/2.\n")
+
+        os.replace("{}.{}".format(dyn_path, os.getpid()), dyn_path)
 
         # Load dynamic information
-        dyn_path = out_path + "/dynamic.pl"
         janus.consult(dyn_path)
 
         # Load background knowledge
         bk_path = out_path + "/bk.pl"
         janus.consult(bk_path)
 
-        # Unload dynamic procedures
-        # Need to retract because removed rows make ids inconsistent
-        facts = ["{}(_,_)".format(col) for col in cols]
+    # Unload dynamic procedures
+    # Need to retract because removed rows make ids inconsistent
+    facts = ["{}(_,_)".format(col) for col in cols]
+    for fact in facts:
+        janus.query_once("retractall({})".format(fact))
+    for op in grounded_ops:
+        janus.query_once("retractall({}({}))".format(op.operator(), ("_," * op.arity())[:-1]))
+    if aggregate:
+        janus.query_once("retractall(protected_of(_,_))")
+
+    i = line_offset
+
+    for (rowP, protected) in rows:
+        # If new value of protected attribute, add as new category
+        if protected not in categories:
+            categories.append(protected)
+
+        # Increment category count
+        # Needed to calculate recall
+        categories_count[protected] = categories_count[protected] + 1 if protected in categories_count else 1
+
+        # Prepare facts to load non-protected attributes into Prolog
+        facts = [("{}(V0,Vn)".format(cols[j]), { "V0": i, "Vn": symbols.rebind(rowP[j]) }) for j in range(len(rowP))]
+
+        # Load integer values into Prolog
+        rowPP = [rowP[j] for j in int_cols] if int_cols else rowP
+        ints_in_row = list(map(lambda n: int(n) if '.' not in n else float(n), filter(is_number, map(str, rowPP))))
+        for n in ints_in_row:
+            try:
+                janus.query_once("assert(int_{}(Vn))".format(n.replace('-', '_minus_').replace('.', '_')), { "Vn": n })
+            except:
+                continue
+
+        # Load non-protected attributes into Prolog 
+        # Need to go through all rows since some may have been deleted
         for fact in facts:
-            janus.query_once("retractall({})".format(fact))
-        for op in grounded_ops:
-            janus.query_once("retractall({}({}))".format(op.operator(), ("_," * op.arity())[:-1]))
+            janus.query_once("assert({})".format(fact[0]), fact[1])
 
-        i = line_offset
-        rows_count = 0
+        # Load protected attribute into Prolog, so that rules can be counted
+        # over the entire batch with a single query
+        if aggregate:
+            protectedP = (int(protected) if '.' not in protected else float(protected)) \
+                         if is_number(protected) else protected
+            janus.query_once("assert(protected_of(V0,Vp))", { "V0": i, "Vp": protectedP })
 
-        f.seek(offset)
-        for row in f:
-            # Stop iterating once we've read the entire batch
-            if rows_count > batch_size:
-                break
+        # Each table pair contains id, protected value, and any integers
+        # that appear in the rule
+        table_pairs.append((i, protected, ints_in_row))
 
-            # Update offset
-            offset += (len(row) + 1)
+        i += 1
 
-            # Increment number of processed rows
-            rows_count += 1
+    return cols, table_pairs, categories_count, len(rows) - 1, offset
 
-            # Extract protected attribute
-            protected = row.strip().split(',')[-1].lower()
 
-            for repl in repls:
-                protected = protected.replace(*repl) if not is_number(protected) else protected
+def load_columns(table_path, batch_size, offset, line_offset, symbols, int_cols, categories, cache=None, end=None):
+    """
+    Load a batch from the given dataset into a column table, used by the NumPy validator.
+
+    Reads the same rows as load_table(...), but stores them column by column instead of
+    asserting them into Prolog.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        batch_size (int): The number of rows to load per batch.
+        offset (int): The byte offset to start loading from.
+        line_offset (int): The line offset to start loading from.
+        symbols (SymbolTable): The symbol table of the dataset.
+        int_cols (list of int): The indices of the integer columns in the dataset.
+        categories (list of str): A list of categories.
+        cache (TableCache, optional): The columnar cache of the dataset. Defaults to None.
+        end (int, optional): The offset to stop loading at (see read_batch(...)). Defaults to
+                             None (the end of the dataset).
+
+    Returns:
+        cols (list of str): The names of the non-protected columns.
+        table (ColumnTable): The batch of the dataset.
+        categories_count (dict of str to int): A dictionary mapping categories to their counts.
+        batch_size (int): The number of rows loaded.
+        offset (int): The byte offset to continue loading from.
+    """
+
+    categories_count = {}
+
+    # Read one row more than the batch size, as load_table(...) does
+    cols, rows, offset = read_batch(table_path, batch_size + 1, offset, symbols, cache, end)
 
-            # If new value of protected attribute, add as new category
-            if protected not in categories:
-                categories.append(protected)
+    table = ColumnTable(cols, int_cols)
 
-            # Increment category count
-            # Needed to calculate recall
-            categories_count[protected] = categories_count[protected] + 1 if protected in categories_count else 1
+    for (rowP, protected) in rows:
+        # If new value of protected attribute, add as new category
+        if protected not in categories:
+            categories.append(protected)
 
-            # Prepare facts to load non-protected attributes into Prolog
-            rowP = normalize(row.split(',')[:-1], rebinds)
-            facts = [("{}(V0,Vn)".format(cols[j]), { "V0": i, "Vn": rebinds[rowP[j]] if rowP[j] in rebinds else rowP[j]}) for j in range(len(rowP))]
+        # Increment category count
+        # Needed to calculate recall
+        categories_count[protected] = categories_count[protected] + 1 if protected in categories_count else 1
 
-            # Load integer values into Prolog
-            rowPP = [rowP[j] for j in int_cols] if int_cols else rowP
-            ints_in_row = list(map(lambda n: int(n) if '.' not in n else float(n), filter(is_number, map(str, rowPP))))
-            for n in ints_in_row:
-                try:
-                    janus.query_once("assert(int_{}(Vn))".format(n.replace('-', '_minus_').replace('.', '_')), { "Vn": n })
-                except:
-                    continue
+        # Values are stored as they would be loaded into Prolog
+        table.append([symbols.rebind(el) for el in rowP], protected)
 
-            # Load non-protected attributes into Prolog 
-            # Need to go through all rows since some may have been deleted
-            for fact in facts:
-                janus.query_once("assert({})".format(fact[0]), fact[1])
+    return cols, table.finalize(), categories_count, len(rows) - 1, offset
 
-            # Each table pair contains id, protected value, and any integers
-            # that appear in the rule
-            table_pairs.append((i, protected, ints_in_row))
 
-            i += 1
+def prolog_memory():
+    """
+    Returns the memory used by the Prolog heap (where asserted facts are stored).
+
+    Returns:
+        int: The heap memory in use, in bytes.
+    """
+
+    return janus.query_once("statistics(heapused, Bytes)")["Bytes"]
+
+
+def adapt_batch_size(batch_size, elapsed, memory):
+    """
+    Adapts the batch size to the time and Prolog memory used by the last batch, so that the
+    next batch takes about BATCH_TIME seconds and uses at most BATCH_MEMORY bytes.
+
+    Both are assumed to grow linearly with the batch size. The size changes by at most a 
+    factor of two per batch, so that a single unusually fast or slow batch doesn't throw it 
+    off, and is kept between MIN_BATCH_SIZE and MAX_BATCH_SIZE.
+
+    Parameters:
+        batch_size (int): The size of the last batch.
+        elapsed (float): The time taken by the last batch, in seconds.
+        memory (int): The Prolog memory used by the last batch, in bytes (0 if unknown).
+
+    Returns:
+        int: The size of the next batch.
+    """
+
+    scale = BATCH_TIME / elapsed if elapsed > 0 else 2
+    if memory > 0:
+        scale = min(scale, BATCH_MEMORY / memory)
+
+    scale = min(max(scale, 0.5), 2)
 
-    return cols, table_pairs, categories_count, rows_count - 1, offset
+    return min(max(int(batch_size * scale), MIN_BATCH_SIZE), MAX_BATCH_SIZE)
 
 
-def validate_rules(head, rules, table_pairs, grounded_ops, categorical, categories, categories_count):
+def qualify(goal, module=None):
+    """
+    Qualifies a Prolog goal with a module, so that it runs on the predicates of that module
+    (predicates the module doesn't define are still looked up in the user module).
+
+    Parameters:
+        goal (str): The goal.
+        module (str, optional): The name of the module. Defaults to None (the user module).
+
+    Returns:
+        str: The qualified goal.
+    """
+
+    return "{}:({})".format(module, goal) if module else goal
+
+
+def validate_rules(head, rules, table_pairs, grounded_ops, categorical, categories, categories_count, module=None, totals=False):
     """
     Validates a set of rules against a dataset and calculates performance metrics.
 
@@ -275,12 +715,20 @@ def validate_rules(head, rules, table_pairs, grounded_ops, categorical, categori
         categorical (bool): A flag indicating whether categorical mode is enabled.
         categories (list of str): A list of categories.
         categories_count (dict of str to int): A dictionary mapping categories to their counts.
+        module (str, optional): The Prolog module the batch is loaded into. Defaults to None 
+                                (the user module).
+        totals (bool, optional): A flag indicating whether to also return the number of rows
+                                 matched by each rule on its non-protected attributes only, so
+                                 that the counts of several batches can be merged exactly.
+                                 Defaults to False.
 
     Returns:
         tuple: A tuple containing three lists:
             - coverages (list of float): The coverage percentage for each rule.
             - recalls (list of float): The recall percentage for each rule.
             - precisions (list of float): The precision percentage for each rule.
+            - counts_all (list of int): The number of rows matched by each rule on its
+                                        non-protected attributes only (only if totals).
     """
     
     # Metrics for output rules
@@ -288,6 +736,7 @@ def validate_rules(head, rules, table_pairs, grounded_ops, categorical, categori
     coverages = []
     recalls = []
     precisions = []
+    counts_all = []
 
     for rule in rules:
         head_formatted = re.sub("[\(].*?[\)]", "", head)
@@ -312,7 +761,7 @@ def validate_rules(head, rules, table_pairs, grounded_ops, categorical, categori
 
                         # Query only if there is something to query
                         if query[0] != "":
-                            janus.query_once(*query)
+                            janus.query_once(qualify(query[0], module), query[1])
 
             matches_head = True
 
@@ -326,10 +775,10 @@ def validate_rules(head, rules, table_pairs, grounded_ops, categorical, categori
             # Can the rule unify with the row (protected and non-protected attributes)?
             # Row was already loaded in load_table(...)
             query_dict = { "V0": i } if categorical else { "V0": i, "V1": protected }
-            res = janus.query_once(rule, query_dict)['truth'] and matches_head
+            res = janus.query_once(qualify(rule, module), query_dict)['truth'] and matches_head
 
             # Can the rule unify with the row (non-protected attributes only)?
-            res_all = janus.query_once(rule, { "V0": i })['truth']
+            res_all = janus.query_once(qualify(rule, module), { "V0": i })['truth']
 
             if res:
                 count += 1
@@ -339,69 +788,1108 @@ def validate_rules(head, rules, table_pairs, grounded_ops, categorical, categori
         # Unload grounded operators
         # Needed because they will be reloaded for next rule
         for op in grounded_ops:
-            janus.query_once("retractall({}({}))".format(op.operator(), ("_," * op.arity())[:-1])) # unload less-than
+            janus.query_once(qualify("retractall({}({}))".format(op.operator(), ("_," * op.arity())[:-1]), module)) # unload less-than
 
-        category = head_formatted if categorical else next(category for category in categories if any(attr.endswith(category) for attr in list(map(lambda el: el.split('_', 2)[-1] if el.startswith("attr") else el, rule_formatted.split(',')))))
-        category_count = categories_count[category]
+        # Batches (or shards) may have no rows of the category of the rule
+        category_count = categories_count.get(rule_category(head, rule, categorical, categories), 0)
 
         coverage = count / len(table_pairs) * 100
-        recall = count / category_count * 100
+        recall = count / category_count * 100 if category_count != 0 else 0
         precision = count / count_all * 100 if count_all != 0 else 0  # bad rule (functional test)
 
         counts.append(count)
         coverages.append(coverage)
         recalls.append(recall)
         precisions.append(precision)
+        counts_all.append(count_all)
+
+    if totals:
+        return counts, coverages, recalls, precisions, counts_all
 
     return counts, coverages, recalls, precisions
 
 
-def print_results(out_rules, metrics_out_rules, top_coverage_rules, top_recall_rules, 
-                  top_precision_rules, top_precision_recall_gt_1_rules):
+def validate_rules_aggregate(head, rules, table_pairs, grounded_ops, categorical, categories, categories_count, module=None, totals=False):
     """
-    Prints the results of rule evaluation, including top rules by coverage, recall, 
-    and precision, as well as the solution rules and their average metrics.
+    Validates a set of rules against a dataset and calculates performance metrics.
+
+    Equivalent to validate_rules(...), but counts the rows matched by each rule with a 
+    single aggregate_all/3 query over the facts protected_of(Id, Val) loaded by 
+    load_table(..., aggregate=True), instead of querying Prolog once per row.
 
     Parameters:
-        out_rules (list of str): The list of solution rules.
-        metrics_out_rules (list of list of float): The metrics (coverage, recall, precision) 
-                                                   for each solution rule.
-        top_coverage_rules (list of tuple): The top five rules sorted by coverage, each represented 
-                                            as a tuple containing the rule and its metrics.
-        top_recall_rules (list of tuple): The top five rules sorted by recall, each represented 
-                                          as a tuple containing the rule and its metrics.
-        top_precision_rules (list of tuple): The top five rules sorted by precision, each represented 
-                                             as a tuple containing the rule and its metrics.
-        top_precision_recall_gt_1_rules (list of tuple): The top rules sorted by precision 
-                                                         with recall greater than or equal to 1%, 
-                                                         each represented as a tuple containing 
-                                                         the rule and its metrics.
+        head (str): The head of the rules to be validated.
+        rules (list of str): A list of rules to be validated.
+        table_pairs (list of tuple): A list of tuples representing the dataset, where each
+                                     tuple contains a row id, a protected value, and any
+                                     integers that appear in the rule.
+        grounded_ops (list of object): A list of operators to be grounded.
+        categorical (bool): A flag indicating whether categorical mode is enabled.
+        categories (list of str): A list of categories.
+        categories_count (dict of str to int): A dictionary mapping categories to their counts.
+        module (str, optional): The Prolog module the batch is loaded into. Defaults to None 
+                                (the user module).
+        totals (bool, optional): A flag indicating whether to also return the number of rows
+                                 matched by each rule on its non-protected attributes only, so
+                                 that the counts of several batches can be merged exactly.
+                                 Defaults to False.
+
+    Returns:
+        tuple: A tuple containing four lists:
+            - counts (list of int): The number of rows matched by each rule.
+            - coverages (list of float): The coverage percentage for each rule.
+            - recalls (list of float): The recall percentage for each rule.
+            - precisions (list of float): The precision percentage for each rule.
+            - counts_all (list of int): The number of rows matched by each rule on its
+                                        non-protected attributes only (only if totals).
     """
 
-    print("\n+++++++++++++++ Max. Coverages +++++++++++++++++")
+    # Metrics for output rules
+    counts = []
+    coverages = []
+    recalls = []
+    precisions = []
+    counts_all = []
 
-    for rule in top_coverage_rules:
-        print("{}\nCoverage (%): {:.2f}, Recall (%): {:.2f}, Precision (%): {:.2f}".format(*rule))
+    for rule in rules:
+        head_formatted = re.sub("[\(].*?[\)]", "", head)
+        rule_formatted = re.sub("[\(].*?[\)]", "", rule)
 
-    print("++++++++++++++++++++++++++++++++++++++++++++++++\n")
+        # Extract integers in rule
+        int_preds = filter(lambda el: re.search(r'^int_(?:_minus_)?\d+_?\d*$', el), rule_formatted.split(','))
+        ints_formatted = map(lambda el: el[4:].replace('_minus_', '-').replace('_', '.'), int_preds)
+        ints_in_rule = list(map(lambda n: int(n) if '.' not in n else float(n), ints_formatted))
 
-    print("\n++++++++++++++++ Max. Recalls ++++++++++++++++++")
+        # Collect the operator facts needed by every row of the batch, so that each
+        # fact is asserted only once
+        queries = {}
+        for (_, _, ints_in_row) in table_pairs:
+            for op in grounded_ops:
+                for j in ints_in_row + ints_in_rule:
+                    for k in ints_in_row + ints_in_rule:
+                        key = (op.operator(), type(j), j, type(k), k)
+                        if key not in queries:
+                            queries[key] = op.query((j, k))
 
-    for rule in top_recall_rules:
-        print("{}\nCoverage (%): {:.2f}, Recall (%): {:.2f}, Precision (%): {:.2f}".format(*rule))
+        for query in queries.values():
+            # Query only if there is something to query
+            if query[0] != "":
+                janus.query_once(qualify(query[0], module), query[1])
 
-    print("++++++++++++++++++++++++++++++++++++++++++++++++\n")
+        # Counts: rule with matching protected and non-protected attributes (count),
+        # and rules with matching non-protected attributes only (count_all)
+        # In categorical mode, count only rows where head matches protected attribute
+        if categorical:
+            category = (int(head_formatted) if '.' not in head_formatted else float(head_formatted)) \
+                       if is_number(head_formatted) else head_formatted
+            count = janus.query_once(qualify("aggregate_all(count, (protected_of(V0,P), P == Cat, once(({}))), Count)".format(rule), module),
+                                     { "Cat": category })['Count']
+        else:
+            count = janus.query_once(qualify("aggregate_all(count, (protected_of(V0,V1), once(({}))), Count)".format(rule), module))['Count']
 
-    print("\n+++++++++++++++ Max. Precisions ++++++++++++++++")
+        count_all = janus.query_once(qualify("aggregate_all(count, (protected_of(V0,_), once(({}))), Count)".format(rule), module))['Count']
 
-    for rule in top_precision_rules:
-        print("{}\nCoverage (%): {:.2f}, Recall (%): {:.2f}, Precision (%): {:.2f}".format(*rule))
+        # Unload grounded operators
+        # Needed because they will be reloaded for next rule
+        for op in grounded_ops:
+            janus.query_once(qualify("retractall({}({}))".format(op.operator(), ("_," * op.arity())[:-1]), module))
 
-    print("++++++++++++++++++++++++++++++++++++++++++++++++\n")
+        # Batches (or shards) may have no rows of the category of the rule
+        category_count = categories_count.get(rule_category(head, rule, categorical, categories), 0)
 
-    print("\n++++++++ Max. Precisions (Recall >= 1%) ++++++++")
+        coverage = count / len(table_pairs) * 100
+        recall = count / category_count * 100 if category_count != 0 else 0
+        precision = count / count_all * 100 if count_all != 0 else 0  # bad rule (functional test)
 
-    for rule in top_precision_recall_gt_1_rules:
+        counts.append(count)
+        coverages.append(coverage)
+        recalls.append(recall)
+        precisions.append(precision)
+        counts_all.append(count_all)
+
+    if totals:
+        return counts, coverages, recalls, precisions, counts_all
+
+    return counts, coverages, recalls, precisions
+
+
+def update_metrics(metrics, metrics_batch, indices, line_offset, batch_size):
+    """
+    Merges the metrics of a batch into the metrics of the previous batches.
+
+    Counts are added, and percentages are averaged, weighted by the number of rows.
+
+    Parameters:
+        metrics (tuple of list): The counts, coverages, recalls and precisions of every rule
+                                 over the previous batches (empty lists before the first batch).
+        metrics_batch (tuple of list): The counts, coverages, recalls and precisions of the 
+                                       rules validated in the batch.
+        indices (list of int): The index of each rule validated in the batch.
+        line_offset (int): The number of rows in the previous batches.
+        batch_size (int): The number of rows in the batch.
+
+    Returns:
+        tuple: The updated counts, coverages, recalls and precisions.
+    """
+
+    counts, coverages, recalls, precisions = metrics
+    counts_batch, coverages_batch, recalls_batch, precisions_batch = metrics_batch
+
+    if coverages == []:
+        return counts_batch, coverages_batch, recalls_batch, precisions_batch
+
+    for (j, i) in enumerate(indices):
+        counts[i] += counts_batch[j]
+        coverages[i] = (coverages[i] * line_offset + coverages_batch[j] * batch_size) \
+                     / (line_offset + batch_size)
+        recalls[i] = (recalls[i] * line_offset + recalls_batch[j] * batch_size) \
+                   / (line_offset + batch_size)
+        precisions[i] = (precisions[i] * line_offset + precisions_batch[j] * batch_size) \
+                      / (line_offset + batch_size)
+
+    return counts, coverages, recalls, precisions
+
+
+def validate_table(table_path, out_path, head, rules, symbols, int_cols, grounded_ops,
+                   categorical, categories, validator='prolog', debug='padtai', lazy=False, cache=None,
+                   thresholds=None, results=None, batch_size=BATCH_SIZE, checkpoint=None, incremental=None,
+                   shards=None):
+    """
+    Validates a set of rules against the entire dataset, one batch at a time.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        out_path (str): The path to the directory containing the Popper files.
+        head (str): The head of the rules to be validated.
+        rules (list of str): A list of rules to be validated.
+        symbols (SymbolTable): The symbol table of the dataset.
+        int_cols (list of int): The indices of the integer columns in the dataset.
+        grounded_ops (list of object): A list of operators to be grounded.
+        categorical (bool): A flag indicating whether categorical mode is enabled.
+        categories (list of str): A list of categories.
+        validator (str, optional): The validation backend, 'prolog', 'aggregate', 'numpy' or 'bitset'. 
+                                   Defaults to 'prolog'.
+        debug (str, optional): The debug level. Defaults to 'padtai'.
+        lazy (bool, optional): A flag indicating whether operators are defined by Prolog rules
+                               instead of grounded. Defaults to False.
+        cache (TableCache, optional): The columnar cache of the dataset. If provided, batches
+                                      are read from the cache. Defaults to None.
+        thresholds (tuple of float, optional): The minimum coverage, recall and precision. If 
+                                               provided, rules that can no longer reach them are 
+                                               dropped from later batches. Defaults to None.
+        results (ResultCache, optional): The cache of validation results. If provided, only
+                                         rules that aren't cached are validated, and their 
+                                         results are added to the cache. Defaults to None.
+        batch_size (int or str, optional): The number of rows per batch, or 'auto' to adapt
+                                           it to the time and Prolog memory used by each batch.
+                                           Defaults to 2000.
+        checkpoint (Checkpoint, optional): The checkpoint of the validation. If provided, the 
+                                           metrics so far and the offset reached are saved after
+                                           every batch, and validation of the same rules resumes
+                                           from the last batch saved. Defaults to None.
+        incremental (IncrementalResults, optional): The store of validation progress. If
+                                                    provided, rules validated before against the
+                                                    dataset are only validated against the rows
+                                                    appended since (see validate_appended(...)),
+                                                    and thresholds are ignored. Defaults to None.
+        shards (int, optional): The number of shards. If provided (and greater than 1), the 
+                                dataset is split into shards validated in parallel, and the 
+                                metrics are exact rather than averaged over batches (see
+                                validate_sharded(...)). Thresholds and the checkpoint are 
+                                ignored. Defaults to None.
+
+    Returns:
+        tuple: A tuple containing four lists (None for the rules that have been dropped):
+            - counts (list of int): The number of rows matched by each rule.
+            - coverages (list of float): The coverage percentage for each rule.
+            - recalls (list of float): The recall percentage for each rule.
+            - precisions (list of float): The precision percentage for each rule.
+    """
+
+    # Validate only the rules that aren't in the result cache
+    if results:
+        # Exact metrics (of shards) don't depend on the batch size
+        exact = shards and shards > 1 and not incremental
+        keys = results.keys(table_path, head, rules, grounded_ops, int_cols, categorical,
+                            'exact' if exact else batch_size if batch_size != BATCH_SIZE else None, symbols.bins)
+        metrics = results.get(keys)
+        misses = [i for i in range(len(rules)) if metrics[i] == None]
+
+        if debug == 'padtai' or debug == 'all':
+            print("[DEBUG] Found {} of {} rule(s) in result cache".format(len(rules) - len(misses), len(rules)))
+
+        if misses != []:
+            validated = zip(*validate_table(table_path, out_path, head, [rules[i] for i in misses], symbols,
+                                            int_cols, grounded_ops, categorical, categories, validator,
+                                            debug, lazy, cache, thresholds, batch_size=batch_size,
+                                            checkpoint=checkpoint, incremental=incremental, shards=shards))
+            for (i, metric) in zip(misses, validated):
+                metrics[i] = metric
+
+            # Only exact metrics are cached (not those of rules dropped by the thresholds)
+            stored = [i for i in misses if metrics[i][0] != None]
+            results.put([keys[i] for i in stored], [metrics[i] for i in stored])
+
+        counts, coverages, recalls, precisions = map(list, zip(*metrics)) if metrics != [] else ([], [], [], [])
+        return counts, coverages, recalls, precisions
+
+    # Validate only the rows appended since the rules were last validated
+    if incremental:
+        return validate_appended(table_path, out_path, head, rules, symbols, int_cols, grounded_ops, categorical,
+                                 categories, incremental, validator, debug, lazy, cache, batch_size)
+
+    # Validate shards of the dataset in parallel
+    if shards and shards > 1:
+        return validate_sharded(table_path, out_path, head, rules, symbols, int_cols, grounded_ops, categorical,
+                                categories, shards, validator, debug, lazy, cache, batch_size)
+
+    # Initial settings
+    adaptive = batch_size == 'auto'
+    batch_size = BATCH_SIZE if adaptive else batch_size
+    batch = 0
+    offset = 0
+    line_offset = 0
+    counts, coverages, recalls, precisions = [], [], [], []
+
+    # Operators defined by Prolog rules (lazy grounding) don't need to be asserted
+    # and retracted during validation
+    asserted_ops = [op for op in grounded_ops if not (lazy and op.define())]
+
+    # Operators defined by Prolog rules only enumerate the integers in the sample, so their
+    # arguments must be bound by the row before they are called
+    if lazy:
+        rules_ordered = [order_operators_last(rule, [op.operator() for op in grounded_ops]) for rule in rules]
+    else:
+        rules_ordered = rules
+
+    # NumPy validator reads decision points directly from background knowledge
+    if validator in ['numpy', 'bitset']:
+        constants = read_constants(out_path + "/bk.pl")
+
+    # Rules still being validated
+    active = list(range(len(rules)))
+    cols = []
+
+    # Rows left to validate, needed to bound the final metrics of each rule
+    if thresholds:
+        remaining = count_rows(table_path, cache)
+
+    # Prolog memory used before validation, needed to adapt the batch size
+    if adaptive and validator not in ['numpy', 'bitset']:
+        baseline = prolog_memory()
+
+    # The last batch is the first one with fewer rows than requested
+    done = False
+
+    # Resume validation of the same rules from the last batch saved
+    state = checkpoint.get("validation") if checkpoint else None
+    resumed = state != None and state["rules"] == rules
+    if resumed:
+        batch, offset, line_offset, batch_size, done = state["batch"], state["offset"], state["line_offset"], \
+                                                       state["batch_size"], state["done"]
+        counts, coverages, recalls, precisions = state["metrics"]
+        active = state["active"]
+        categories[:] = state["categories"]
+        if thresholds:
+            remaining = state["remaining"]
+
+        if debug == 'padtai' or debug == 'all':
+            print("[DEBUG] Resuming validation from batch {} (row {})".format(batch + 1, line_offset))
+
+    # Batches are read through the same cursor, closed once the rules have been validated
+    with cursor_scope():
+        while not done and active != []:
+            batch += 1
+            start = time.perf_counter()
+            memory = 0
+
+            # Output debug information if in 'padtai' or 'all' mode
+            if debug == 'padtai' or debug == 'all':
+                print("[DEBUG] Testing batch {}...".format(batch))
+
+            if validator in ['numpy', 'bitset']:
+                # Load batch (sampled and non-sampled rows) into column table
+                with profiling.stage("load_table", head=head, batch=batch):
+                    cols, table, \
+                    categories_count, \
+                    rows, offset = load_columns(table_path, batch_size, offset, line_offset,
+                                                symbols, int_cols, categories, cache)
+
+                # The previous batch ended exactly at the end of the dataset
+                if len(table) == 0:
+                    break
+
+                # Validate rules and calculate coverage/recall/precision metrics
+                validate = validate_rules_bitset if validator == 'bitset' else validate_rules_columnar
+                with profiling.stage("validate_rules", head=head, batch=batch):
+                    counts_batch, \
+                    coverages_batch, \
+                    recalls_batch, \
+                    precisions_batch = validate(head, [rules[i] for i in active], table, constants,
+                                                grounded_ops, categorical, categories, categories_count)
+            else:
+                # Load batch (sampled and non-sampled rows) into Prolog
+                with profiling.stage("load_table", head=head, batch=batch):
+                    cols, table_pairs, \
+                    categories_count, \
+                    rows, offset = load_table(table_path, batch_size, offset, line_offset,
+                                              out_path, symbols, int_cols, asserted_ops, categories,
+                                              validator == 'aggregate', cache, resumed and cols == [])
+
+                # The previous batch ended exactly at the end of the dataset
+                if table_pairs == []:
+                    break
+
+                if adaptive:
+                    memory = prolog_memory() - baseline
+
+                # Validate rules and calculate coverage/recall/precision metrics
+                validate = validate_rules_aggregate if validator == 'aggregate' else validate_rules
+                with profiling.stage("validate_rules", head=head, batch=batch):
+                    counts_batch, \
+                    coverages_batch, \
+                    recalls_batch, \
+                    precisions_batch = validate(head, [rules_ordered[i] for i in active], table_pairs, asserted_ops,
+                                                categorical, categories, categories_count)
+
+                # Operators asserted for the rules also use memory
+                if adaptive:
+                    memory = max(memory, prolog_memory() - baseline)
+
+            done = rows < batch_size
+
+            # Update metrics
+            counts, coverages, \
+            recalls, precisions = update_metrics((counts, coverages, recalls, precisions),
+                                                 (counts_batch, coverages_batch, recalls_batch, precisions_batch),
+                                                 active, line_offset, rows)
+
+            # Update offset
+            line_offset += rows
+
+            # Adapt size of next batch to the time and memory used by this one
+            if adaptive and not done:
+                previous = batch_size
+                batch_size = adapt_batch_size(batch_size, time.perf_counter() - start, memory)
+
+                if batch_size != previous and (debug == 'padtai' or debug == 'all'):
+                    print("[DEBUG] Adjusted batch size to {} rows".format(batch_size))
+
+            # Drop rules that can no longer reach the thresholds
+            # Metrics are averages of the batch metrics weighted by batch size, so the best 
+            # achievable metric is reached if the metric is 100% for every remaining row
+            # (a small tolerance keeps rounding errors from dropping rules exactly at a threshold)
+            if thresholds:
+                remaining = max(remaining - (rows + 1), 0)
+                weight = max(line_offset + remaining, 1)
+
+                pruned = [i for i in active if any((metric[i] * line_offset + 100 * remaining) / weight < threshold - 1e-9
+                                                   for (metric, threshold) in zip((coverages, recalls, precisions), thresholds))]
+
+                if pruned != [] and (debug == 'padtai' or debug == 'all'):
+                    print("[DEBUG] Dropped {} rule(s) that can no longer reach the thresholds".format(len(pruned)))
+
+                active = [i for i in active if i not in pruned]
+
+            # Save the progress of validation, to be resumed from this batch if interrupted
+            if checkpoint:
+                checkpoint.put("validation", { "rules": rules, "batch": batch, "offset": offset, "line_offset": line_offset,
+                                               "batch_size": batch_size, "done": done, "active": active,
+                                               "metrics": (counts, coverages, recalls, precisions),
+                                               "categories": categories, "remaining": remaining if thresholds else None })
+
+    # Unload dynamic procedures
+    # Needed because they may be called multiple times (via test scripts)
+    if validator not in ['numpy', 'bitset']:
+        facts = ["{}(_,_)".format(col) for col in cols]
+        for fact in facts:
+            janus.query_once("retractall({})".format(fact))
+        for op in asserted_ops:
+            janus.query_once("retractall({}({}))".format(op.operator(), ("_," * op.arity())[:-1]))
+        if validator == 'aggregate':
+            janus.query_once("retractall(protected_of(_,_))")
+
+    # Metrics of dropped rules are only partial
+    for i in range(len(rules)):
+        if i not in active:
+            counts[i], coverages[i], recalls[i], precisions[i] = None, None, None, None
+
+    return counts, coverages, recalls, precisions
+
+
+class ValidationProgress:
+    """
+    Receives the state of a validation after every batch, in place of a checkpoint (see 
+    validate_table(..., checkpoint=...)), and keeps the state before the last batch.
+
+    Attributes:
+        state (dict): The state validation starts from (None to start from the first batch),
+                      and then the state after the last batch.
+        resume (dict): The state before the last batch (i.e., after the last full batch), or
+                       None if the dataset fit in a single batch.
+    """
+
+    def __init__(self, state=None):
+        self.state = state
+        self.resume = state
+
+    def get(self, name, default=None):
+        return self.state if self.state != None else default
+
+    def put(self, name, state):
+        # Metrics are updated in place by later batches
+        state = copy.deepcopy(state)
+        if not state["done"]:
+            self.resume = state
+
+        self.state = state
+
+
+def validate_appended(table_path, out_path, head, rules, symbols, int_cols, grounded_ops, categorical,
+                      categories, incremental, validator='prolog', debug='padtai', lazy=False, cache=None,
+                      batch_size=BATCH_SIZE):
+    """
+    Validates a set of rules against the entire dataset, resuming the validation of the rules
+    validated before against it, so that only the rows appended since are validated.
+
+    The validation of each rule resumes from its state before the last batch (stored in 
+    incremental), as only the last batch may have grown. Rules with the same state are validated
+    together, and rules validated against the dataset as it is now aren't validated again. The 
+    metrics are the same as those of validating the dataset from scratch (for a fixed batch size).
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        out_path (str): The path to the directory containing the Popper files.
+        head (str): The head of the rules to be validated.
+        rules (list of str): A list of rules to be validated.
+        symbols (SymbolTable): The symbol table of the dataset.
+        int_cols (list of int): The indices of the integer columns in the dataset.
+        grounded_ops (list of object): A list of operators to be grounded.
+        categorical (bool): A flag indicating whether categorical mode is enabled.
+        categories (list of str): A list of categories.
+        incremental (IncrementalResults): The store of validation progress.
+        validator (str, optional): The validation backend. Defaults to 'prolog'.
+        debug (str, optional): The debug level. Defaults to 'padtai'.
+        lazy (bool, optional): A flag indicating whether operators are defined by Prolog rules
+                               instead of grounded. Defaults to False.
+        cache (TableCache, optional): The columnar cache of the dataset. Defaults to None.
+        batch_size (int or str, optional): The number of rows per batch, or 'auto' (see
+                                           validate_table(...)). Defaults to 2000.
+
+    Returns:
+        tuple: The counts, coverages, recalls and precisions of the rules.
+    """
+
+    keys = incremental.keys(table_path, head, rules, grounded_ops, int_cols, categorical,
+                            batch_size if batch_size != BATCH_SIZE else None, symbols.bins)
+    saved = incremental.get(table_path, keys)
+    size = os.path.getsize(table_path)
+
+    metrics = [None] * len(rules)
+    states = [None] * len(rules)
+
+    # Group rules by the state their validation resumes from
+    groups = {}
+    for i in range(len(rules)):
+        if saved[i] != None and saved[i]["size"] == size:
+            metrics[i], states[i] = saved[i]["result"], saved[i]["state"]
+            continue
+
+        state = saved[i]["state"] if saved[i] != None else None
+        point = json.dumps({ key: value for (key, value) in state.items() if key != "metrics" }) if state else None
+        groups.setdefault(point, []).append(i)
+
+    if debug == 'padtai' or debug == 'all':
+        resumed = sum(len(group) for (point, group) in groups.items() if point != None)
+        print("[DEBUG] Validating {} rule(s) from scratch, {} against appended rows only, {} unchanged".format(
+              len(groups.get(None, [])), resumed, len(rules) - sum(map(len, groups.values()))))
+
+    for (point, group) in groups.items():
+        group_rules = [rules[i] for i in group]
+
+        # Counters of each rule when its validation stopped before the last batch
+        if point != None:
+            start = json.loads(point)
+            start.update({ "rules": group_rules, "done": False, "active": list(range(len(group))), "remaining": None,
+                           "metrics": tuple(map(list, zip(*[saved[i]["state"]["metrics"] for i in group]))) })
+        else:
+            start = None
+
+        progress = ValidationProgress(start)
+        group_categories = list(categories)
+        validated = validate_table(table_path, out_path, head, group_rules, symbols, int_cols, grounded_ops,
+                                   categorical, group_categories, validator, debug, lazy, cache,
+                                   batch_size=batch_size, checkpoint=progress)
+
+        categories += [category for category in group_categories if category not in categories]
+
+        # Validation of the next rows will resume from the last full batch
+        for (j, i) in enumerate(group):
+            metrics[i] = tuple(metric[j] for metric in validated)
+            if progress.resume != None:
+                states[i] = { key: value for (key, value) in progress.resume.items()
+                              if key in ["batch", "offset", "line_offset", "batch_size", "categories"] }
+                states[i]["metrics"] = [metric[j] for metric in progress.resume["metrics"]]
+
+    incremental.put(table_path, keys, states, metrics)
+
+    counts, coverages, recalls, precisions = map(list, zip(*metrics)) if metrics != [] else ([], [], [], [])
+    return counts, coverages, recalls, precisions
+
+
+def validate_shard(table_path, out_path, head, rules, symbols, int_cols, grounded_ops, categorical, categories,
+                   start, end, validator='prolog', lazy=False, cache=None, batch_size=BATCH_SIZE):
+    """
+    Validates a set of rules against a shard of the dataset, one batch at a time, and returns
+    the raw counts of the shard, so that the counts of every shard can be merged exactly (see
+    validate_sharded(...)).
+
+    Runs in a worker process, with its own SWI-Prolog engine, into which the background 
+    knowledge is loaded with the first batch.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        out_path (str): The path to the directory containing the Popper files.
+        head (str): The head of the rules to be validated.
+        rules (list of str): A list of rules to be validated.
+        symbols (SymbolTable): The symbol table of the dataset.
+        int_cols (list of int): The indices of the integer columns in the dataset.
+        grounded_ops (list of object): A list of operators to be grounded.
+        categorical (bool): A flag indicating whether categorical mode is enabled.
+        categories (list of str): A list of categories.
+        start (int): The offset of the first row of the shard (see shard_offsets(...)).
+        end (int): The offset the shard ends at.
+        validator (str, optional): The validation backend. Defaults to 'prolog'.
+        lazy (bool, optional): A flag indicating whether operators are defined by Prolog rules
+                               instead of grounded. Defaults to False.
+        cache (TableCache, optional): The columnar cache of the dataset. Defaults to None.
+        batch_size (int or str, optional): The number of rows per batch ('auto' uses the default
+                                           size). Defaults to 2000.
+
+    Returns:
+        tuple: A tuple containing:
+            - counts (list of int): The number of rows of the shard matched by each rule.
+            - counts_all (list of int): The number of rows of the shard matched by each rule
+                                        on its non-protected attributes only.
+            - rows (int): The number of rows of the shard.
+            - categories_count (dict of str to int): A dictionary mapping categories to their
+                                                     counts in the shard.
+            - categories (list of str): The categories, including those first seen in the shard.
+    """
+
+    batch_size = BATCH_SIZE if batch_size == 'auto' else batch_size
+    batch = 0
+    offset = start
+    rows = 0
+    cols = []
+
+    counts = [0] * len(rules)
+    counts_all = [0] * len(rules)
+    categories_count = {}
+
+    # Same operators and order of literals as validate_table(...)
+    asserted_ops = [op for op in grounded_ops if not (lazy and op.define())]
+
+    if lazy:
+        rules_ordered = [order_operators_last(rule, [op.operator() for op in grounded_ops]) for rule in rules]
+    else:
+        rules_ordered = rules
+
+    if validator in ['numpy', 'bitset']:
+        constants = read_constants(out_path + "/bk.pl")
+
+    # Batches are read through the same cursor, closed once the shard has been validated
+    with cursor_scope():
+        # Unlike validate_table(...), every row is validated exactly once (including the row
+        # read past the end of each batch), so batches are read until the end of the shard
+        while offset < end:
+            batch += 1
+
+            if validator in ['numpy', 'bitset']:
+                with profiling.stage("load_table", head=head, batch=batch):
+                    cols, table, \
+                    categories_batch, \
+                    _, offset = load_columns(table_path, batch_size, offset, rows, symbols, int_cols, categories,
+                                             cache, end)
+
+                size = len(table)
+                if size == 0:
+                    break
+
+                validate = validate_rules_bitset if validator == 'bitset' else validate_rules_columnar
+                with profiling.stage("validate_rules", head=head, batch=batch):
+                    metrics_batch = validate(head, rules, table, constants, grounded_ops, categorical,
+                                             categories, categories_batch, totals=True)
+            else:
+                # Background knowledge is loaded into the engine of the worker with its first batch
+                with profiling.stage("load_table", head=head, batch=batch):
+                    cols, table_pairs, \
+                    categories_batch, \
+                    _, offset = load_table(table_path, batch_size, offset, rows, out_path, symbols, int_cols,
+                                           asserted_ops, categories, validator == 'aggregate', cache, batch == 1, end)
+
+                size = len(table_pairs)
+                if size == 0:
+                    break
+
+                validate = validate_rules_aggregate if validator == 'aggregate' else validate_rules
+                with profiling.stage("validate_rules", head=head, batch=batch):
+                    metrics_batch = validate(head, rules_ordered, table_pairs, asserted_ops, categorical,
+                                             categories, categories_batch, totals=True)
+
+            for i in range(len(rules)):
+                counts[i] += metrics_batch[0][i]
+                counts_all[i] += metrics_batch[4][i]
+
+            for (category, count) in categories_batch.items():
+                categories_count[category] = categories_count.get(category, 0) + count
+
+            rows += size
+
+    # Unload dynamic procedures
+    if validator not in ['numpy', 'bitset']:
+        for col in cols:
+            janus.query_once("retractall({}(_,_))".format(col))
+        for op in asserted_ops:
+            janus.query_once("retractall({}({}))".format(op.operator(), ("_," * op.arity())[:-1]))
+        if validator == 'aggregate':
+            janus.query_once("retractall(protected_of(_,_))")
+
+    return counts, counts_all, rows, categories_count, categories
+
+
+def validate_sharded(table_path, out_path, head, rules, symbols, int_cols, grounded_ops, categorical,
+                     categories, shards, validator='prolog', debug='padtai', lazy=False, cache=None,
+                     batch_size=BATCH_SIZE):
+    """
+    Validates a set of rules against the entire dataset, split into shards validated in
+    parallel, each by a worker process with its own SWI-Prolog engine.
+
+    Each worker returns the raw counts of its shard (see validate_shard(...)), which are added
+    up before the metrics are calculated, so the metrics are exact: coverage, recall and 
+    precision are calculated over the entire dataset, rather than averaged over batches.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        out_path (str): The path to the directory containing the Popper files.
+        head (str): The head of the rules to be validated.
+        rules (list of str): A list of rules to be validated.
+        symbols (SymbolTable): The symbol table of the dataset.
+        int_cols (list of int): The indices of the integer columns in the dataset.
+        grounded_ops (list of object): A list of operators to be grounded.
+        categorical (bool): A flag indicating whether categorical mode is enabled.
+        categories (list of str): A list of categories.
+        shards (int): The number of shards (and worker processes).
+        validator (str, optional): The validation backend. Defaults to 'prolog'.
+        debug (str, optional): The debug level. Defaults to 'padtai'.
+        lazy (bool, optional): A flag indicating whether operators are defined by Prolog rules
+                               instead of grounded. Defaults to False.
+        cache (TableCache, optional): The columnar cache of the dataset. Defaults to None.
+        batch_size (int or str, optional): The number of rows per batch of each shard. 
+                                           Defaults to 2000.
+
+    Returns:
+        tuple: The counts, coverages, recalls and precisions of the rules.
+    """
+
+    bounds = shard_offsets(table_path, shards, cache)
+
+    if debug == 'padtai' or debug == 'all':
+        print("[DEBUG] Validating {} shard(s) in parallel".format(len(bounds)))
+
+    validate = partial(validate_shard, table_path, out_path, head, rules, symbols, int_cols, grounded_ops,
+                       categorical, categories, validator=validator, lazy=lazy, cache=cache,
+                       batch_size=batch_size)
+
+    # If profiling, each worker records its own profile, merged into that of the run
+    profiled = profiling.active != None
+
+    with ProcessPoolExecutor(max_workers=len(bounds), mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [executor.submit(run_profiled, validate, start=start, end=end) if profiled else
+                   executor.submit(validate, start=start, end=end) for (start, end) in bounds]
+        results = [future.result() for future in futures]
+
+    if profiled:
+        for (_, data) in results:
+            profiling.active.merge(data)
+        results = [result for (result, _) in results]
+
+    # Merge the counters of every shard
+    counts = [sum(result[0][i] for result in results) for i in range(len(rules))]
+    counts_all = [sum(result[1][i] for result in results) for i in range(len(rules))]
+    rows = sum(result[2] for result in results)
+
+    categories_count = {}
+    for result in results:
+        for (category, count) in result[3].items():
+            categories_count[category] = categories_count.get(category, 0) + count
+        categories += [category for category in result[4] if category not in categories]
+
+    coverages, recalls, precisions = [], [], []
+    for i in range(len(rules)):
+        category_count = categories_count.get(rule_category(head, rules[i], categorical, categories), 0)
+
+        coverages.append(counts[i] / rows * 100 if rows != 0 else 0)
+        recalls.append(counts[i] / category_count * 100 if category_count != 0 else 0)
+        precisions.append(counts[i] / counts_all[i] * 100 if counts_all[i] != 0 else 0)  # bad rule (functional test)
+
+    return counts, coverages, recalls, precisions
+
+
+class AnytimeSettings(Settings):
+    """
+    Popper settings that also report every new best solution found during the search, so 
+    that its rules can be used before the search ends (see learn_rules(..., on_solution=...)).
+
+    Popper announces each new best solution through print_incomplete_solution2(...) (or
+    print_incomplete_solution(...), in older versions), whether or not it is quiet.
+    """
+
+    def __init__(self, on_solution, **kwargs):
+        super().__init__(**kwargs)
+        self.on_solution = on_solution
+
+    def print_incomplete_solution2(self, prog, *args, **kwargs):
+        super().print_incomplete_solution2(prog, *args, **kwargs)
+        self.on_solution(prog)
+
+    def print_incomplete_solution(self, prog, *args, **kwargs):
+        super().print_incomplete_solution(prog, *args, **kwargs)
+        self.on_solution(prog)
+
+
+def learn_rules(out_path, categorical, solver='nuwls', max_timeout=1200, debug='padtai', on_solution=None):
+    """
+    Runs Popper on the files generated on out_path.
+
+    Parameters:
+        out_path (str): The path to the directory containing the Popper files.
+        categorical (bool): A flag indicating whether categorical mode is enabled.
+        solver (str, optional): The solver, 'rc2' or 'nuwls'. Defaults to 'nuwls'.
+        max_timeout (int, optional): The maximum timeout in seconds. Defaults to 1200.
+        debug (str, optional): The debug level. Defaults to 'padtai'.
+        on_solution (callable, optional): A function called with the head and the bodies of 
+                                          the rules of every new best solution Popper finds, 
+                                          while the search continues. Defaults to None.
+
+    Returns:
+        tuple or None: None if Popper couldn't find a solution, otherwise a tuple containing:
+            - head (str): The head of the rules.
+            - rules (list of str): The bodies of the rules. Typed decision points and operators
+                                   (see parsetable.main(..., typed=True)) are renamed to their
+                                   untyped names.
+    """
+
+    # Popper settings
+    # Generated files on out_path
+    # NuWLS solver offers slightly better performance than rc2
+    options = { "timeout": max_timeout,
+                "kbpath": out_path,
+                "max_vars": 5,
+                "functional_test": not categorical,
+                "quiet": debug == 'none' or debug == 'padtai' }
+    if solver != 'rc2':
+        options["anytime_solver"] = 'nuwls'
+
+    # Rules are validated over untyped decision points and operators
+    names = untyped_names(out_path + "/bias.pl")
+
+    def solution(prog):
+        rules, head = format_prog(prog, settings)
+        if names:
+            rules = [rename_predicates(rule, names) for rule in rules]
+
+        return head, rules
+
+    if on_solution:
+        settings = AnytimeSettings(lambda prog: on_solution(*solution(prog)), **options)
+    else:
+        settings = Settings(**options)
+
+    # Run Popper on generated files and obtain candidate rules
+    prog, _, _ = learn_solution(settings)
+
+    if prog == None:
+        return None
+
+    return solution(prog)
+
+
+def learn_rules_anytime(out_path, validate, categorical, solver='nuwls', max_timeout=1200, debug='padtai',
+                        thresholds=(0, 0, 0)):
+    """
+    Runs Popper on the files generated on out_path, and validates the rules of every new best
+    solution in a background process while the search continues (anytime mode).
+
+    Rules that reach the thresholds are printed once they have been validated (as Popper finds
+    the next solution, or once the search ends), so that results start arriving long before
+    the search ends, and most of the validation is done during the search. Once the search
+    ends, only the rules of the final solution that weren't in an earlier one are left to
+    validate.
+
+    Parameters:
+        out_path (str): The path to the directory containing the Popper files.
+        validate (callable): A function that validates rules against the entire dataset, given
+                             their head and bodies (e.g., validate_table(...) with its other 
+                             arguments bound). Runs in a separate process, with its own 
+                             SWI-Prolog engine, so it must be picklable.
+        categorical (bool): A flag indicating whether categorical mode is enabled.
+        solver (str, optional): The solver, 'rc2' or 'nuwls'. Defaults to 'nuwls'.
+        max_timeout (int, optional): The maximum timeout in seconds. Defaults to 1200.
+        debug (str, optional): The debug level. Defaults to 'padtai'.
+        thresholds (tuple of float, optional): The minimum coverage, recall and precision of
+                                               the rules printed as soon as they have been 
+                                               validated. Defaults to (0, 0, 0).
+
+    Returns:
+        tuple or None: None if Popper couldn't find a solution, otherwise a tuple containing
+                       the head and the bodies of the rules of the final solution, and their
+                       counts, coverages, recalls and precisions (see validate_table(...)).
+    """
+
+    # Validation of each rule, as a future and the index of the rule in its batch of rules
+    validated = {}
+    futures = []
+
+    # Validations whose rules haven't been printed yet, as their head, rules and future
+    # Printed by the main thread, in the order they were submitted (i.e., finished, as there
+    # is a single worker), so that they don't interleave with the rest of the output
+    pending = []
+
+    # If profiling, the background process records its own profile, merged into that of the run
+    profiled = profiling.active != None
+
+    def metrics(future):
+        result = future.result()
+        return result[0] if profiled else result
+
+    def emit(head, rules, future):
+        if future.cancelled() or future.exception() != None:
+            return
+
+        counts, coverages, recalls, precisions = metrics(future)
+        for i in range(len(rules)):
+            if coverages[i] != None and all(metric >= threshold for (metric, threshold) in 
+                                            zip((coverages[i], recalls[i], precisions[i]), thresholds)):
+                print("[ANYTIME] Rule: {}:- {}\n".format(head, rules[i]) + \
+                      "          Count: {}, Coverage (%): {:.2f}, ".format(counts[i], coverages[i]) + \
+                      "Recall (%): {:.2f}, Precision (%): {:.2f}".format(recalls[i], precisions[i]))
+
+    def flush(wait=False):
+        # Print the rules of the validations that have finished (or, if wait, of every one)
+        while pending != [] and (wait or pending[0][2].done()):
+            emit(*pending.pop(0))
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        # Validate the rules of a solution that weren't in an earlier one
+        def submit(head, rules):
+            # Called by Popper from the main thread, so validated rules are printed meanwhile
+            flush()
+
+            new = [rule for rule in dict.fromkeys(rules) if rule not in validated]
+            if new == []:
+                return
+
+            if debug == 'padtai' or debug == 'all':
+                print("[DEBUG] Validating {} new rule(s) in the background".format(len(new)))
+
+            future = executor.submit(run_profiled, validate, head, new) if profiled else executor.submit(validate, head, new)
+            pending.append((head, new, future))
+            futures.append(future)
+
+            for (i, rule) in enumerate(new):
+                validated[rule] = (future, i)
+
+        with profiling.stage("learn"):
+            learned = learn_rules(out_path, categorical, solver, max_timeout, debug, on_solution=submit)
+
+        if learned == None:
+            executor.shutdown(cancel_futures=True)
+            return None
+
+        head, rules = learned
+        submit(head, rules)
+
+        with profiling.stage("validate"):
+            flush(wait=True)
+            solution = [metrics(validated[rule][0]) for rule in rules]
+
+        if profiled:
+            for future in futures:
+                profiling.active.merge(future.result()[1])
+
+    counts, coverages, recalls, precisions = [[solution[i][k][validated[rule][1]] for (i, rule) in enumerate(rules)]
+                                              for k in range(4)]
+
+    return head, rules, counts, coverages, recalls, precisions
+
+
+def learn_and_validate(out_path, table_path, symbols, int_cols, grounded_ops, categorical, categories,
+                       solver='nuwls', max_timeout=1200, debug='padtai', validator='prolog', lazy=False,
+                       cache=None, thresholds=None, results=None, batch_size=BATCH_SIZE, anytime=None,
+                       checkpoint=None, incremental=None, shards=None):
+    """
+    Runs Popper on the files generated on out_path and validates the resulting rules against
+    the entire dataset.
+
+    In categorical mode, this is done once per category, possibly in a separate process (the
+    function only relies on its arguments and on the Popper files, so it can be run in a
+    process pool).
+
+    Parameters:
+        out_path (str): The path to the directory containing the Popper files.
+        table_path (str): The path to the dataset.
+        symbols (SymbolTable): The symbol table of the dataset.
+        int_cols (list of int): The indices of the integer columns in the dataset.
+        grounded_ops (list of object): A list of operators to be grounded.
+        categorical (bool): A flag indicating whether categorical mode is enabled.
+        categories (list of str): A list of categories.
+        solver (str, optional): The solver, 'rc2' or 'nuwls'. Defaults to 'nuwls'.
+        max_timeout (int, optional): The maximum timeout in seconds. Defaults to 1200.
+        debug (str, optional): The debug level. Defaults to 'padtai'.
+        validator (str, optional): The validation backend, 'prolog', 'aggregate', 'numpy' or 'bitset'. 
+                                   Defaults to 'prolog'.
+        lazy (bool, optional): A flag indicating whether operators are defined by Prolog rules
+                               instead of grounded. Defaults to False.
+        cache (TableCache, optional): The columnar cache of the dataset. Defaults to None.
+        thresholds (tuple of float, optional): The minimum coverage, recall and precision, used
+                                               to drop rules early (see validate_table(...)).
+                                               Defaults to None.
+        results (ResultCache, optional): The cache of validation results. Defaults to None.
+        batch_size (int or str, optional): The number of rows per batch, or 'auto' (see
+                                           validate_table(...)). Defaults to 2000.
+        anytime (tuple of float, optional): The minimum coverage, recall and precision of the
+                                            rules to print as soon as they have been validated.
+                                            If provided, the rules of every new best solution
+                                            are validated while Popper is still searching (see
+                                            learn_rules_anytime(...)). Defaults to None.
+        checkpoint (Checkpoint, optional): The checkpoint of the run. If provided, the learned
+                                           rules, the progress of their validation and their
+                                           metrics are saved to a child checkpoint named after
+                                           out_path, from which an interrupted run resumes 
+                                           (without learning the rules again). Defaults to None.
+        incremental (IncrementalResults, optional): The store of validation progress (see
+                                                    validate_table(...)). Defaults to None.
+        shards (int, optional): The number of shards of the dataset validated in parallel (see
+                                validate_table(...)). Defaults to None.
+
+    Returns:
+        tuple or None: None if Popper couldn't find a solution, otherwise a tuple containing:
+            - head (str): The head of the rules.
+            - rules (list of str): The bodies of the rules.
+            - counts (list of int): The number of rows matched by each rule.
+            - coverages (list of float): The coverage percentage for each rule.
+            - recalls (list of float): The recall percentage for each rule.
+            - precisions (list of float): The precision percentage for each rule.
+    """
+
+    # Validate rules over the entire dataset
+    validate = partial(validate_table, table_path, out_path, symbols=symbols, int_cols=int_cols,
+                       grounded_ops=grounded_ops, categorical=categorical, categories=categories,
+                       validator=validator, debug=debug, lazy=lazy, cache=cache, thresholds=thresholds,
+                       results=results, batch_size=batch_size, incremental=incremental, shards=shards)
+
+    # Progress of an interrupted run over the same files, if any
+    if checkpoint:
+        checkpoint = checkpoint.child(Path(out_path).name)
+
+    if checkpoint and "result" in checkpoint:
+        result = checkpoint.get("result")
+
+    # Validate the rules of every new solution while Popper is still searching
+    elif anytime and not (checkpoint and "rules" in checkpoint):
+        result = learn_rules_anytime(out_path, validate, categorical, solver, max_timeout, debug, anytime)
+
+        if checkpoint:
+            checkpoint.put("rules", result[:2] if result != None else None)
+
+    else:
+        if checkpoint and "rules" in checkpoint:
+            learned = checkpoint.get("rules")
+
+        else:
+            # Run Popper on generated files and obtain candidate rules
+            with profiling.stage("learn"):
+                learned = learn_rules(out_path, categorical, solver, max_timeout, debug)
+
+            if checkpoint:
+                checkpoint.put("rules", learned)
+
+        if learned == None:
+            result = None
+
+        else:
+            head, rules = learned
+
+            with profiling.stage("validate"):
+                result = (head, rules) + tuple(validate(head, rules, checkpoint=checkpoint))
+
+    if result == None:
+        return None
+
+    if checkpoint:
+        checkpoint.put("result", result)
+
+    # Unload static procedures
+    janus.query_once('unload_file("{}")'.format(out_path + "/bias.pl"))
+    janus.query_once('unload_file("{}")'.format(out_path + "/bk.pl"))
+    janus.query_once('unload_file("{}")'.format(out_path + "/exs.pl"))
+
+    # Remove Popper files
+    try:
+        shutil.rmtree(out_path)
+    except OSError as _:
+        sys.exit("[ERROR] Something went very wrong, couldn't delete {}".format(out_path))
+
+    return result
+
+
+def print_results(out_rules, metrics_out_rules, top_coverage_rules, top_recall_rules, 
+                  top_precision_rules, top_precision_recall_gt_1_rules):
+    """
+    Prints the results of rule evaluation, including top rules by coverage, recall, 
+    and precision, as well as the solution rules and their average metrics.
+
+    Parameters:
+        out_rules (list of str): The list of solution rules.
+        metrics_out_rules (list of list of float): The metrics (coverage, recall, precision) 
+                                                   for each solution rule.
+        top_coverage_rules (list of tuple): The top five rules sorted by coverage, each represented 
+                                            as a tuple containing the rule and its metrics.
+        top_recall_rules (list of tuple): The top five rules sorted by recall, each represented 
+                                          as a tuple containing the rule and its metrics.
+        top_precision_rules (list of tuple): The top five rules sorted by precision, each represented 
+                                             as a tuple containing the rule and its metrics.
+        top_precision_recall_gt_1_rules (list of tuple): The top rules sorted by precision 
+                                                         with recall greater than or equal to 1%, 
+                                                         each represented as a tuple containing 
+                                                         the rule and its metrics.
+    """
+
+    print("\n+++++++++++++++ Max. Coverages +++++++++++++++++")
+
+    for rule in top_coverage_rules:
+        print("{}\nCoverage (%): {:.2f}, Recall (%): {:.2f}, Precision (%): {:.2f}".format(*rule))
+
+    print("++++++++++++++++++++++++++++++++++++++++++++++++\n")
+
+    print("\n++++++++++++++++ Max. Recalls ++++++++++++++++++")
+
+    for rule in top_recall_rules:
+        print("{}\nCoverage (%): {:.2f}, Recall (%): {:.2f}, Precision (%): {:.2f}".format(*rule))
+
+    print("++++++++++++++++++++++++++++++++++++++++++++++++\n")
+
+    print("\n+++++++++++++++ Max. Precisions ++++++++++++++++")
+
+    for rule in top_precision_rules:
+        print("{}\nCoverage (%): {:.2f}, Recall (%): {:.2f}, Precision (%): {:.2f}".format(*rule))
+
+    print("++++++++++++++++++++++++++++++++++++++++++++++++\n")
+
+    print("\n++++++++ Max. Precisions (Recall >= 1%) ++++++++")
+
+    for rule in top_precision_recall_gt_1_rules:
         print("{}\nCoverage (%): {:.2f}, Recall (%): {:.2f}, Precision (%): {:.2f}".format(*rule))
 
     print("++++++++++++++++++++++++++++++++++++++++++++++++\n")
@@ -433,11 +1921,26 @@ def main(run_as_package=False,args={}):
 
     args = args if run_as_package else parse()
 
+    # Profile the run, if enabled
+    if getattr(args, 'profile', None):
+        with Profiler() as profiler:
+            run(args)
+
+        profiler.save(args.profile)
+    else:
+        run(args)
+
+
+def run(args):
+    """
+    Learns and validates rules, and outputs the solution and top metrics rules (see main(...)).
+
+    Parameters:
+        args (argparse.Namespace): An object containing the command-line arguments.
+    """
+
     table_path = args.dataset
-    int_cols = list(map(int, args.intcols.split(','))) if args.intcols and \
-               args.intcols != "none" else [] if args.intcols else None
-    grounded_paths = args.grounded.split(',') if args.grounded and \
-                     args.grounded != "none" else [] if args.grounded else None
+    int_cols = parse_int_cols(args.intcols)
     sample_size = args.sample_size
     categorical = args.categorical
     debug = args.debug
@@ -446,21 +1949,58 @@ def main(run_as_package=False,args={}):
     min_coverage = args.min_coverage
     min_recall = args.min_recall
     min_precision = args.min_precision
+    validator = getattr(args, 'validator', 'prolog')
+    lazy = getattr(args, 'grounding', 'eager') == 'lazy'
+    seed = getattr(args, 'seed', None)
+    typed = getattr(args, 'typed_ints', False)
+    bins = getattr(args, 'bins', {})
+    stratify = getattr(args, 'stratify', None)
+    # Sample selected beforehand, if any (e.g., one of several selected in a single pass)
+    sample = getattr(args, 'sample', None)
+    jobs = getattr(args, 'jobs', 1)
+    shards = getattr(args, 'shards', 1)
+    thresholds = (min_coverage, min_recall, min_precision) if getattr(args, 'prune', False) else None
+    results = ResultCache(args.result_cache) if getattr(args, 'result_cache', None) else None
+    incremental = IncrementalResults(args.incremental) if getattr(args, 'incremental', None) else None
+    batch_size = getattr(args, 'batch_size', BATCH_SIZE)
+    anytime = (min_coverage, min_recall, min_precision) if getattr(args, 'anytime', False) else None
+    checkpoint = Checkpoint(args.checkpoint) if getattr(args, 'checkpoint', None) else None
+
+    # Resume only runs with the same settings (those that don't change the results aside)
+    if checkpoint:
+        try:
+            checkpoint.check({ key: value for (key, value) in vars(args).items() 
+                               if key not in ["debug", "jobs", "profile", "checkpoint", "sample"] })
+        except ValueError as e:
+            sys.exit("[ERROR] {}".format(e))
 
-    # By default, load only less-than operator
-    grounded_ops = []
-    if '--grounded' not in sys.argv:
-        from . operators.lt import LTOperator
-        grounded_ops += [ LTOperator() ]
+    # Convert dataset into columnar cache (or reuse it, if up to date)
+    cache = load_cache(table_path) if getattr(args, 'cache', False) else None
 
-    # If specified, load operators to be grounded
-    elif sys.argv[sys.argv.index('--grounded') + 1] != "none":
-        for path in grounded_paths:
-            file, op = path.split(':')
-            OpClass = getattr(importlib.import_module('.operators.' + file, 'padtai'), op)
-            grounded_ops.append(OpClass())
+    grounded_ops = load_operators(args.grounded)
 
-    random_n, rebinds = parse_table(table_path, int_cols, grounded_ops, sample_size, categorical, Path(table_path).stem)
+    # Reuse the symbol table of previous runs over the cached dataset, if any
+    symbols = SymbolTable.load(os.path.join(cache.path, "symbols.json")) if cache else SymbolTable()
+
+    # Learn from the same sample as the interrupted run, so that saved rules match the files
+    if checkpoint:
+        if "sample" not in checkpoint:
+            if sample == None:
+                with profiling.stage("parse"):
+                    sample = draw_samples(table_path, sample_size, 1, seed, cache, stratify)[0]
+            checkpoint.put("sample", sample)
+
+        sample = checkpoint.get("sample")
+
+    with profiling.stage("parse"):
+        random_n, symbols = parse_table(table_path, int_cols, grounded_ops, sample_size, categorical, 
+                                        table_stem(table_path), lazy, seed, cache, symbols, typed, bins, stratify,
+                                        sample)
+
+    # Normalize every value of the cached dataset, and save the symbol table for later runs
+    if cache:
+        normalized_values(cache, symbols)
+        symbols.save(os.path.join(cache.path, "symbols.json"))
 
     # Categories are possible values of protected attribute
     categories = list(dict.fromkeys(map(lambda l: l[-1], random_n)))
@@ -468,9 +2008,9 @@ def main(run_as_package=False,args={}):
     out_paths = []
     if categorical:
         for category in categories:
-            out_paths.append(Path(table_path).stem + "-" + category)
+            out_paths.append(table_stem(table_path) + "-" + category)
     else:
-        out_paths = [ Path(table_path).stem ]
+        out_paths = [ table_stem(table_path) ]
 
     # Solution rules and corresponding coverage/recall/precision metrics
     out_rules = []
@@ -482,75 +2022,48 @@ def main(run_as_package=False,args={}):
     top_precision_rules = []
     top_precision_recall_gt_1_rules = []
 
-    for out_path in out_paths:
-        # Popper settings
-        # Generated files on out_path
-        # NuWLS solver offers slightly better performance than rc2
-        if solver == 'rc2':
-            settings = Settings(timeout=max_timeout, 
-                                kbpath=out_path, 
-                                max_vars=5, 
-                                functional_test=not categorical, 
-                                quiet=(debug == 'none' or debug == 'padtai'))
-        else:
-            settings = Settings(timeout=max_timeout, 
-                                kbpath=out_path, 
-                                max_vars=5, 
-                                functional_test=not categorical, 
-                                quiet=(debug == 'none' or debug == 'padtai'), 
-                                anytime_solver='nuwls')
-
-        # Run Popper on generated files and obtain candidate rules
-        prog, _, _ = learn_solution(settings)
-
-        if prog != None:
-            rules, head = format_prog(prog, settings)
-        else:
+    # Learn and validate rules for each out_path (in parallel, if enabled)
+    learn = partial(learn_and_validate, table_path=table_path, symbols=symbols, int_cols=int_cols,
+                    grounded_ops=grounded_ops, categorical=categorical, categories=categories,
+                    solver=solver, max_timeout=max_timeout, debug=debug, validator=validator,
+                    lazy=lazy, cache=cache, thresholds=thresholds, results=results,
+                    batch_size=batch_size, anytime=anytime, checkpoint=checkpoint, incremental=incremental,
+                    shards=shards)
+
+    if jobs > 1 and len(out_paths) > 1:
+        # Each worker is a fresh process, with its own SWI-Prolog engine
+        # If profiling, each worker records its own profile, merged into that of the run
+        with ProcessPoolExecutor(max_workers=min(jobs, len(out_paths)),
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            if profiling.active:
+                results = []
+                for (result, profile) in executor.map(partial(run_profiled, learn), out_paths):
+                    profiling.active.merge(profile)
+                    results.append(result)
+            else:
+                results = list(executor.map(learn, out_paths))
+    else:
+        results = map(learn, out_paths)
+
+    for result in results:
+        if result == None:
             if debug == 'padtai' or debug == 'all':
                 print("[DEBUG] Couldn't find a solution")
-            
-            return
-
-        # Initial settings
-        batch_size = 2000
-        offset = 0
-        line_offset = 0
-        coverages, recalls, precisions = [], [], []
 
-        while batch_size == 2000:
-            # Output debug information if in 'padtai' or 'all' mode
-            if debug == 'padtai' or debug == 'all':
-                print("[DEBUG] Testing batch {}...".format((line_offset // batch_size) + 1))
+            return
 
-            # Load batch (sampled and non-sampled rows) into Prolog
-            cols, table_pairs, \
-            categories_count, \
-            batch_size, offset = load_table(table_path, batch_size, offset, line_offset,
-                                            out_path, rebinds, int_cols, grounded_ops, categories)
+        head, rules, counts, coverages, recalls, precisions = result
 
-            # Validate rules and calculate coverage/recall/precision metrics
-            counts_batch, \
-            coverages_batch, \
-            recalls_batch, \
-            precisions_batch = validate_rules(head, rules, table_pairs, grounded_ops,
-                                              categorical, categories, categories_count)
+        # Rules dropped during validation can't reach the thresholds, and their metrics 
+        # are only partial, so they are left out of the solution and top metrics rules
+        if debug == 'padtai' or debug == 'all':
+            for i in range(len(rules)):
+                if coverages[i] == None:
+                    print("[DEBUG] Dropped rule: {}:- {}".format(head, rules[i]))
 
-            # Update metrics
-            if coverages == []:
-                counts, coverages, recalls, precisions = counts_batch, coverages_batch, \
-                                                         recalls_batch, precisions_batch 
-            else:
-                for i in range(len(rules)):
-                    counts[i] += counts_batch[i]
-                    coverages[i] = (coverages[i] * line_offset + coverages_batch[i] * batch_size) \
-                                 / (line_offset + batch_size)
-                    recalls[i] = (recalls[i] * line_offset + recalls_batch[i] * batch_size) \
-                               / (line_offset + batch_size)
-                    precisions[i] = (precisions[i] * line_offset + precisions_batch[i] * batch_size) \
-                                  / (line_offset + batch_size)
-
-            # Update offset
-            line_offset += batch_size
+        kept = [i for i in range(len(rules)) if coverages[i] != None]
+        rules = [rules[i] for i in kept]
+        counts, coverages, recalls, precisions = [[metric[i] for i in kept] for metric in (counts, coverages, recalls, precisions)]
 
         # Output debug information if in 'padtai' or 'all' mode
         for i in range(len(rules)):
@@ -558,19 +2071,6 @@ def main(run_as_package=False,args={}):
                 print("[DEBUG] Rule: {}:- {}".format(head, rules[i]))
                 print("        Count: {}, Coverage (%): {:.2f}, ".format(counts[i], coverages[i]) + \
                       "Recall (%): {:.2f}, Precision (%): {:.2f}".format(recalls[i], precisions[i]))
-        
-        # Unload dynamic procedures
-        # Needed because they may be called multiple times (via test scripts)
-        facts = ["{}(_,_)".format(col) for col in cols]
-        for fact in facts:
-            janus.query_once("retractall({})".format(fact))
-        for op in grounded_ops:
-            janus.query_once("retractall({}({}))".format(op.operator(), ("_," * op.arity())[:-1]))
-
-        # Unload static procedures
-        janus.query_once('unload_file("{}")'.format(out_path + "/bias.pl"))
-        janus.query_once('unload_file("{}")'.format(out_path + "/bk.pl"))
-        janus.query_once('unload_file("{}")'.format(out_path + "/exs.pl"))
 
         # Collect top coverage, recall and precision (all and with >1% recall) results
         for i in range(len(rules)):
@@ -595,12 +2095,6 @@ def main(run_as_package=False,args={}):
                 top_precision_recall_gt_1_rules.insert(idx, ("Rule: {}:- {}".format(head, rules[i]), coverages[i], recalls[i], precisions[i]))
                 top_precision_recall_gt_1_rules = top_precision_recall_gt_1_rules[:5]
 
-        # Remove Popper files
-        try:
-            shutil.rmtree(out_path)
-        except OSError as _:
-            sys.exit("[ERROR] Something went very wrong, couldn't delete {}".format(out_path))
-
     # Print solution and top metrics rules
     print_results(out_rules, metrics_out_rules, top_coverage_rules, top_recall_rules, 
                   top_precision_rules, top_precision_recall_gt_1_rules)
@@ -0,0 +1,273 @@
+import re
+import json
+import time
+import platform
+import resource
+import contextlib
+
+import janus_swi as janus
+
+
+# Profiler currently recording, if any
+active = None
+
+# Janus functions whose calls are recorded
+JANUS_FUNCTIONS = ["query_once", "query", "consult"]
+
+# Module qualification of a goal (see pipeline.qualify(...))
+QUALIFIED = re.compile(r'^\w+:\((.*)\)$', re.DOTALL)
+
+# Built-in predicates calls are classified by (other goals are classified as queries)
+BUILTIN = re.compile(r'^(assert|retractall|unload_file|aggregate_all)\(\s*(\w+)?')
+
+
+def reset_peak_rss():
+    """
+    Resets the high-water mark of the resident set size of the process, if supported (Linux).
+    """
+
+    try:
+        with open("/proc/self/clear_refs", 'w') as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss():
+    """
+    Returns the high-water mark of the resident set size of the process.
+
+    Returns:
+        float: The peak RSS in MiB.
+    """
+
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+
+    # ru_maxrss is in KiB on Linux, and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 2**20 if platform.system() == 'Darwin' else maxrss / 2**10
+
+
+def classify(goal):
+    """
+    Classifies a Janus goal by the built-in predicate it calls.
+
+    Parameters:
+        goal (str): The goal.
+
+    Returns:
+        tuple: The kind of call ('assert', 'retractall', 'unload_file', 'aggregate_all' or
+               'query'), and the predicate asserted (None for other kinds).
+    """
+
+    qualified = QUALIFIED.match(goal)
+    if qualified:
+        goal = qualified.group(1)
+
+    builtin = BUILTIN.match(goal)
+    if not builtin:
+        return "query", None
+
+    return builtin.group(1), builtin.group(2) if builtin.group(1) == "assert" else None
+
+
+class Profiler:
+    """
+    Records where the time of a run goes. Opt-in: stages are only recorded while a profiler
+    is active (e.g., within a with block, or with --profile).
+
+    For each stage (e.g., learning, or loading a batch into Prolog), the profiler records
+    the wall and CPU time, the peak RSS, the Janus calls by kind, and the facts asserted into
+    Prolog by predicate. Stages run once per batch are also recorded batch by batch. Janus
+    calls and facts are also recorded over the entire run.
+
+    Peak RSS is the high-water mark of the resident set size of the process. On Linux, the
+    mark is reset when a stage starts, so it is the peak of that stage alone (including its
+    nested stages); elsewhere, it is the peak of the process so far.
+
+    Attributes:
+        data (dict): The recorded profile, as saved by save(...).
+    """
+
+    def __init__(self):
+        self.data = { "wall": 0.0, "cpu": 0.0, "peak_rss_mib": 0.0, "stages": {}, "batches": [],
+                      "janus": {}, "facts": {} }
+
+        # Stages currently running (innermost last), each with the peak RSS of its part
+        # before the last reset (by a nested stage)
+        self.stack = []
+
+    def __enter__(self):
+        global active
+
+        if active != None:
+            raise RuntimeError("another profiler is already active")
+
+        active = self
+
+        # Record Janus calls while active
+        self.janus = { name: getattr(janus, name) for name in JANUS_FUNCTIONS }
+        for name in JANUS_FUNCTIONS:
+            setattr(janus, name, self.recorded(name, self.janus[name]))
+
+        self.start = (time.perf_counter(), time.process_time())
+        return self
+
+    def __exit__(self, *_):
+        global active
+
+        self.data["wall"] += time.perf_counter() - self.start[0]
+        self.data["cpu"] += time.process_time() - self.start[1]
+        self.data["peak_rss_mib"] = max(self.data["peak_rss_mib"], peak_rss(),
+                                        max((stage["peak_rss_mib"] for stage in self.data["stages"].values()), default=0.0))
+
+        for (name, function) in self.janus.items():
+            setattr(janus, name, function)
+
+        active = None
+
+    def recorded(self, name, function):
+        """
+        Wraps a Janus function, so that its calls are recorded.
+
+        Parameters:
+            name (str): The name of the function.
+            function (callable): The function.
+
+        Returns:
+            callable: The wrapped function.
+        """
+
+        def wrapper(goal, *args, **kwargs):
+            kind, predicate = classify(goal) if name != "consult" else ("consult", None)
+
+            # Calls are recorded for the run, and for the innermost stage running
+            stage = [self.data["stages"][self.stack[-1]["name"]]] if self.stack != [] else []
+            for counts in [self.data] + stage:
+                self.count(counts["janus"], kind)
+                if predicate:
+                    self.count(counts["facts"], predicate)
+
+            return function(goal, *args, **kwargs)
+
+        return wrapper
+
+    @staticmethod
+    def count(counts, key, n=1):
+        counts[key] = counts.get(key, 0) + n
+
+    @contextlib.contextmanager
+    def stage(self, name, **labels):
+        """
+        Records a stage.
+
+        Parameters:
+            name (str): The name of the stage.
+            **labels: Labels of the stage (e.g., batch=1). Stages with labels are also
+                      recorded individually, in the list of batches.
+        """
+
+        stats = self.data["stages"].setdefault(name, { "calls": 0, "wall": 0.0, "cpu": 0.0,
+                                                       "peak_rss_mib": 0.0, "janus": {}, "facts": {} })
+
+        if self.stack != []:
+            self.stack[-1]["peak_rss_mib"] = max(self.stack[-1]["peak_rss_mib"], peak_rss())
+        reset_peak_rss()
+
+        frame = { "name": name, "peak_rss_mib": 0.0 }
+        self.stack.append(frame)
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            peak = max(frame["peak_rss_mib"], peak_rss())
+
+            self.stack.pop()
+            if self.stack != []:
+                self.stack[-1]["peak_rss_mib"] = max(self.stack[-1]["peak_rss_mib"], peak)
+
+            stats["calls"] += 1
+            stats["wall"] += wall
+            stats["cpu"] += cpu
+            stats["peak_rss_mib"] = max(stats["peak_rss_mib"], peak)
+
+            if labels:
+                self.data["batches"].append(dict(labels, stage=name, wall=wall, cpu=cpu, peak_rss_mib=peak))
+
+    def merge(self, data):
+        """
+        Merges the profile recorded by another profiler (e.g., in a worker process).
+
+        Parameters:
+            data (dict): The profile.
+        """
+
+        for (name, stats) in data["stages"].items():
+            merged = self.data["stages"].setdefault(name, { "calls": 0, "wall": 0.0, "cpu": 0.0,
+                                                            "peak_rss_mib": 0.0, "janus": {}, "facts": {} })
+            for key in ["calls", "wall", "cpu"]:
+                merged[key] += stats[key]
+            merged["peak_rss_mib"] = max(merged["peak_rss_mib"], stats["peak_rss_mib"])
+            for key in ["janus", "facts"]:
+                for (kind, n) in stats[key].items():
+                    self.count(merged[key], kind, n)
+
+        for key in ["janus", "facts"]:
+            for (name, n) in data[key].items():
+                self.count(self.data[key], name, n)
+
+        self.data["batches"] += data["batches"]
+        self.data["peak_rss_mib"] = max(self.data["peak_rss_mib"], data["peak_rss_mib"])
+
+    def save(self, path):
+        """
+        Saves the recorded profile as a JSON file.
+
+        Parameters:
+            path (str): The path to the file.
+        """
+
+        with open(path, 'w+') as f:
+            json.dump(self.data, f, indent=2)
+
+
+def stage(name, **labels):
+    """
+    Records a stage in the active profiler, if any (see Profiler.stage(...)).
+
+    Parameters:
+        name (str): The name of the stage.
+        **labels: Labels of the stage (e.g., batch=1).
+
+    Returns:
+        context manager: A context manager that records the stage, or does nothing if no
+                         profiler is active.
+    """
+
+    return active.stage(name, **labels) if active else contextlib.nullcontext()
+
+
+def run_profiled(function, *args, **kwargs):
+    """
+    Runs a function under a new profiler. Used to profile work done in worker processes,
+    which is then merged into the profiler of the main process (see Profiler.merge(...)).
+
+    Parameters:
+        function (callable): The function.
+
+    Returns:
+        tuple: The result of the function, and the recorded profile.
+    """
+
+    with Profiler() as profiler:
+        result = function(*args, **kwargs)
+
+    return result, profiler.data
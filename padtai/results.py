@@ -0,0 +1,303 @@
+from . rules import canonical_rule
+
+import os
+import json
+import hashlib
+import sqlite3
+
+
+class ResultCache:
+    """
+    An on-disk (SQLite) cache of validation results.
+
+    Each entry maps a rule, validated against a dataset, to its exact metrics over the whole
+    dataset. Entries are keyed by the content hash of the dataset, the canonical body of the
+    rule, its head, and the settings that affect validation (operators, integer columns and
+    categorical mode), so a cached rule is valid across runs and across invocations of PADTAI.
+    The cache can be shared by concurrent processes.
+
+    Attributes:
+        path (str): The path to the cache file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = None
+
+    def __getstate__(self):
+        # Connections can't be shared across processes, so each process opens its own
+        return { "path": self.path }
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def connect(self):
+        """
+        Opens the cache file, creating it if needed.
+
+        Returns:
+            sqlite3.Connection: The connection to the cache file.
+        """
+
+        if self.connection == None:
+            self.connection = sqlite3.connect(self.path, timeout=60)
+            with self.connection:
+                self.connection.execute("CREATE TABLE IF NOT EXISTS fingerprints "
+                                        "(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT)")
+                self.connection.execute("CREATE TABLE IF NOT EXISTS results "
+                                        "(key TEXT PRIMARY KEY, count INTEGER, coverage REAL, recall REAL, precision REAL)")
+
+        return self.connection
+
+    def fingerprint(self, table_path):
+        """
+        Calculates the content hash of a dataset. The hash is itself cached, and only
+        recalculated if the size or modification time of the dataset change.
+
+        Parameters:
+            table_path (str): The path to the dataset.
+
+        Returns:
+            str: The SHA-256 hash of the dataset.
+        """
+
+        path = os.path.abspath(table_path)
+        stat = os.stat(path)
+
+        row = self.connect().execute("SELECT size, mtime_ns, sha256 FROM fingerprints WHERE path = ?", (path,)).fetchone()
+        if row != None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha256.update(chunk)
+
+        with self.connect() as connection:
+            connection.execute("INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?)",
+                               (path, stat.st_size, stat.st_mtime_ns, sha256.hexdigest()))
+
+        return sha256.hexdigest()
+
+    def keys(self, table_path, head, rules, grounded_ops, int_cols, categorical, batch_size=None, bins=None):
+        """
+        Builds the keys of a set of rules.
+
+        Parameters:
+            table_path (str): The path to the dataset.
+            head (str): The head of the rules.
+            rules (list of str): A list of rules.
+            grounded_ops (list of object): A list of grounded operators.
+            int_cols (list of int): The indices of the integer columns in the dataset.
+            categorical (bool): A flag indicating whether categorical mode is enabled.
+            batch_size (int or str, optional): The batch size, if not the default one (metrics
+                                               are weighted per batch, so they depend on it),
+                                               or 'exact' if the metrics aren't weighted per 
+                                               batch (see pipeline.validate_sharded(...)).
+                                               Defaults to None.
+            bins (dict of int to list, optional): The bin boundaries of each binned column, if
+                                                  any (rows are matched by their bins, so the
+                                                  metrics depend on them). Defaults to None.
+
+        Returns:
+            list of str: The key of each rule.
+        """
+
+        fingerprint = self.fingerprint(table_path)
+        ops = sorted("{}.{}/{}".format(type(op).__module__, type(op).__name__, op.arity()) for op in grounded_ops)
+
+        # Keys for the default batch size are kept as they were, so existing caches stay valid
+        settings = [ops, int_cols, categorical] + ([batch_size] if batch_size != None else [])
+        if bins:
+            settings += [sorted([j, bounds] for (j, bounds) in bins.items())]
+
+        return [json.dumps([fingerprint, head, canonical_rule(rule)] + settings) for rule in rules]
+
+    def get(self, keys):
+        """
+        Looks up the metrics of a set of rules.
+
+        Parameters:
+            keys (list of str): The keys of the rules (see keys(...)).
+
+        Returns:
+            list of tuple: The (count, coverage, recall, precision) of each rule, or None
+                           if the rule isn't cached.
+        """
+
+        connection = self.connect()
+        rows = [connection.execute("SELECT count, coverage, recall, precision FROM results WHERE key = ?", (key,)).fetchone()
+                for key in keys]
+
+        return [tuple(row) if row != None else None for row in rows]
+
+    def put(self, keys, metrics):
+        """
+        Stores the metrics of a set of rules.
+
+        Parameters:
+            keys (list of str): The keys of the rules (see keys(...)).
+            metrics (list of tuple): The (count, coverage, recall, precision) of each rule.
+        """
+
+        with self.connect() as connection:
+            connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                                   [(key,) + tuple(metric) for (key, metric) in zip(keys, metrics)])
+
+
+class IncrementalResults(ResultCache):
+    """
+    An on-disk (SQLite) store of validation progress, so that rules validated against a 
+    dataset that has since grown (e.g., rows appended daily) are only validated against the
+    appended rows.
+
+    Each entry maps a rule, validated against a dataset, to its metrics over the whole dataset
+    and to the state of its validation before the last batch (the offset reached and the 
+    counters of the rule). Since every other batch is full, the batches up to that offset are
+    the same however many rows are appended, so validation of the grown dataset resumes from
+    there, with the same metrics as validating it from scratch.
+
+    Unlike ResultCache, entries are keyed by the path of the dataset (and the same settings),
+    not by its contents. The size of the dataset and the hash of its contents are stored with 
+    every entry, and an entry is only used if the dataset still starts with the same contents.
+
+    Attributes:
+        path (str): The path to the store file.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+
+        # Size of each dataset when its entries were last looked up
+        self.sizes = {}
+
+    def connect(self):
+        """
+        Opens the store file, creating it if needed.
+
+        Returns:
+            sqlite3.Connection: The connection to the store file.
+        """
+
+        if self.connection == None:
+            self.connection = sqlite3.connect(self.path, timeout=60)
+            with self.connection:
+                self.connection.execute("CREATE TABLE IF NOT EXISTS prefixes "
+                                        "(path TEXT, size INTEGER, sha256 TEXT, PRIMARY KEY (path, size))")
+                self.connection.execute("CREATE TABLE IF NOT EXISTS states "
+                                        "(key TEXT PRIMARY KEY, size INTEGER, state TEXT, result TEXT)")
+
+        return self.connection
+
+    def fingerprint(self, table_path):
+        """
+        Identifies a dataset by its path (see keys(...)), as its contents may grow.
+
+        Parameters:
+            table_path (str): The path to the dataset.
+
+        Returns:
+            str: The absolute path to the dataset.
+        """
+
+        return os.path.abspath(table_path)
+
+    def prefixes(self, table_path, sizes):
+        """
+        Calculates the content hashes of prefixes of a dataset, in a single pass. Prefixes that
+        don't end a line (i.e., whose last row may have been extended) have no hash.
+
+        Parameters:
+            table_path (str): The path to the dataset.
+            sizes (list of int): The sizes of the prefixes, in bytes.
+
+        Returns:
+            dict of int to str: The SHA-256 hash of each prefix (None if it doesn't end a line,
+                                or if it is longer than the dataset).
+        """
+
+        hashes = dict.fromkeys(sizes)
+        sha256 = hashlib.sha256()
+        position = 0
+
+        with open(table_path, 'rb') as f:
+            for size in sorted(set(sizes)):
+                while position < size:
+                    chunk = f.read(min(1 << 20, size - position))
+                    if chunk == b'':
+                        return hashes
+
+                    sha256.update(chunk)
+                    position += len(chunk)
+                    last = chunk[-1:]
+
+                if size == 0 or last == b'\n':
+                    hashes[size] = sha256.hexdigest()
+
+        return hashes
+
+    def get(self, table_path, keys):
+        """
+        Looks up the validation progress of a set of rules.
+
+        Parameters:
+            table_path (str): The path to the dataset.
+            keys (list of str): The keys of the rules (see keys(...)).
+
+        Returns:
+            list of dict: For each rule, None if it wasn't validated against the dataset, or if 
+                          the dataset no longer starts with the contents it was validated against
+                          (e.g., rows were changed or removed), otherwise a dictionary with:
+                - size (int): The size of the dataset the rule was validated against.
+                - state (dict): The state of validation before the last batch (None if the
+                                dataset fit in a single batch).
+                - result (tuple): The (count, coverage, recall, precision) of the rule.
+        """
+
+        connection = self.connect()
+        path = self.fingerprint(table_path)
+        size = os.path.getsize(table_path)
+
+        rows = [connection.execute("SELECT size, state, result FROM states WHERE key = ?", (key,)).fetchone() 
+                for key in keys]
+
+        # The current hash is stored too (once compared), for the entries added after validation
+        # (see put(...))
+        sizes = set(row[0] for row in rows if row != None and row[0] <= size) | {size}
+        hashes = self.prefixes(table_path, list(sizes))
+
+        stored = dict(connection.execute("SELECT size, sha256 FROM prefixes WHERE path = ?", (path,)).fetchall())
+
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO prefixes VALUES (?, ?, ?)", (path, size, hashes[size]))
+
+        self.sizes[path] = size
+
+        saved = []
+        for row in rows:
+            if row == None or hashes.get(row[0]) == None or stored.get(row[0]) != hashes[row[0]]:
+                saved.append(None)
+            else:
+                saved.append({ "size": row[0], "state": json.loads(row[1]), "result": tuple(json.loads(row[2])) })
+
+        return saved
+
+    def put(self, table_path, keys, states, results):
+        """
+        Stores the validation progress of a set of rules, validated against the dataset as 
+        it was when get(...) was last called.
+
+        Parameters:
+            table_path (str): The path to the dataset.
+            keys (list of str): The keys of the rules (see keys(...)).
+            states (list of dict): The state of validation of each rule before the last batch
+                                   (see get(...)).
+            results (list of tuple): The (count, coverage, recall, precision) of each rule.
+        """
+
+        size = self.sizes[self.fingerprint(table_path)]
+
+        with self.connect() as connection:
+            connection.executemany("INSERT OR REPLACE INTO states VALUES (?, ?, ?, ?)",
+                                   [(key, size, json.dumps(state), json.dumps(list(result)))
+                                    for (key, state, result) in zip(keys, states, results)])
@@ -0,0 +1,113 @@
+import re
+
+
+def parse_literals(rule):
+    """
+    Splits the body of a rule output by Popper into its literals.
+
+    Parameters:
+        rule (str): The body of a rule (example: "relationship(V0,V2),attr_relationship_husband(V2)").
+
+    Returns:
+        list of tuple: A list of (name, args) pairs, where name is the name of the predicate
+                       and args is the list of its arguments (example: ("relationship", ["V0", "V2"])).
+    """
+
+    return [(match.group(1), match.group(2).split(',')) for match in re.finditer(r'(\w+)\(([^()]*)\)', rule)]
+
+
+def rename_predicates(rule, names):
+    """
+    Renames the predicates of the literals of a rule.
+
+    Parameters:
+        rule (str): The body of the rule.
+        names (dict of str to str): A dictionary mapping predicate names to their new names. 
+                                    Predicates not in the dictionary keep their names.
+
+    Returns:
+        str: The body of the rule with its predicates renamed.
+    """
+
+    return ','.join("{}({})".format(names.get(name, name), ','.join(args)) for name, args in parse_literals(rule))
+
+
+def rule_category(head, rule, categorical, categories):
+    """
+    Determines the category (i.e., the value of the protected attribute) a rule refers to.
+
+    In categorical mode, the category is the name of the head. Otherwise, it is the first
+    category that matches one of the constants in the body of the rule.
+
+    Parameters:
+        head (str): The head of the rule.
+        rule (str): The body of the rule.
+        categorical (bool): A flag indicating whether categorical mode is enabled.
+        categories (list of str): A list of categories.
+
+    Returns:
+        str: The category of the rule.
+    """
+
+    head_formatted = re.sub(r"[\(].*?[\)]", "", head)
+    rule_formatted = re.sub(r"[\(].*?[\)]", "", rule)
+
+    if categorical:
+        return head_formatted
+
+    attrs = list(map(lambda el: el.split('_', 2)[-1] if el.startswith("attr") else el, rule_formatted.split(',')))
+    return next(category for category in categories if any(attr.endswith(category) for attr in attrs))
+
+
+def order_operators_last(rule, operators):
+    """
+    Moves the operator literals of a rule to the end of its body.
+
+    Since the body is a conjunction, this doesn't change the meaning of the rule, but
+    ensures that the arguments of the operators are bound (by columns and constants)
+    before the operators are called.
+
+    Parameters:
+        rule (str): The body of the rule.
+        operators (list of str): The names of the operators.
+
+    Returns:
+        str: The reordered body of the rule.
+    """
+
+    literals = ["{}({})".format(name, ','.join(args)) for name, args in parse_literals(rule) if name not in operators]
+    literals += ["{}({})".format(name, ','.join(args)) for name, args in parse_literals(rule) if name in operators]
+
+    return ','.join(literals)
+
+
+def canonical_rule(rule):
+    """
+    Rewrites the body of a rule in a canonical form, so that rules that only differ in the 
+    order of their literals or the names of their (non-head) variables are written the same.
+
+    Literals are sorted, and variables other than V0 and V1 (bound by the head) are renamed 
+    in order of first appearance. Equal canonical forms always denote the same rule, although
+    some equivalent rules may still have different canonical forms.
+
+    Parameters:
+        rule (str): The body of the rule.
+
+    Returns:
+        str: The canonical body of the rule.
+    """
+
+    head_vars = ("V0", "V1")
+
+    # Sort literals ignoring the names of non-head variables, then rename them in order
+    literals = sorted(parse_literals(rule), key=lambda literal: (literal[0], [arg if arg in head_vars else "_" for arg in literal[1]]))
+
+    renames = {}
+    for _, args in literals:
+        for arg in args:
+            if arg not in head_vars and arg not in renames:
+                renames[arg] = "V{}".format(len(renames) + len(head_vars))
+
+    literals = sorted((name, [renames.get(arg, arg) for arg in args]) for name, args in literals)
+
+    return ','.join("{}({})".format(name, ','.join(args)) for name, args in literals)
@@ -0,0 +1,499 @@
+from . parsetable import main as parse_table, draw_samples, is_number, SymbolTable
+from . pipeline import learn_rules, load_operators, validate_rules, validate_rules_aggregate, update_metrics, qualify, \
+                       BATCH_SIZE
+from . columnar import ColumnTable, validate_rules as validate_rules_columnar
+from . bitset import LiteralCache, validate_rules as validate_rules_bitset
+from . rules import order_operators_last
+from . streams import open_table, table_stem
+from . import profiling
+
+import os
+import shutil
+import tempfile
+import itertools
+
+import janus_swi as janus
+
+from pathlib import Path
+
+
+# Each session is loaded into a Prolog module of its own
+session_ids = itertools.count()
+
+# Maximum number of rows of a dataset loaded into a session, since every batch is kept in
+# memory (larger datasets are validated by the pipeline, one batch at a time)
+MAX_ROWS = 100000
+
+
+def fits(table_path, cache=None, max_rows=MAX_ROWS):
+    """
+    Determines whether a dataset is small enough to be loaded into a session. At most
+    max_rows + 1 rows are read, so large datasets aren't read in full.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        cache (TableCache, optional): The columnar cache of the dataset. Defaults to None.
+        max_rows (int, optional): The maximum number of rows. Defaults to MAX_ROWS.
+
+    Returns:
+        bool: True if the dataset has at most max_rows rows, False otherwise.
+    """
+
+    if cache:
+        return len(cache) <= max_rows
+
+    with open_table(table_path, 'rb') as f:
+        # Skip the column names
+        next(f, None)
+        return sum(1 for _ in itertools.islice(f, max_rows + 1)) <= max_rows
+
+
+class Session:
+    """
+    A dataset loaded once, against which rules can be learned and validated many times.
+
+    The rows of the dataset (column facts) and the decision points of every value (integer
+    and attribute constants) are loaded into a Prolog module of their own, so that they don't
+    clash with the Popper files loaded into the user module while learning. With the NumPy
+    (or bitset) validator, the rows are kept as column tables instead.
+
+    Rows are split into the same batches as validate_table(...) with the same batch size, so
+    validation metrics are the same as those of the pipeline. Unlike the pipeline, which loads
+    one batch at a time, a session keeps every batch loaded, so it is meant for datasets of at
+    most MAX_ROWS rows (see fits(...)).
+
+    Attributes:
+        table_path (str): The path to the dataset.
+        batch_size (int): The number of rows per batch.
+        module (str): The name of the Prolog module the dataset is loaded into.
+        symbols (SymbolTable): The symbol table of the dataset.
+        categories (list of str): The categories (values of the protected attribute) in the dataset.
+        batches (list of tuple): The batches of the dataset, each a tuple containing the
+                                 table pairs (or column table), the category counts and the
+                                 number of rows of the batch.
+        literals (list of LiteralCache): The cache of literal bitsets of each batch (bitset
+                                         validator only), shared by every run, since the
+                                         batches stay the same.
+    """
+
+    def __init__(self, table_path, int_cols=None, grounded_ops=None, categorical=False, sample_size=-1,
+                 solver='nuwls', max_timeout=1200, debug='padtai', validator='prolog', lazy=False,
+                 cache=None, symbols=None, results=None, typed=False, stratify=None, batch_size=BATCH_SIZE):
+        """
+        Loads a dataset.
+
+        Parameters:
+            table_path (str): The path to the dataset.
+            int_cols (list of int, optional): The indices of the integer columns in the dataset.
+                                              Defaults to None (all integer columns).
+            grounded_ops (list of object, optional): A list of operators to be grounded.
+                                                     Defaults to the less-than operator.
+            categorical (bool, optional): A flag indicating whether categorical mode is enabled.
+                                          Defaults to False.
+            sample_size (int, optional): The sample size. Defaults to -1 (3400 / #columns).
+            solver (str, optional): The solver, 'rc2' or 'nuwls'. Defaults to 'nuwls'.
+            max_timeout (int, optional): The maximum timeout in seconds. Defaults to 1200.
+            debug (str, optional): The debug level. Defaults to 'padtai'.
+            validator (str, optional): The validation backend, 'prolog', 'aggregate', 'numpy' or
+                                       'bitset'.
+                                       Defaults to 'prolog'.
+            lazy (bool, optional): A flag indicating whether operators are defined by Prolog
+                                   rules instead of grounded. Defaults to False.
+            cache (TableCache, optional): The columnar cache of the dataset. Defaults to None.
+            symbols (SymbolTable, optional): The symbol table of the dataset. Defaults to the
+                                             table saved in the cache, if any, or a new table.
+            results (ResultCache, optional): The cache of validation results. If provided, only
+                                             rules that aren't cached are validated, and their
+                                             results are added to the cache. Defaults to None.
+            typed (bool, optional): A flag indicating whether each integer column has its own
+                                    type when learning (see parsetable.main(...)). Defaults to 
+                                    False.
+            stratify (float, optional): The minimum share of the sample of each protected 
+                                        value, if the sample is stratified (see 
+                                        parsetable.main(...)). Defaults to None.
+            batch_size (int or str, optional): The number of rows per batch. Since batches are
+                                               loaded once, up front, 'auto' uses the default
+                                               batch size (as in validate_shard(...)). Defaults
+                                               to BATCH_SIZE.
+        """
+
+        self.table_path = table_path
+        self.int_cols = int_cols
+        self.grounded_ops = grounded_ops if grounded_ops != None else load_operators(None)
+        self.categorical = categorical
+        self.sample_size = sample_size
+        self.solver = solver
+        self.max_timeout = max_timeout
+        self.debug = debug
+        self.validator = validator
+        self.lazy = lazy
+        self.cache = cache
+        self.results = results
+        self.typed = typed
+        self.stratify = stratify
+        self.batch_size = BATCH_SIZE if batch_size == 'auto' else batch_size
+
+        if symbols:
+            self.symbols = symbols
+        else:
+            self.symbols = SymbolTable.load(os.path.join(cache.path, "symbols.json")) if cache else SymbolTable()
+
+        self.module = "padtai_session_{}".format(next(session_ids))
+        self.path = tempfile.mkdtemp(prefix="padtai-session-")
+
+        # Operators defined by Prolog rules (lazy grounding) don't need to be asserted
+        self.asserted_ops = [op for op in self.grounded_ops if not (lazy and op.define())]
+
+        # Categories in the last sample, which come first (as in main(...))
+        self.sample_categories = []
+
+        with profiling.stage("load_table"):
+            self.load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def read_rows(self):
+        """
+        Reads the dataset, one row at a time.
+
+        Yields:
+            tuple: The column names (first), and then the non-protected values and the
+                   protected value of each row, as in the dataset.
+        """
+
+        if self.cache:
+            yield self.cache.columns
+            for i in range(len(self.cache)):
+                row = self.cache.row(i)
+                yield row[:-1], row[-1]
+
+        else:
+            with open_table(self.table_path) as f:
+                yield next(f).strip().split(',')
+                for row in f:
+                    yield row.split(',')[:-1], row.strip().split(',')[-1]
+
+    def load(self):
+        """
+        Loads the dataset into Prolog (or into column tables, with the NumPy or bitset validator), one
+        batch at a time, and generates the decision points of every value in the dataset.
+        """
+
+        rows = self.read_rows()
+        column_names = next(rows)
+
+        cols = self.symbols.normalize(column_names[:-1])
+        protected_col = self.symbols.atom(column_names[-1])
+
+        # Mark columns and operators as dynamic, and define lazily grounded operators
+        with open(os.path.join(self.path, "dynamic.pl"), 'w+') as f:
+            for col in cols:
+                f.write(":- dynamic {}/2.\n".format(col))
+            for op in self.asserted_ops:
+                f.write(":- dynamic {}/{}.\n".format(op.operator(), op.arity()))
+            f.write(":- dynamic protected_of/2.\n")
+            f.write(":- dynamic numeric/1.\n")
+
+            for op in self.grounded_ops:
+                if self.lazy and op.define():
+                    f.write('\n'.join(op.define()) + '\n')
+
+        janus.consult(os.path.join(self.path, "dynamic.pl"), module=self.module)
+
+        self.categories = []
+        self.batches = []
+        self.protected = []
+        self.literals = []
+
+        consts = {}
+        numbers = {}
+        row_id = 0
+
+        # Rows are split into batches of batch_size + 1 rows (of which batch_size count towards
+        # the average metrics), as in validate_table(...)
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size + 1))
+            if batch == []:
+                break
+
+            categories_count = {}
+            table_pairs = []
+            table = ColumnTable(cols, self.int_cols)
+            protected_batch = []
+
+            for (row, protected_raw) in batch:
+                rowP = self.symbols.normalize(row)
+                protected = self.symbols.atom(protected_raw)
+
+                # If new value of protected attribute, add as new category
+                if protected not in self.categories:
+                    self.categories.append(protected)
+
+                # Increment category count
+                # Needed to calculate recall
+                categories_count[protected] = categories_count[protected] + 1 if protected in categories_count else 1
+
+                # Decision points of the values in the row, as generated by the table parser
+                # (for both integer and non-integer columns)
+                for (col, value) in zip(cols + [protected_col], row + [protected_raw]):
+                    atom = self.symbols.atom(value)
+                    name = atom.replace('-', '_minus_').replace('.', '_')
+
+                    consts.setdefault("attr_{}_{}".format(col, name), self.symbols.rebind(atom))
+                    if is_number(atom):
+                        consts.setdefault("int_{}".format(name), atom)
+
+                protectedP = (int(protected) if '.' not in protected else float(protected)) \
+                             if is_number(protected) else protected
+
+                if self.validator in ['numpy', 'bitset']:
+                    table.append([self.symbols.rebind(el) for el in rowP], protected)
+                    continue
+
+                # Load non-protected attributes into Prolog
+                for (col, el) in zip(cols, rowP):
+                    janus.query_once(qualify("assert({}(V0,Vn))".format(col), self.module), { "V0": row_id, "Vn": self.symbols.rebind(el) })
+
+                # Integers in the row, needed to ground operators
+                rowPP = [rowP[j] for j in self.int_cols] if self.int_cols else rowP
+                ints_in_row = list(map(lambda n: int(n) if '.' not in n else float(n), filter(is_number, map(str, rowPP))))
+                numbers.update(dict.fromkeys(ints_in_row))
+
+                table_pairs.append((row_id, protected, ints_in_row))
+                protected_batch.append((row_id, protectedP))
+
+                row_id += 1
+
+            self.batches.append((table.finalize() if self.validator in ['numpy', 'bitset'] else table_pairs, categories_count, len(batch) - 1))
+            self.protected.append(protected_batch)
+            self.literals.append(LiteralCache() if self.validator == 'bitset' else None)
+
+        # Load decision points into Prolog
+        with open(os.path.join(self.path, "constants.pl"), 'w+') as f:
+            for (name, value) in consts.items():
+                f.write("{}({}).\n".format(name, value))
+
+            # With lazy grounding, unbound operator arguments are enumerated via numeric/1
+            if self.lazy and any(op.define() for op in self.grounded_ops):
+                for n in sorted(numbers):
+                    f.write("numeric({}).\n".format(n))
+
+        janus.consult(os.path.join(self.path, "constants.pl"), module=self.module)
+
+        # Decision points as read by the NumPy and bitset validators
+        self.constants = { name: ((int(value) if '.' not in value else float(value)) if is_number(str(value)) else value)
+                           for (name, value) in consts.items() }
+
+        # Save the symbol table for later runs over the cached dataset
+        if self.cache:
+            self.symbols.save(os.path.join(self.cache.path, "symbols.json"))
+
+    def draw_samples(self, k, seed=None):
+        """
+        Selects k independent samples of the dataset in a single pass, to be learned from by
+        k later runs (see run(..., sample=...)) without reading the dataset again.
+
+        Parameters:
+            k (int): The number of samples.
+            seed (int, optional): The seed used to select the first sample (sample i uses
+                                  seed + i). Defaults to None.
+
+        Returns:
+            list of list of list of str: The rows of each sample.
+        """
+
+        return draw_samples(self.table_path, self.sample_size, k, seed, self.cache, self.stratify)
+
+    def learn(self, seed=None, sample=None, checkpoint=None):
+        """
+        Samples the dataset and runs Popper on the sample (once per category, in categorical
+        mode).
+
+        Parameters:
+            seed (int, optional): The seed used to select the sample. Defaults to None.
+            sample (list of list of str, optional): The rows of a sample selected beforehand
+                                                    (see draw_samples(...)). Defaults to None
+                                                    (a new sample).
+            checkpoint (Checkpoint, optional): The checkpoint of the run. If provided, the
+                                               sample and the rules learned for each category 
+                                               are saved, and an interrupted run resumes from
+                                               them. Defaults to None.
+
+        Returns:
+            list of tuple: For each category (or a single one, if not in categorical mode),
+                           None if Popper couldn't find a solution, otherwise a tuple
+                           containing the head and the bodies of the rules.
+        """
+
+        path = os.path.join(self.path, table_stem(self.table_path))
+
+        # Learn from the same sample as the interrupted run, so that saved rules match the files
+        if checkpoint:
+            if "sample" not in checkpoint:
+                checkpoint.put("sample", sample if sample != None else self.draw_samples(1, seed)[0])
+            sample = checkpoint.get("sample")
+
+        with profiling.stage("parse"):
+            random_n, self.symbols = parse_table(self.table_path, self.int_cols, self.grounded_ops, self.sample_size,
+                                                 self.categorical, path, self.lazy, seed, self.cache, self.symbols,
+                                                 self.typed, stratify=self.stratify, sample=sample)
+
+        # Categories are possible values of protected attribute
+        self.sample_categories = list(dict.fromkeys(map(lambda l: l[-1], random_n)))
+
+        if self.categorical:
+            out_paths = [path + "-" + category for category in self.sample_categories]
+        else:
+            out_paths = [path]
+
+        learned = []
+        for out_path in out_paths:
+            saved = checkpoint.child(Path(out_path).name) if checkpoint else None
+
+            if saved and "rules" in saved:
+                learned.append(saved.get("rules"))
+            else:
+                with profiling.stage("learn"):
+                    learned.append(learn_rules(out_path, self.categorical, self.solver, self.max_timeout, self.debug))
+
+                if saved:
+                    saved.put("rules", learned[-1])
+
+            # Unload static procedures and remove Popper files
+            janus.query_once('unload_file("{}")'.format(out_path + "/bias.pl"))
+            janus.query_once('unload_file("{}")'.format(out_path + "/bk.pl"))
+            janus.query_once('unload_file("{}")'.format(out_path + "/exs.pl"))
+
+            shutil.rmtree(out_path, ignore_errors=True)
+
+        return learned
+
+    def validate(self, head, rules):
+        """
+        Validates a set of rules against the entire dataset.
+
+        Parameters:
+            head (str): The head of the rules to be validated.
+            rules (list of str): A list of rules to be validated.
+
+        Returns:
+            tuple: A tuple containing four lists:
+                - counts (list of int): The number of rows matched by each rule.
+                - coverages (list of float): The coverage percentage for each rule.
+                - recalls (list of float): The recall percentage for each rule.
+                - precisions (list of float): The precision percentage for each rule.
+        """
+
+        # Validate only the rules that aren't in the result cache
+        if self.results:
+            keys = self.results.keys(self.table_path, head, rules, self.grounded_ops, self.int_cols, self.categorical,
+                                     self.batch_size if self.batch_size != BATCH_SIZE else None, self.symbols.bins)
+            metrics = self.results.get(keys)
+            misses = [i for i in range(len(rules)) if metrics[i] == None]
+
+            if misses != []:
+                validated = zip(*self.validate_batches(head, [rules[i] for i in misses]))
+                for (i, metric) in zip(misses, validated):
+                    metrics[i] = metric
+
+                self.results.put([keys[i] for i in misses], [metrics[i] for i in misses])
+
+            counts, coverages, recalls, precisions = map(list, zip(*metrics)) if metrics != [] else ([], [], [], [])
+            return counts, coverages, recalls, precisions
+
+        return self.validate_batches(head, rules)
+
+    def validate_batches(self, head, rules):
+        """
+        Validates a set of rules against every batch of the dataset (see validate(...)),
+        bypassing the result cache.
+
+        Parameters:
+            head (str): The head of the rules to be validated.
+            rules (list of str): A list of rules to be validated.
+
+        Returns:
+            tuple: The counts, coverages, recalls and precisions of the rules.
+        """
+
+        categories = list(dict.fromkeys(self.sample_categories + self.categories))
+
+        # Operators defined by Prolog rules need their arguments to be bound first
+        if self.lazy:
+            rules_ordered = [order_operators_last(rule, [op.operator() for op in self.grounded_ops]) for rule in rules]
+        else:
+            rules_ordered = rules
+
+        metrics = ([], [], [], [])
+        line_offset = 0
+
+        for (n, ((batch, categories_count, batch_size), protected_batch)) in enumerate(zip(self.batches, self.protected)):
+            with profiling.stage("validate_rules", head=head, batch=n + 1):
+                if self.validator == 'numpy':
+                    metrics_batch = validate_rules_columnar(head, rules, batch, self.constants, self.grounded_ops,
+                                                            self.categorical, categories, categories_count)
+
+                elif self.validator == 'bitset':
+                    metrics_batch = validate_rules_bitset(head, rules, batch, self.constants, self.grounded_ops,
+                                                          self.categorical, categories, categories_count,
+                                                          literals=self.literals[n])
+
+                elif self.validator == 'aggregate':
+                    # Rules are counted over the rows of the batch only
+                    janus.query_once(qualify("retractall(protected_of(_,_))", self.module))
+                    for (i, protectedP) in protected_batch:
+                        janus.query_once(qualify("assert(protected_of(V0,Vp))", self.module), { "V0": i, "Vp": protectedP })
+
+                    metrics_batch = validate_rules_aggregate(head, rules_ordered, batch, self.asserted_ops, self.categorical,
+                                                             categories, categories_count, self.module)
+
+                else:
+                    metrics_batch = validate_rules(head, rules_ordered, batch, self.asserted_ops, self.categorical,
+                                                   categories, categories_count, self.module)
+
+            metrics = update_metrics(metrics, metrics_batch, range(len(rules)), line_offset, batch_size)
+            line_offset += batch_size
+
+        return metrics
+
+    def run(self, seed=None, sample=None, checkpoint=None):
+        """
+        Learns rules from a new sample and validates them against the entire dataset.
+
+        Parameters:
+            seed (int, optional): The seed used to select the sample. Defaults to None.
+            sample (list of list of str, optional): The rows of a sample selected beforehand
+                                                    (see draw_samples(...)). Defaults to None
+                                                    (a new sample).
+            checkpoint (Checkpoint, optional): The checkpoint of the run (see learn(...)).
+                                               Defaults to None.
+
+        Returns:
+            list of tuple: For each category, a tuple containing the head, the bodies, and
+                           the counts, coverages, recalls and precisions of the rules. As in
+                           main(...), stops at the first category without a solution.
+        """
+
+        results = []
+        for learned in self.learn(seed, sample, checkpoint):
+            if learned == None:
+                break
+
+            head, rules = learned
+            results.append((head, rules) + tuple(self.validate(head, rules)))
+
+        return results
+
+    def close(self):
+        """
+        Unloads the dataset from Prolog and removes the session files.
+        """
+
+        janus.query_once('unload_file("{}")'.format(os.path.join(self.path, "constants.pl")))
+        janus.query_once('unload_file("{}")'.format(os.path.join(self.path, "dynamic.pl")))
+
+        shutil.rmtree(self.path, ignore_errors=True)
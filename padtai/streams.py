@@ -0,0 +1,248 @@
+import contextlib
+import gzip
+import io
+import locale
+import lzma
+import os
+
+from pathlib import Path
+from zipfile import ZipFile
+
+
+# Extensions of compressed datasets, read as streams instead of being extracted
+COMPRESSED = (".zip", ".gz", ".xz")
+
+
+def is_compressed(table_path):
+    """
+    Determines whether a dataset is compressed (zipped, gzipped or xz-compressed).
+
+    Parameters:
+        table_path (str): The path to the dataset.
+
+    Returns:
+        bool: True if the dataset is compressed, False otherwise.
+    """
+
+    return str(table_path).lower().endswith(COMPRESSED)
+
+
+def table_stem(table_path):
+    """
+    Returns the name of a dataset, without its extensions.
+
+    Parameters:
+        table_path (str): The path to the dataset (example: datasets/KDD/KDD-sex.csv.gz).
+
+    Returns:
+        str: The name of the dataset (example: KDD-sex).
+    """
+
+    stem = Path(table_path).stem
+    return Path(stem).stem if is_compressed(table_path) else stem
+
+
+def open_table(table_path, mode='r'):
+    """
+    Opens a dataset for reading. Compressed datasets are decompressed on the fly, so they
+    never need their full uncompressed size on disk. A zipped dataset is read from the first
+    CSV file in the archive.
+
+    Read as bytes, a compressed dataset yields the same bytes as the dataset once extracted,
+    so that the offsets counted while reading it (see TableCursor) are the same as those of
+    the extracted dataset.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        mode (str, optional): 'r' to read text, or 'rb' to read bytes. Defaults to 'r'.
+
+    Returns:
+        file object: The open dataset.
+    """
+
+    path = str(table_path)
+
+    if not is_compressed(path):
+        return open(path, mode)
+
+    if path.lower().endswith(".zip"):
+        # The member stays readable once the archive is closed
+        with ZipFile(path) as archive:
+            names = [name for name in archive.namelist() if name.lower().endswith(".csv")] or archive.namelist()
+            f = archive.open(names[0])
+    elif path.lower().endswith(".gz"):
+        f = gzip.open(path, 'rb')
+    else:
+        f = lzma.open(path, 'rb')
+
+    return f if mode == 'rb' else io.TextIOWrapper(f)
+
+
+class TableCursor:
+    """
+    A dataset kept open between batches, positioned at the offset the last batch stopped at,
+    so that the next batch continues reading from it instead of opening the dataset again
+    and seeking.
+
+    Offsets are byte offsets (of the uncompressed dataset, if compressed), as the dataset is
+    read as bytes and each line is decoded once read, so they are the same whatever the line
+    endings of the dataset (and the same as those of shard_offsets(...)). Plain datasets seek
+    to any offset, while compressed datasets can only be read forward: an earlier offset (e.g.,
+    when validation starts over) opens the dataset again, and a later offset (e.g., the start
+    of a shard) skips the rows in between.
+
+    Attributes:
+        table_path (str): The path to the dataset.
+        encoding (str): The encoding of the dataset (that of text files read by open(...)).
+        header (str): The column names, as read from the dataset.
+        start (int): The offset of the first row.
+        offset (int): The offset of the next row to read.
+        stat (tuple): The size, modification time and inode of the dataset when opened, so
+                      that a changed dataset is opened again.
+        scoped (bool): Whether the cursor is kept open by a cursor scope (see cursor_scope()),
+                       rather than closed once read from (see table_cursor(...)).
+    """
+
+    def __init__(self, table_path):
+        self.table_path = table_path
+        self.encoding = locale.getpreferredencoding(False)
+        self.scoped = False
+        self.open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        if not self.scoped:
+            self.close()
+
+    def open(self):
+        stat = os.stat(self.table_path)
+        self.stat = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+        self.file = open_table(self.table_path, 'rb')
+        line = self.file.readline()
+        self.header = self.decode(line)
+        self.start = len(line)
+        self.offset = self.start
+
+    def close(self):
+        self.file.close()
+
+    def changed(self):
+        """
+        Determines whether the dataset has changed (e.g., rows were appended) since opened.
+
+        Returns:
+            bool: True if the dataset has changed, False otherwise.
+        """
+
+        stat = os.stat(self.table_path)
+        return self.stat != (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+    def seek(self, offset):
+        """
+        Moves the cursor to the given offset (the first row, if before it).
+
+        Parameters:
+            offset (int): The offset of a row.
+        """
+
+        offset = max(offset, self.start)
+
+        if not is_compressed(self.table_path):
+            self.file.seek(offset)
+            self.offset = offset
+            return
+
+        if offset < self.offset:
+            self.close()
+            self.open()
+
+        # Skipped rows aren't decoded
+        while self.offset < offset:
+            line = self.file.readline()
+            if line == b'':
+                break
+
+            self.offset += len(line)
+
+    def readline(self):
+        """
+        Reads the next row.
+
+        Returns:
+            str: The row (an empty string at the end of the dataset).
+        """
+
+        line = self.file.readline()
+        self.offset += len(line)
+
+        return self.decode(line)
+
+    def decode(self, line):
+        # As read from a text file (i.e., with universal newlines)
+        return line.decode(self.encoding).replace('\r\n', '\n')
+
+
+# Cursors of the datasets read within the current cursor scope (None outside of a scope)
+cursors = None
+
+
+@contextlib.contextmanager
+def cursor_scope():
+    """
+    Context manager to keep the cursors of the datasets read within it open between batches
+    (e.g., the batches of a validation), and to close them on exit, so that no file (or
+    decompressor) stays open once the dataset has been read. A scope opened within another
+    one shares the cursors of the outer scope.
+    """
+
+    global cursors
+
+    if cursors != None:
+        yield
+        return
+
+    cursors = {}
+    try:
+        yield
+    finally:
+        for cursor in cursors.values():
+            cursor.close()
+
+        cursors = None
+
+
+def table_cursor(table_path, offset):
+    """
+    Returns the cursor of a dataset, positioned at the given offset (see TableCursor). Within
+    a cursor scope (see cursor_scope()), the cursor is shared by every batch read from the
+    dataset in the scope. Otherwise, a new cursor is opened, which is closed once used as a
+    context manager.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        offset (int): The offset to read from (0 for the first row).
+
+    Returns:
+        TableCursor: The cursor of the dataset.
+    """
+
+    if cursors == None:
+        cursor = TableCursor(table_path)
+        cursor.seek(offset)
+        return cursor
+
+    cursor = cursors.get(table_path)
+
+    if cursor == None or cursor.changed():
+        if cursor != None:
+            cursor.close()
+
+        cursor = cursors[table_path] = TableCursor(table_path)
+        cursor.scoped = True
+
+    cursor.seek(offset)
+
+    return cursor
@@ -0,0 +1,97 @@
+from padtai.parsetable import sample_records
+
+import argparse
+import random
+import time
+import tracemalloc
+
+
+def sample_readlines(table_path, sample_size, seed):
+    """
+    Selects a random sample of a dataset by reading the whole file into memory
+    (the sampler used before reservoir sampling).
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        sample_size (int): The sample size to consider.
+        seed (int): The seed of the random number generator.
+
+    Returns:
+        list of str: The sampled records.
+    """
+
+    rng = random.Random(seed)
+    with open(table_path, 'r') as f:
+        next(f)
+        records = f.readlines()
+        return records if len(records) <= sample_size else rng.sample(records, sample_size)
+
+
+def sample_reservoir(table_path, sample_size, seed):
+    """
+    Selects a random sample of a dataset in a single streaming pass.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        sample_size (int): The sample size to consider.
+        seed (int): The seed of the random number generator.
+
+    Returns:
+        list of str: The sampled records.
+    """
+
+    with open(table_path, 'r') as f:
+        next(f)
+        return sample_records(f, sample_size, seed)
+
+
+def measure(sampler, table_path, sample_size, seed):
+    """
+    Measures the time and peak memory (as traced by tracemalloc) of a sampler.
+
+    Returns:
+        tuple: The elapsed time in seconds and the peak memory in MiB.
+    """
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    sampler(table_path, sample_size, seed)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak / 2**20
+
+
+def main(args):
+    """
+    Compares the readlines sampler with the reservoir sampler on each dataset.
+
+    Parameters:
+        args (argparse.Namespace): An object containing the command-line arguments.
+    """
+
+    print("{:<50} {:>13} {:>15} {:>13} {:>15}".format("Dataset", "readlines (s)", "readlines (MiB)",
+                                                       "reservoir (s)", "reservoir (MiB)"))
+
+    for table_path in args.datasets:
+        with open(table_path, 'r') as f:
+            columns = len(next(f).split(','))
+        sample_size = args.sample_size if args.sample_size != -1 else 3400 // columns
+
+        results = measure(sample_readlines, table_path, sample_size, args.seed) + \
+                  measure(sample_reservoir, table_path, sample_size, args.seed)
+        print("{:<50} {:>13.2f} {:>15.2f} {:>13.2f} {:>15.2f}".format(table_path, *results))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(formatter_class=argparse.MetavarTypeHelpFormatter)
+
+    parser.add_argument('datasets', type=str, metavar="dataset", nargs='+',
+                        help='path to the dataset(s) (example: datasets/Adult/Adult-sex.csv)')
+    parser.add_argument('--sample-size', type=int, default=-1,
+                        help='set sample size (default: 3400 / #columns)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='set seed used to select the sample (default: 0)')
+
+    main(parser.parse_args())
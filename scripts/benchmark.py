@@ -0,0 +1,398 @@
+from padtai.parsetable import sample_records, filter_duplicates, generate_bias, generate_constants, \
+                              generate_background, generate_functest, generate_exs, generate_popper_files, \
+                              is_number, sorted_numbers, typed_operator, SymbolTable
+from padtai.pipeline import learn_rules, load_operators, load_table, load_columns, read_constants, \
+                            validate_rules, validate_rules_aggregate, parse_batch_size, prolog_memory, \
+                            adapt_batch_size, BATCH_SIZE
+from padtai.columnar import validate_rules as validate_rules_columnar
+from padtai.bitset import validate_rules as validate_rules_bitset
+from padtai.rules import order_operators_last
+from padtai.profiling import Profiler
+from padtai.streams import open_table, cursor_scope, table_stem
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import time
+import tempfile
+import multiprocessing
+
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Stages, in the order they run
+STAGES = ["sample", "ground", "generate", "learn", "load_table", "validate_rules"]
+
+def run_stage(profiler, stage, function, *args, **kwargs):
+    """
+    Runs (part of) a stage under a profiler. A stage may run several times (e.g., once per
+    batch), in which case times and Janus calls are added, and the largest peak RSS is kept.
+
+    Parameters:
+        profiler (Profiler): The profiler.
+        stage (str): The name of the stage.
+        function (callable): The function to run.
+
+    Returns:
+        object: The result of the function.
+    """
+
+    with profiler.stage(stage):
+        return function(*args, **kwargs)
+
+
+def sample(table_path, sample_size, seed, symbols):
+    """
+    Reads a dataset and selects its sample, as the table parser does.
+
+    Returns:
+        tuple: The column names, the sampled rows, the integer columns, and the
+               non-protected and protected attributes of the sample (without conflicts).
+    """
+
+    with open_table(table_path) as f:
+        column_names = next(f).strip().lower().split(',')
+        if sample_size == -1:
+            sample_size = 3400 // len(column_names)
+
+        random_n = [line.strip().lower().split(',') for line in sample_records(f, sample_size, seed)]
+
+    column_names = [symbols.atom(col) for col in column_names]
+    random_n = [[symbols.atom(el) for el in row] for row in random_n]
+
+    int_cols = [is_number(attr) for attr in random_n[0]]
+
+    for row in random_n:
+        for attr in row:
+            symbols.rebind(attr)
+
+    non_protected_random_n, protected_random_n = filter_duplicates(list(map(lambda l: l[:-1], random_n)),
+                                                                   list(map(lambda l: l[-1:], random_n)))
+
+    return column_names, random_n, int_cols, non_protected_random_n, protected_random_n, sample_size
+
+
+def ground(column_names, non_protected_random_n, protected_random_n, int_cols, grounded_ops, lazy, typed):
+    """
+    Grounds the operators over the integer attributes of the sample, as
+    generate_background(...) does.
+
+    Returns:
+        list of str: The pair relations (or, with lazy grounding, operator definitions).
+    """
+
+    int_attrs = [row[i] for row in non_protected_random_n for i in range(len(row)) if int_cols[i]]
+    if int_cols[-1]:
+        int_attrs += [el for row in protected_random_n for el in row]
+
+    int_attrs = sorted_numbers(int_attrs)
+
+    # If typed, each operator is grounded over each integer column separately
+    col_int_attrs = {}
+    if typed:
+        for row in non_protected_random_n:
+            for j in range(len(row)):
+                if int_cols[j]:
+                    col_int_attrs.setdefault(column_names[j], []).append(row[j])
+        if int_cols[-1]:
+            col_int_attrs[column_names[-1]] = [el for row in protected_random_n for el in row]
+
+    facts = []
+    for op in grounded_ops:
+        if lazy and op.define():
+            facts += op.define()
+            if typed:
+                args = ','.join("I{}".format(k) for k in range(op.arity()))
+                facts += ["{}({}):- {}({}).".format(typed_operator(op, col), args, op.operator(), args) for col in col_int_attrs]
+        elif typed:
+            for (col, attrs) in col_int_attrs.items():
+                facts += [typed_operator(op, col) + fact[len(op.operator()):] for fact in op.ground(sorted_numbers(attrs))]
+        else:
+            facts += op.ground(int_attrs)
+
+    if lazy and any(op.define() for op in grounded_ops):
+        facts += ["numeric({}).".format(n) for n in int_attrs]
+
+    return facts
+
+
+def benchmark(table_path, args):
+    """
+    Runs each stage of PADTAI (non-categorical mode) on a dataset.
+
+    The stages are run in the same order as in the pipeline, on the same data, but each
+    one separately: sampling (reading the dataset and selecting the sample), grounding
+    (pair relations of the operators), generation of the Popper files, learning, loading
+    batches (into Prolog, or into column tables with the NumPy validator) and validation.
+
+    Parameters:
+        table_path (str): The path to the dataset.
+        args (argparse.Namespace): An object containing the command-line arguments.
+
+    Returns:
+        dict: The statistics of each stage, and of the files and rules they produce.
+    """
+
+    symbols = SymbolTable()
+    grounded_ops = load_operators(args.grounded)
+    lazy = args.grounding == 'lazy'
+
+    work_dir = tempfile.mkdtemp(prefix="padtai-bench-")
+    out_path = os.path.join(work_dir, table_stem(table_path))
+
+    try:
+        with Profiler() as profiler:
+            column_names, random_n, int_cols, \
+            non_protected_random_n, protected_random_n, \
+            sample_size = run_stage(profiler, "sample", sample, table_path, args.sample_size, args.seed, symbols)
+
+            pair_relations = run_stage(profiler, "ground", ground, column_names, non_protected_random_n,
+                                       protected_random_n, int_cols, grounded_ops, lazy, args.typed_ints)
+
+            def generate():
+                # Column relations only, as pair relations were generated by the previous stage
+                facts = generate_background(column_names[:-1], non_protected_random_n, protected_random_n,
+                                            symbols.rebinds, int_cols, sample_size, [], lazy)
+                bias = generate_bias(column_names, random_n, int_cols, grounded_ops, typed=args.typed_ints)
+                consts = generate_constants(column_names, random_n, symbols.rebinds, int_cols, args.typed_ints)
+                exs = generate_exs(column_names[-1], protected_random_n, symbols.rebinds, sample_size)
+
+                generate_popper_files(out_path, bias, consts, list(dict.fromkeys(facts + pair_relations)), exs,
+                                      generate_functest(column_names[-1]))
+
+            run_stage(profiler, "generate", generate)
+
+            learned = run_stage(profiler, "learn", learn_rules, out_path, False, args.solver, args.max_timeout, 'none')
+            head, rules = learned if learned else ("{}(V0,V1)".format(column_names[-1]), [])
+
+            # Load and validate every batch, as validate_table(...) does
+            categories = list(dict.fromkeys(map(lambda l: l[-1], random_n)))
+            asserted_ops = [op for op in grounded_ops if not (lazy and op.define())]
+            rules_ordered = [order_operators_last(rule, [op.operator() for op in grounded_ops]) for rule in rules] \
+                            if lazy else rules
+
+            if args.validator in ['numpy', 'bitset']:
+                constants = read_constants(out_path + "/bk.pl")
+
+            adaptive = args.batch_size == 'auto'
+            batch_size = BATCH_SIZE if adaptive else args.batch_size
+            batches = 0
+            offset = 0
+            line_offset = 0
+            done = False
+
+            if adaptive and args.validator not in ['numpy', 'bitset']:
+                baseline = prolog_memory()
+
+            # Batches are read through the same cursor, as in validate_table(...)
+            with cursor_scope():
+                while not done:
+                    start = time.perf_counter()
+                    memory = 0
+
+                    if args.validator in ['numpy', 'bitset']:
+                        _, table, categories_count, \
+                        rows, offset = run_stage(profiler, "load_table", load_columns, table_path, batch_size, offset,
+                                                 line_offset, symbols, None, categories)
+
+                        # The previous batch ended exactly at the end of the dataset
+                        if len(table) == 0:
+                            break
+
+                        validate = validate_rules_bitset if args.validator == 'bitset' else validate_rules_columnar
+                        run_stage(profiler, "validate_rules", validate, head, rules, table, constants,
+                                  grounded_ops, False, categories, categories_count)
+                    else:
+                        _, table_pairs, categories_count, \
+                        rows, offset = run_stage(profiler, "load_table", load_table, table_path, batch_size, offset,
+                                                 line_offset, out_path, symbols, None, asserted_ops, categories,
+                                                 args.validator == 'aggregate')
+
+                        # The previous batch ended exactly at the end of the dataset
+                        if table_pairs == []:
+                            break
+
+                        if adaptive:
+                            memory = prolog_memory() - baseline
+
+                        validate = validate_rules_aggregate if args.validator == 'aggregate' else validate_rules
+                        run_stage(profiler, "validate_rules", validate, head, rules_ordered, table_pairs, asserted_ops,
+                                  False, categories, categories_count)
+
+                        if adaptive:
+                            memory = max(memory, prolog_memory() - baseline)
+
+                    batches += 1
+                    line_offset += rows
+                    done = rows < batch_size
+
+                    if adaptive and not done:
+                        batch_size = adapt_batch_size(batch_size, time.perf_counter() - start, memory)
+
+        # Stages as recorded by the profiler, with the files and rules they produce
+        stages = { stage: { "time": stats["wall"], "cpu": stats["cpu"], "peak_rss_mib": stats["peak_rss_mib"],
+                            "janus_calls": stats["janus"], "facts": stats["facts"] }
+                   for (stage, stats) in profiler.data["stages"].items() }
+
+        stages["sample"]["rows"] = len(random_n)
+        stages["ground"]["pair_relations"] = len(pair_relations)
+        stages["generate"].update({ "{}_bytes".format(name.replace('.', '_')): os.path.getsize(os.path.join(out_path, name))
+                                    for name in ["bias.pl", "bk.pl", "exs.pl"] })
+        stages["learn"]["rules"] = len(rules)
+        stages["load_table"]["batches"] = batches
+
+        return { stage: stages[stage] for stage in STAGES }
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares the results of a benchmark with a baseline, and prints every significant change.
+
+    Times (wall and CPU) and peak RSS are noisy, so only relative changes above the tolerance are reported
+    (and, for times, only if above 50 ms). Every other measurement (Janus calls, file sizes,
+    and counts of rows, relations and rules) is deterministic for a fixed seed, so any
+    change is reported, and increases above the tolerance are regressions.
+
+    Parameters:
+        results (dict): The results of the benchmark.
+        baseline (dict): The results of the baseline.
+        tolerance (float): The relative change allowed before a measurement is regressed.
+
+    Returns:
+        bool: True if any measurement regressed, False otherwise.
+    """
+
+    def flatten(stats, prefix=""):
+        flat = {}
+        for (key, value) in stats.items():
+            if isinstance(value, dict):
+                flat.update(flatten(value, prefix + key + "."))
+            else:
+                flat[prefix + key] = value
+        return flat
+
+    regressed = False
+
+    print("{:<50} {:<16} {:<28} {:>12} {:>12} {:>9}".format("Dataset", "Stage", "Measurement",
+                                                             "Baseline", "Current", "Change"))
+
+    for (table_path, stages) in results["datasets"].items():
+        if table_path not in baseline["datasets"]:
+            continue
+
+        for stage in STAGES:
+            current = flatten(stages.get(stage, {}))
+            previous = flatten(baseline["datasets"][table_path].get(stage, {}))
+
+            for key in sorted(set(current) | set(previous)):
+                new, old = current.get(key, 0), previous.get(key, 0)
+                if new == old:
+                    continue
+
+                change = (new - old) / old if old else float('inf')
+                noisy = key in ["time", "cpu", "peak_rss_mib"]
+                if noisy and (abs(change) <= tolerance or (key == "time" and abs(new - old) <= 0.05)):
+                    continue
+
+                worse = change > tolerance
+                regressed = regressed or worse
+
+                print("{:<50} {:<16} {:<28} {:>12.2f} {:>12.2f} {:>+8.0%}{}".format(table_path, stage, key, old, new,
+                                                                                 change, " !" if worse else ""))
+
+    return regressed
+
+
+def main(args):
+    """
+    Benchmarks every dataset, each in a fresh process (with its own SWI-Prolog engine), and
+    saves or compares the results.
+
+    Parameters:
+        args (argparse.Namespace): An object containing the command-line arguments.
+    """
+
+    datasets = args.datasets
+    if datasets == []:
+        datasets = sorted(str(path) for path in Path("datasets").rglob("*.csv"))
+
+    results = { "settings": { key: value for (key, value) in vars(args).items()
+                              if key not in ["datasets", "out", "baseline", "tolerance"] },
+                "datasets": {} }
+
+    for table_path in datasets:
+        print("[+] Benchmarking {}".format(table_path), file=sys.stderr)
+
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            results["datasets"][table_path] = executor.submit(benchmark, table_path, args).result()
+
+    if args.out:
+        with open(args.out, 'w+') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+        if baseline["settings"] != results["settings"]:
+            print("[WARNING] Baseline was run with different settings", file=sys.stderr)
+
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(formatter_class=argparse.MetavarTypeHelpFormatter)
+
+    parser.add_argument('datasets', type=str, metavar="dataset", nargs='*',
+                        help='path to the dataset(s) (default: every dataset under datasets/)')
+    parser.add_argument('-s', '--solver', choices=['rc2', 'nuwls'],
+                        type=str, default='nuwls',
+                        help='choose solver: rc2 (default pysat solver), nuwls (recommended solver) \
+                              (default: nuwls)')
+    parser.add_argument('--sample-size', type=int, default=-1,
+                        help='set sample size (default: 3400 / #columns)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='set seed used to select the sample (default: 0)')
+    parser.add_argument('--max-timeout', type=int, default=60,
+                        help='set maximum timeout of the learning stage in seconds (default: 60 seconds)')
+    parser.add_argument('--grounded', type=str, default=None,
+                        help='set operators to be grounded (each operator should be provided \
+                              as a class under the operators directory); expects comma-separated \
+                              list with entries of the form <file>:<class> (or \'none\'), where \
+                              <file> is the path to a file under the operators directory and <class> \
+                              is the name of the class (default: lt:LTOperator)')
+    parser.add_argument('--grounding', choices=['eager', 'lazy'],
+                        type=str, default='eager',
+                        help='set grounding mode: eager (generate all pair relations), lazy (define \
+                              operators by Prolog rules over the integer attributes) (default: eager)')
+    parser.add_argument('--typed-ints', action='store_true',
+                        help='give each integer column its own type (default: false)')
+    parser.add_argument('--validator', choices=['prolog', 'aggregate', 'numpy', 'bitset'],
+                        type=str, default='prolog',
+                        help='choose validation backend: prolog (query each row), aggregate (count \
+                              each rule with a single query per batch), numpy (evaluate rules as \
+                              vectorized masks), bitset (evaluate each distinct literal once per \
+                              batch as a bitset) (default: prolog)')
+    parser.add_argument('--batch-size', type=parse_batch_size, metavar="{int,auto}", default=BATCH_SIZE,
+                        help='set number of rows per validation batch, or \'auto\' to adapt it to \
+                              the time and Prolog memory used by each batch (default: 2000)')
+    parser.add_argument('-o', '--out', type=str, metavar="path", default=None,
+                        help='set path to save the results to, as JSON (default: standard output)')
+    parser.add_argument('--baseline', type=str, metavar="path", default=None,
+                        help='set path to the results of an earlier benchmark to compare against; \
+                              exits with status 1 if any measurement regressed (default: none)')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='set relative change allowed before a measurement is regressed \
+                              (default: 0.2)')
+
+    main(parser.parse_args())
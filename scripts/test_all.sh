@@ -40,17 +40,35 @@ done
 out_dir="scripts/results"
 mkdir -p $out_dir
 
-# Loop through datasets
-find datasets -type d -links 2 -print0 | while read -d $'\0' dir
+# Validation results are cached across runs and invocations
+result_cache="$out_dir/validation.db"
+
+# Progress of each dataset is checkpointed, so an interrupted sweep resumes where it stopped
+# Checkpoints are kept until every dataset has been tested
+checkpoint_dir="$out_dir/checkpoints"
+mkdir -p "$checkpoint_dir"
+rm -f "$checkpoint_dir/failed"
+
+# Loop through dataset directories (those with datasets directly in them), skipping the
+# columnar caches stored next to the datasets (<dataset>.cache directories)
+find datasets -name '*.cache' -prune -o -type f \( -name '*.csv' -o -name '*.zip' -o -name '*.gz' -o -name '*.xz' \) \
+     -printf '%h\0' | sort -zu | while read -d $'\0' dir
 do
     echo "[+] Testing $dir..."
     out_path="$(echo "$dir" | sed 's/[[:space:]]//g; s#^datasets/##; s#/#-#g').out"
 
-    # If testing Credit Card dataset, use tuned parameters to avoid memory leak
+    # If testing Credit Card dataset, define operators lazily to keep memory bounded
     if [[ "$dir" == *"Credit Card"* ]]; then
-        python3 scripts/test_dataset.py "$dir" --max-timeout $max_timeout --grounded $grounded --intcols 0,1 | tee "$out_dir/$out_path"
+        python3 scripts/test_dataset.py "$dir" --max-timeout $max_timeout --grounded $grounded --result-cache "$result_cache" --grounding lazy --checkpoint "$checkpoint_dir/${out_path%.out}" | tee "$out_dir/$out_path"
+        status=${PIPESTATUS[0]}
     else
-        python3 scripts/test_dataset.py "$dir" --max-timeout $max_timeout --grounded $grounded | tee "$out_dir/$out_path"
+        python3 scripts/test_dataset.py "$dir" --max-timeout $max_timeout --grounded $grounded --result-cache "$result_cache" --checkpoint "$checkpoint_dir/${out_path%.out}" | tee "$out_dir/$out_path"
+        status=${PIPESTATUS[0]}
+    fi
+
+    # Keep checkpoints if the test was interrupted
+    if [[ $status -ne 0 ]]; then
+        touch "$checkpoint_dir/failed"
     fi
 
     # Remove debug information
@@ -58,5 +76,12 @@ do
     sed -i '1d' "$out_dir/$out_path"
 done
 
+# Remove checkpoints once every dataset has been tested
+if [[ -e "$checkpoint_dir/failed" ]]; then
+    echo "[!] Some datasets weren't fully tested; run the script again to resume them"
+else
+    rm -rf "$checkpoint_dir"
+fi
+
 # Restore call site
 cd $prev_dir
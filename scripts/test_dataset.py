@@ -1,13 +1,22 @@
-from padtai.pipeline import main as run
+from padtai.pipeline import main as run, parse_int_cols, load_operators
+from padtai.parsetable import draw_samples
+from padtai.cache import load_cache
+from padtai.results import ResultCache
+from padtai.checkpoint import Checkpoint
+from padtai.session import Session, fits
+from padtai.streams import table_stem
 
 import sys
 import os
 import argparse
 import contextlib
+import multiprocessing
 import re
+import shutil
+import tempfile
 
 from io import StringIO
-from zipfile import ZipFile
+from concurrent.futures import ProcessPoolExecutor
 
 @contextlib.contextmanager
 def capture_output(capturer):
@@ -187,6 +196,108 @@ def print_results(rules):
     print("++++++++++++++++++++++++++++++++++++++++++++++++\n")
 
 
+def parse_output(out):
+    """
+    Extracts the rules and their metrics from the debug output of a run.
+
+    Parameters:
+        out (str): The captured output of a run.
+
+    Returns:
+        list of dict: A list of dictionaries as returned by parse_rule(...).
+    """
+
+    out_rules = []
+    add_next_line = False
+    for line in out.splitlines():
+        if line.startswith("[DEBUG] Rule:"):
+            out_rules.append(line.strip())
+            add_next_line = True
+
+        elif add_next_line:
+            out_rules[-1] += "\n" + line.strip()
+            add_next_line = False
+
+    return list(map(parse_rule, out_rules))
+
+
+def run_dataset(args, dataset, isolated=False, sample=None, checkpoint=None):
+    """
+    Performs a single run on a dataset and captures its output.
+
+    Parameters:
+        args (argparse.Namespace): An object containing the command-line arguments.
+        dataset (str): The path to the dataset.
+        sample (list of list of str, optional): The rows of a sample selected beforehand, so
+                                                that the run doesn't read the dataset to 
+                                                select its own. Defaults to None.
+        checkpoint (str, optional): The path to the checkpoint directory of the run, from which
+                                    it resumes if it was interrupted. Defaults to None.
+        isolated (bool, optional): A flag indicating whether to run in a fresh temporary working
+                                   directory, so that the Popper files of concurrent runs (named
+                                   after the dataset) don't collide. Defaults to False.
+
+    Returns:
+        str: The captured output of the run.
+    """
+
+    args = argparse.Namespace(**vars(args))
+    args.dataset = dataset
+    args.jobs = 1
+    args.sample = sample
+    args.checkpoint = checkpoint
+
+    if isolated:
+        prev_dir = os.getcwd()
+        work_dir = tempfile.mkdtemp(prefix="padtai-")
+        os.chdir(work_dir)
+
+    # Capture sys.stdout
+    capturer = StringIO()
+    try:
+        with capture_output(capturer):
+            run(run_as_package=True,args=args)
+    finally:
+        if isolated:
+            os.chdir(prev_dir)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return capturer.getvalue()
+
+
+def run_session(session, sample=None, checkpoint=None):
+    """
+    Performs a single run on a dataset loaded into a session.
+
+    Parameters:
+        session (Session): The session of the dataset.
+        sample (list of list of str, optional): The rows of a sample selected beforehand
+                                                (see Session.draw_samples(...)). Defaults to
+                                                None (a new sample).
+        checkpoint (Checkpoint, optional): The checkpoint of the run. Defaults to None.
+
+    Returns:
+        list of dict: A list of dictionaries as returned by parse_rule(...), with metrics
+                      rounded as in the debug output of a run.
+    """
+
+    # Capture sys.stdout (e.g., Popper output)
+    with capture_output(StringIO()):
+        results = session.run(sample=sample, checkpoint=checkpoint)
+
+    rules = []
+    for (head, bodies, _, coverages, recalls, precisions) in results:
+        for (body, coverage, recall, precision) in zip(bodies, coverages, recalls, precisions):
+            rules.append({
+                'rule': "{}:- {}".format(head, body),
+                'coverage': float("{:.2f}".format(coverage)),
+                'recall': float("{:.2f}".format(recall)),
+                'precision': float("{:.2f}".format(precision))
+            })
+
+    return rules
+
+
 def main(args):
     """
     Executes the main logic for processing datasets, extracting rules, and printing results.
@@ -197,47 +308,114 @@ def main(args):
 
     rules = []
 
+    # Datasets to test, each tested three times
+    tests = []
+
+    # Zipped (or gzipped, or xz-compressed) datasets are read as streams, without extracting them
     datasets = next(os.walk(args.dir), (None, None, []))[2]
     for dataset in datasets:
-        # If dataset is zipped, unzip the dataset
-        if dataset.endswith(".zip"):
-            with ZipFile(args.dir + dataset, 'r') as zip_ref:
-                zip_ref.extractall(args.dir)
-                datasets.append(dataset[:-4] + '.csv')
-
-            continue
-
         # If dataset is marked as to be ignored, skip it
-        if any(attr != "none" and dataset.split('-')[-1][:-4] == attr \
+        if any(attr != "none" and table_stem(dataset).split('-')[-1] == attr \
                for attr in args.ignore_attributes):
             continue
 
         # Build dataset path
-        args.dataset = args.dir + dataset
-
-        # Perform three runs for each dataset
-        for i in range(3):
-            print("[+] Testing {} (run {} of 3)".format(args.dataset, i + 1))
-
-            # Capture sys.stdout
-            capturer = StringIO()
-            with capture_output(capturer):
-                run(run_as_package=True,args=args)
-
-            # Read and parse the output
-            out = capturer.getvalue()
-            out_rules = []
-            add_next_line = False
-            for line in out.splitlines():
-                if line.startswith("[DEBUG] Rule:"):
-                    out_rules.append(line.strip())
-                    add_next_line = True
-
-                elif add_next_line:
-                    out_rules[-1] += "\n" + line.strip()
-                    add_next_line = False
+        tests.append(args.dir + dataset)
+
+    # Runs finished before the sweep was interrupted, with their rules, and the checkpoint of
+    # each run, from which runs in progress resume
+    checkpoint = Checkpoint(args.checkpoint) if args.checkpoint else None
+    finished = checkpoint.get("units", {}) if checkpoint else {}
+
+    # Resume only sweeps with the same settings
+    if checkpoint:
+        try:
+            checkpoint.check({ key: value for (key, value) in vars(args).items() if key not in ["jobs", "checkpoint"] })
+        except ValueError as e:
+            sys.exit("[ERROR] {}".format(e))
+
+    def unit_checkpoint(dataset, i):
+        return checkpoint.child("{}-{}".format(table_stem(dataset), i + 1)) if checkpoint else None
+
+    def finish(dataset, i, rules_run):
+        if checkpoint:
+            finished["{}:{}".format(dataset, i + 1)] = rules_run
+            checkpoint.put("units", finished)
+            unit_checkpoint(dataset, i).clear()
+
+    if args.jobs > 1:
+        # Build caches up front, so that workers don't build the same cache concurrently,
+        # and select the samples of the three runs of each dataset in a single pass over it
+        samples = {}
+        for dataset in tests:
+            cache = load_cache(dataset) if args.cache else None
+            samples[dataset] = draw_samples(dataset, args.sample_size, 3, cache=cache)
+
+        # Dispatch each run to a fresh worker process (with its own SWI-Prolog engine),
+        # using absolute dataset paths as workers run on temporary working directories
+        units = [(dataset, i) for dataset in tests for i in range(3)]
+        with ProcessPoolExecutor(max_workers=args.jobs, mp_context=multiprocessing.get_context('spawn'),
+                                 max_tasks_per_child=1) as executor:
+            futures = [executor.submit(run_dataset, args, os.path.abspath(dataset), True, samples[dataset][i],
+                                       os.path.abspath(unit_checkpoint(dataset, i).path) if checkpoint else None)
+                       if "{}:{}".format(dataset, i + 1) not in finished else None for (dataset, i) in units]
+
+            for ((dataset, i), future) in zip(units, futures):
+                print("[+] Testing {} (run {} of 3)".format(dataset, i + 1))
+                if future == None:
+                    rules += finished["{}:{}".format(dataset, i + 1)]
+                    continue
 
-            rules += list(map(parse_rule, out_rules))
+                rules_run = parse_output(future.result())
+                finish(dataset, i, rules_run)
+                rules += rules_run
+
+    else:
+        results = ResultCache(args.result_cache) if args.result_cache else None
+
+        # Perform three runs for each dataset, loading each dataset into Prolog only once
+        # (if small enough to be kept loaded), and selecting the samples of the three runs
+        # in a single pass over it
+        for dataset in tests:
+            # Datasets whose runs have all finished aren't loaded again
+            if all("{}:{}".format(dataset, i + 1) in finished for i in range(3)):
+                for i in range(3):
+                    print("[+] Testing {} (run {} of 3)".format(dataset, i + 1))
+                    rules += finished["{}:{}".format(dataset, i + 1)]
+
+                continue
+
+            cache = load_cache(dataset) if args.cache else None
+
+            # Larger datasets are validated one batch at a time by each run, as with --jobs
+            if not fits(dataset, cache):
+                samples = draw_samples(dataset, args.sample_size, 3, cache=cache)
+                for i in range(3):
+                    print("[+] Testing {} (run {} of 3)".format(dataset, i + 1))
+                    if "{}:{}".format(dataset, i + 1) in finished:
+                        rules += finished["{}:{}".format(dataset, i + 1)]
+                        continue
+
+                    rules_run = parse_output(run_dataset(args, dataset, False, samples[i],
+                                                         unit_checkpoint(dataset, i).path if checkpoint else None))
+                    finish(dataset, i, rules_run)
+                    rules += rules_run
+
+                continue
+
+            with Session(dataset, parse_int_cols(args.intcols), load_operators(args.grounded), args.categorical,
+                         args.sample_size, args.solver, args.max_timeout, args.debug,
+                         lazy=args.grounding == 'lazy', cache=cache, results=results) as session:
+                samples = session.draw_samples(3)
+                for i in range(3):
+                    print("[+] Testing {} (run {} of 3)".format(dataset, i + 1))
+                    if "{}:{}".format(dataset, i + 1) in finished:
+                        rules += finished["{}:{}".format(dataset, i + 1)]
+                        continue
+
+                    rules_run = run_session(session, samples[i], unit_checkpoint(dataset, i))
+                    finish(dataset, i, rules_run)
+                    rules += rules_run
 
     # Filter duplicates
     rules_no_duplicates = []
@@ -249,15 +427,6 @@ def main(args):
     if rules_no_duplicates != []:
         print_results(rules_no_duplicates)
 
-    # Clean table files if extracted from zip
-    if any(dataset.endswith(".zip") for dataset in datasets):
-        for dataset in datasets:
-            if dataset.endswith(".csv"):
-                try:
-                    os.remove(os.path.join(args.dir, dataset))
-                except:
-                    continue
-
 
 if __name__ == '__main__':
     # Force line buffering
@@ -286,11 +455,30 @@ if __name__ == '__main__':
                               list with entries of the form <file>:<class> (or \'none\'), where \
                               <file> is the path to a file under the operators directory and <class> \
                               is the name of the class (default: lt:LTOperator)')
+    parser.add_argument('--cache', action='store_true',
+                        help='convert datasets into columnar caches stored next to them, and reuse \
+                              them in later runs (default: false)')
+    parser.add_argument('--grounding', choices=['eager', 'lazy'],
+                        type=str, default='eager',
+                        help='set grounding mode: eager (generate all pair relations), lazy (define \
+                              operators by Prolog rules over the integer attributes) (default: eager)')
+    parser.add_argument('--result-cache', type=str, metavar="path", default=None,
+                        help='set path to a cache of validation results (created if it doesn\'t exist); \
+                              rules already validated against the same dataset and settings, in this \
+                              or earlier runs, are looked up instead of validated again (default: none)')
     parser.add_argument('--ignore-attributes', type=str, default="none",
                         help='set protected attributes to ignore (datasets must be of the form \
                               <dataset>-<attr>.csv, where <attr> is the protected attribute in question); \
                               expects comma-separated list with names of attributes (or \'none\') \
                               (example: age) (default: none)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='set number of worker processes; each run of each dataset is dispatched \
+                              to a fresh worker process with its own working directory (default: 1)')
+    parser.add_argument('--checkpoint', type=str, metavar="path", default=None,
+                        help='save the progress of the test (finished runs and their rules, and the \
+                              sample, learned rules and validation progress of runs in progress) to a \
+                              directory (created if it doesn\'t exist), and resume from it if the test \
+                              was interrupted; the settings must be the same (default: none)')
     
     args = parser.parse_args()
 
@@ -303,6 +491,14 @@ if __name__ == '__main__':
     args.min_recall = 5
     args.min_precision = 80
 
+    # Workers run on temporary working directories, so the result cache needs an absolute path
+    if args.result_cache:
+        args.result_cache = os.path.abspath(args.result_cache)
+
+    # Workers run on temporary working directories, so checkpoints need an absolute path
+    if args.checkpoint:
+        args.checkpoint = os.path.abspath(args.checkpoint)
+
     # Parse attributes to be ignored
     args.ignore_attributes = args.ignore_attributes.split(',')
 
@@ -40,8 +40,19 @@ done
 out_dir="scripts/results"
 mkdir -p $out_dir
 
-# Loop through datasets
-find datasets -type d -links 2 -print0 | while read -d $'\0' dir
+# Validation results are cached across runs and invocations
+result_cache="$out_dir/validation.db"
+
+# Progress of each dataset is checkpointed, so an interrupted sweep resumes where it stopped
+# Checkpoints are kept until every dataset has been tested
+checkpoint_dir="$out_dir/checkpoints"
+mkdir -p "$checkpoint_dir"
+rm -f "$checkpoint_dir/failed"
+
+# Loop through dataset directories (those with datasets directly in them), skipping the
+# columnar caches stored next to the datasets (<dataset>.cache directories)
+find datasets -name '*.cache' -prune -o -type f \( -name '*.csv' -o -name '*.zip' -o -name '*.gz' -o -name '*.xz' \) \
+     -printf '%h\0' | sort -zu | while read -d $'\0' dir
 do
     # Ignore datasets other than Adult, Ricci and German Credit
     if [[ "$dir" != *"Adult"* && "$dir" != *"Ricci"* && "$dir" != *"German Credit"* ]]; then
@@ -56,12 +67,25 @@ do
     echo "[+] Testing $dir..."
     out_path="$(echo "$dir" | sed 's/[[:space:]]//g; s#^datasets/##; s#/#-#g').out"
 
-    python3 scripts/test_dataset.py "$dir" --max-timeout $max_timeout --grounded $grounded --ignore-attributes $ignore_attributes| tee "$out_dir/$out_path"
+    python3 scripts/test_dataset.py "$dir" --max-timeout $max_timeout --grounded $grounded --result-cache "$result_cache" --ignore-attributes $ignore_attributes --checkpoint "$checkpoint_dir/${out_path%.out}" | tee "$out_dir/$out_path"
+    status=${PIPESTATUS[0]}
+
+    # Keep checkpoints if the test was interrupted
+    if [[ $status -ne 0 ]]; then
+        touch "$checkpoint_dir/failed"
+    fi
 
     # Remove debug information
     sed -i '/^\[+\]/d' "$out_dir/$out_path"
     sed -i '1d' "$out_dir/$out_path"
 done
 
+# Remove checkpoints once every dataset has been tested
+if [[ -e "$checkpoint_dir/failed" ]]; then
+    echo "[!] Some datasets weren't fully tested; run the script again to resume them"
+else
+    rm -rf "$checkpoint_dir"
+fi
+
 # Restore call site
 cd $prev_dir
\ No newline at end of file
@@ -15,6 +15,7 @@ setuptools.setup(
     install_requires=[
         'clingo~=5.6.2',
         'bitarray~=2.9.2',
+        'numpy>=1.24',
         'janus_swi~=1.5.1',
         'python-sat~=1.8.dev12',
         'popper_ilp @ https://github.com/logic-and-learning-lab/Popper/archive/1903c441082a344449988c6b52a46b7dde3fdc8a.zip'
@@ -0,0 +1,36 @@
+import pytest
+
+# The pipeline needs SWI-Prolog (via Janus) and Popper
+pytest.importorskip("janus_swi")
+pytest.importorskip("popper")
+
+from padtai.pipeline import validate_table
+from padtai.parsetable import SymbolTable
+
+
+def write_dataset(path, rows):
+    # CRLF line endings, as the datasets of the repository
+    with open(path, 'w', newline='') as f:
+        f.write("a,label\r\n")
+        for i in range(rows):
+            f.write("{},{}\r\n".format("x" if i % 2 == 0 else "y", "yes" if i % 4 == 0 else "no"))
+
+
+@pytest.mark.parametrize("validator", ['numpy', 'bitset'])
+def test_exact_multiple_of_batch(tmp_path, validator):
+    # Each batch reads batch_size + 1 rows, so the dataset ends exactly at the end of the
+    # third batch, and a fourth batch reads no rows
+    batch_size = 9
+    table_path = str(tmp_path / "dataset.csv")
+    write_dataset(table_path, 3 * (batch_size + 1))
+
+    out_path = tmp_path / "out"
+    out_path.mkdir()
+    (out_path / "bk.pl").write_text("attr_a_x(x).\n")
+
+    counts, coverages, recalls, precisions = validate_table(table_path, str(out_path), "yes(V0)", ["a(V0,V1),attr_a_x(V1)"],
+                                                            SymbolTable(), None, [], True, ["yes", "no"],
+                                                            validator=validator, debug='none', batch_size=batch_size)
+
+    # Rows 0, 4, 8, ..., 28 (half of the rows with a = x) are labelled yes
+    assert counts == [8]
@@ -0,0 +1,98 @@
+import pytest
+
+from padtai.columnar import ColumnTable, validate_rules as validate_rules_columnar
+from padtai.operators.lt import LTOperator
+from padtai.operators.sum import SumOperator
+
+# The bitset validator needs bitarray
+bitset = pytest.importorskip("padtai.bitset")
+
+VALIDATORS = { 'numpy': validate_rules_columnar, 'bitset': bitset.validate_rules }
+
+CONSTANTS = { "attr_education_bs": "bs", "int_1": 1, "int_39": 39, "int_39_0": 39.0, "int_40": 40 }
+
+
+def build_table(rows, int_cols=None):
+    # Values as they are loaded into Prolog (see pipeline.load_columns(...))
+    table = ColumnTable(["education", "hours"], int_cols)
+    for (education, hours, age) in rows:
+        table.append([education, hours], age)
+
+    return table.finalize()
+
+
+def validate(validator, rules, table, categories, categorical=False):
+    categories_count = {}
+    for category in table.protected:
+        categories_count[category] = categories_count.get(category, 0) + 1
+
+    # In categorical mode, the rules refer to the first category
+    head = "{}(V0)".format(categories[0]) if categorical else "age(V0,V1)"
+
+    counts, _, _, _, counts_all = VALIDATORS[validator](head, rules, table, CONSTANTS, [LTOperator(), SumOperator()],
+                                                        categorical, categories, categories_count, True)
+    return counts, counts_all
+
+
+@pytest.mark.parametrize("validator", ['numpy', 'bitset'])
+def test_operator_over_protected(validator):
+    # The protected attribute (age) only appears in lt(V1,V3), so V1 is unbound when counting
+    # the rows matched by the non-protected attributes only
+    table = build_table([("bs", 40, "39"), ("bs", 39, "45"), ("ms", 30, "39"), ("bs", 50, "50"),
+                         ("bs", 39, "30"), ("bs", 35, "35"), ("ms", 40, "40")])
+    rule = "education(V0,V2),attr_education_bs(V2),lt(V1,V3),int_40(V3)"
+
+    counts, counts_all = validate(validator, [rule], table, ["39", "45", "50", "30", "35", "40"])
+
+    # lt(V1,40) is grounded on the integers of the row (hours) and of the rule (40), so the
+    # age must be one of them: only row 5 (age 35, hours 35), and not row 0 (age 39)
+    assert counts == [1]
+    # Some integer of the row is less than 40: rows 1, 4 (hours 39) and 5 (hours 35)
+    assert counts_all == [3]
+
+
+@pytest.mark.parametrize("validator", ['numpy', 'bitset'])
+def test_unbound_operator_variables(validator):
+    table = build_table([("bs", 40, "40"), ("bs", 39, "45"), ("bs", 50, "50"), ("bs", 41, "39")])
+    rules = ["lt(V2,V3),hours(V0,V3),int_40(V4)",                  # some integer less than hours
+             "sum(V5,V3,V2),hours(V0,V2),int_1(V3),int_40(V4)",    # hours - 1 is an integer
+             "hours(V0,V2),sum(V2,V3,V4),int_40(V3)",              # the sum is not bound
+             "lt(V2,V5),lt(V5,V3),hours(V0,V3),int_40(V4)"]        # two integers less than hours
+
+    counts, counts_all = validate(validator, rules, table, ["40", "45", "50", "39"])
+
+    # Rows 2 (40 < 50) and 3 (40 < 41)
+    assert counts_all[0] == 2
+    # Row 3 (40 + 1 = 41)
+    assert counts_all[1] == 1
+    assert counts_all[2] == 4
+    # No row has two distinct integers less than hours
+    assert counts_all[3] == 0
+
+
+@pytest.mark.parametrize("validator", ['numpy', 'bitset'])
+def test_integer_columns(validator):
+    rows = [(38, 40, "40"), (38, 39, "38")]
+    rule = "education(V0,V2),lt(V2,V3),int_40(V3)"
+
+    # Only hours is an integer column, so education is not grounded on
+    counts, counts_all = validate(validator, [rule], build_table(rows, [1]), ["40", "38"])
+    assert counts_all == [0]
+
+    # Every column is an integer column
+    counts, counts_all = validate(validator, [rule], build_table(rows), ["40", "38"])
+    assert counts_all == [2]
+
+
+@pytest.mark.parametrize("validator", ['numpy', 'bitset'])
+def test_int_and_float_constants(validator):
+    # Integers and floats do not unify in Prolog, so int_39 and int_39_0 match different rows
+    table = build_table([("bs", 39, "39"), ("bs", 39.0, "39"), ("bs", 39, "39"), ("bs", 40, "40")])
+    rules = ["hours(V0,V2),int_39(V2)", "hours(V0,V2),int_39_0(V2)",
+             "hours(V0,V2),lt(V2,V3),int_40(V3)", "hours(V0,V2),lt(V2,V3),int_39_0(V3)"]
+
+    counts, counts_all = validate(validator, rules, table, ["39", "40"], True)
+
+    assert counts_all == [2, 1, 3, 0]
+    # Rows 0, 1 and 2 are labelled 39
+    assert counts == [2, 1, 3, 0]
@@ -0,0 +1,85 @@
+import pytest
+
+from padtai.rules import canonical_rule
+from padtai.results import ResultCache
+from padtai.operators.lt import LTOperator
+from padtai.operators.sum import SumOperator
+
+
+def test_canonical_literal_order():
+    assert canonical_rule("relationship(V0,V2),attr_relationship_husband(V2),age(V0,V3)") == \
+           canonical_rule("age(V0,V3),attr_relationship_husband(V2),relationship(V0,V2)")
+
+
+def test_canonical_variable_names():
+    assert canonical_rule("relationship(V0,V5),attr_relationship_husband(V5),age(V0,V3),lt(V3,V4),int_40(V4)") == \
+           canonical_rule("relationship(V0,V2),attr_relationship_husband(V2),age(V0,V7),lt(V7,V6),int_40(V6)")
+
+
+@pytest.mark.parametrize("rule, other", [
+    # The same literals, with other variables bound by the head
+    ("relationship(V0,V1),age(V0,V2)", "relationship(V0,V2),age(V0,V1)"),
+    ("age(V0,V2),lt(V1,V2)", "age(V0,V2),lt(V2,V1)"),
+    # The same literals, with other variables shared between them
+    ("age(V0,V2),hours(V0,V3),lt(V2,V3)", "age(V0,V2),hours(V0,V3),lt(V3,V2)"),
+    ("age(V0,V2),attr_age_40(V2),hours(V0,V3)", "age(V0,V2),hours(V0,V3),attr_age_40(V3)"),
+])
+def test_canonical_distinct_rules(rule, other):
+    assert canonical_rule(rule) != canonical_rule(other)
+
+
+@pytest.fixture
+def results(tmp_path):
+    table_path = tmp_path / "dataset.csv"
+    table_path.write_text("age,relationship,sex\n40,husband,male\n")
+
+    return ResultCache(str(tmp_path / "results.db")), str(table_path)
+
+
+def test_keys(results):
+    results, table_path = results
+    ops = [LTOperator()]
+
+    keys = results.keys(table_path, "male(V0)", ["relationship(V0,V2),attr_relationship_husband(V2),age(V0,V3)",
+                                                 "age(V0,V4),relationship(V0,V5),attr_relationship_husband(V5)",
+                                                 "relationship(V0,V2),age(V0,V3)"], ops, None, True)
+
+    # Rules that only differ in the order of their literals or the names of their variables
+    # share a key
+    assert keys[0] == keys[1]
+    assert keys[0] != keys[2]
+
+    # Keys depend on the head and the settings that affect validation
+    rule = ["relationship(V0,V2),attr_relationship_husband(V2)"]
+    variants = [results.keys(table_path, "male(V0)", rule, ops, None, True),
+                results.keys(table_path, "female(V0)", rule, ops, None, True),
+                results.keys(table_path, "male(V0)", rule, [LTOperator(), SumOperator()], None, True),
+                results.keys(table_path, "male(V0)", rule, ops, [0], True),
+                results.keys(table_path, "male(V0)", rule, ops, None, False),
+                results.keys(table_path, "male(V0)", rule, ops, None, True, 500),
+                results.keys(table_path, "male(V0)", rule, ops, None, True, None, { 0: [30, 50] })]
+
+    assert len(set(key for (key,) in variants)) == len(variants)
+
+
+def test_keys_dataset(results):
+    results, table_path = results
+    rule = ["relationship(V0,V2),attr_relationship_husband(V2)"]
+
+    key = results.keys(table_path, "male(V0)", rule, [LTOperator()], None, True)
+
+    # Keys depend on the content of the dataset
+    with open(table_path, 'a') as f:
+        f.write("30,wife,female\n")
+
+    assert results.keys(table_path, "male(V0)", rule, [LTOperator()], None, True) != key
+
+
+def test_get_put(results):
+    results, table_path = results
+    keys = results.keys(table_path, "male(V0)", ["relationship(V0,V2),attr_relationship_husband(V2)",
+                                                 "relationship(V0,V2)"], [LTOperator()], None, True)
+
+    results.put(keys[:1], [(10, 50.0, 40.0, 90.0)])
+
+    assert results.get(keys) == [(10, 50.0, 40.0, 90.0), None]
@@ -0,0 +1,55 @@
+import pytest
+
+from padtai.parsetable import sample_records, sample_records_multi, sample_records_stratified, \
+                              sample_records_stratified_multi
+
+
+def category(record):
+    # 900 records of category a, 90 of category b and 10 of category c
+    return 'a' if record < 900 else 'b' if record < 990 else 'c'
+
+
+@pytest.mark.parametrize("seed", [0, 7, 42])
+def test_multi_samples_are_single_samples(seed):
+    samples = sample_records_multi(range(1000), 10, 3, seed)
+
+    # Sample i is the sample selected by sample_records(..., seed + i)
+    assert samples == [sample_records(range(1000), 10, seed + i) for i in range(3)]
+
+
+@pytest.mark.parametrize("seed", [0, 7, 42])
+def test_stratified_multi_samples_are_single_samples(seed):
+    samples = sample_records_stratified_multi(range(1000), 100, category, 0.2, 3, seed)
+
+    assert samples == [sample_records_stratified(range(1000), 100, category, 0.2, seed + i) for i in range(3)]
+
+
+def test_stratified_min_share():
+    for sample in sample_records_stratified_multi(range(1000), 100, category, 0.2, 3, 0):
+        categories = [category(record) for record in sample]
+
+        assert len(sample) == 100
+        assert len(set(sample)) == 100
+
+        # Category b gets its minimum share (20 records), and category c, with fewer records
+        # than its minimum share, gets all of its records
+        assert categories.count('b') >= 20
+        assert sorted(record for record in sample if category(record) == 'c') == list(range(990, 1000))
+
+
+@pytest.mark.parametrize("sample_size", [0, -1])
+def test_empty_samples(sample_size):
+    assert sample_records(range(10), sample_size, 0) == []
+    assert sample_records_multi(range(10), sample_size, 3, 0) == [[], [], []]
+    assert sample_records_stratified_multi(range(10), sample_size, category, 0.2, 3, 0) == [[], [], []]
+
+
+def test_fewer_records_than_sample_size():
+    # Every sample has all records, in their original order (grouped by category, if stratified)
+    assert sample_records_multi(range(5), 10, 3, 0) == [list(range(5))] * 3
+
+    records = [995, 0, 991, 1, 950]
+    samples = sample_records_stratified_multi(records, 10, category, 0.2, 3, 0)
+
+    assert [sorted(sample) for sample in samples] == [sorted(records)] * 3
+    assert [[category(record) for record in sample] for sample in samples] == [['c', 'c', 'a', 'a', 'b']] * 3